@@ -0,0 +1,32 @@
+"""
+Núcleo de simulação do despacho FV + BESS + GMG (sem dependência do Streamlit).
+
+Pode ser usado em scripts, notebooks e processos de lote; o app Streamlit
+(``streamlit_app.py``) é apenas uma interface sobre este pacote. Para rodar
+cenários pela linha de comando: ``python -m simulador_bess --help``.
+"""
+from .anual import consumo_anual_diesel, consumo_anual_diesel_grade, consumo_anual_diesel_lote
+from .autonomia import simular_autonomia, simular_cenarios_autonomia
+from .cache_disco import cache_em_disco, limpar_cache
+from .colunar import ResultadoColunar
+from .cronologico import consumo_anual_cronologico_grade, consumo_anual_cronologico_lote, simular_ano_cronologico
+from .estrategias import ESTRATEGIA_PADRAO, ESTRATEGIAS, definir_estrategia
+from .etapas import simular_detalhado_em_etapas
+from .frota import simular_frota
+from .lote import simular_lote
+from .medicoes import fv_de_irradiancia, ler_series_medidas, simular_series_medidas
+from .montecarlo import simular_monte_carlo_autonomia
+from .otimizacao import otimizar_dimensionamento
+from .otimo import despacho_otimo, simular_otimo
+from .simulacao import simular_detalhado, simular_detalhado_em_arquivos, simular_detalhado_em_blocos
+
+__all__ = [
+    "cache_em_disco", "limpar_cache", "ResultadoColunar",
+    "ESTRATEGIA_PADRAO", "ESTRATEGIAS", "definir_estrategia",
+    "consumo_anual_diesel", "consumo_anual_diesel_grade", "consumo_anual_diesel_lote",
+    "consumo_anual_cronologico_grade", "consumo_anual_cronologico_lote", "simular_ano_cronologico",
+    "fv_de_irradiancia", "ler_series_medidas", "simular_series_medidas",
+    "simular_autonomia", "simular_cenarios_autonomia", "simular_lote", "simular_detalhado",
+    "simular_detalhado_em_arquivos", "simular_detalhado_em_blocos", "simular_detalhado_em_etapas", "simular_frota",
+    "simular_monte_carlo_autonomia", "otimizar_dimensionamento", "despacho_otimo", "simular_otimo",
+]
@@ -0,0 +1,175 @@
+"""Estimativa do consumo anual de diesel (Gráfico 4)."""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .instrumentacao import fase
+from .lote import simular_lote
+from .perfis import PASSOS_POR_DIA
+
+# Distribuição anual dos tipos de dia: fator de irradiação -> peso
+FATORES_E_PESOS_ANUAIS = {
+    1.0: 0.40, # 40% Céu Aberto
+    0.5: 0.35, # 35% Nublado
+    0.2: 0.20, # 20% Tempestade
+    0.0: 0.05  # 5% Sem Sol
+}
+
+# Divisão da grade em blocos: alguns blocos por processo (balanceamento) sem
+# blocos pequenos demais, pois cada lote tem um custo fixo (os 288 passos
+# vetorizados) além do custo de IPC por bloco
+BLOCOS_POR_PROCESSO = 4
+TAMANHO_MINIMO_BLOCO = 128
+
+
+def consumo_anual_diesel_lote(
+    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    ao_progredir=None, estrategia=None, frota=False
+):
+    """
+    Consumo anual ponderado de diesel (L) para vários dimensionamentos de uma
+    só vez: cada configuração é simulada nos 4 tipos de dia (sem ruído, SOC
+    inicial de 50%) no mesmo lote. Os parâmetros aceitam escalares ou arrays;
+    ``estrategia`` aceita uma estratégia de despacho ou uma por configuração.
+
+    Com ``frota``, devolve também a frota de GMGs no ano (mesma ponderação):
+    dicionário com 'diesel_total_l' (curva de carga parcial e partidas),
+    'horas_por_unidade' e 'partidas_por_unidade' (configurações x unidades),
+    ver ``frota.simular_frota``.
+    """
+    configuracoes = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia)))
+    fatores = np.array(list(FATORES_E_PESOS_ANUAIS.keys()))
+    pesos = list(FATORES_E_PESOS_ANUAIS.values())
+
+    # Eixo de cenários = configuração x tipo de dia
+    (potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw, numero_total_gmgs,
+     gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia) = (
+        np.repeat(v, len(fatores)) for v in configuracoes
+    )
+    resultado = simular_lote(
+        1, potencia_pico_base_fv, np.tile(fatores, len(configuracoes[0])),
+        bess_capacidade_kwh, bess_potencia_max_kw, 0.5, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia,
+        use_noise=False, # Sem ruído para análise de sensibilidade
+        ao_progredir=ao_progredir,
+        estrategia=estrategia if estrategia is None or isinstance(estrategia, (str, dict))
+        else [e for e in estrategia for _ in fatores],
+        frota=frota
+    )
+    diesel_por_dia = resultado["total_diesel_consumido"].reshape(-1, len(fatores))
+
+    total_diesel_ponderado_diario = np.zeros(len(diesel_por_dia))
+    for indice_fator, peso in enumerate(pesos):
+        total_diesel_ponderado_diario += diesel_por_dia[:, indice_fator] * peso
+    if not frota:
+        return total_diesel_ponderado_diario * 365
+    pesos_anuais = np.array(pesos) * 365
+    frota_anual = {
+        nome: np.tensordot(resultado["frota_gmg"][nome].reshape((-1, len(fatores)) + resultado["frota_gmg"][nome].shape[1:]),
+                           pesos_anuais, axes=([1], [0]))
+        for nome in ("diesel_total_l", "horas_por_unidade", "partidas_por_unidade")
+    }
+    return total_diesel_ponderado_diario * 365, frota_anual
+
+
+def consumo_anual_diesel(
+    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia
+):
+    """Calcula o consumo anual ponderado de diesel usando a simulação DETALHADA."""
+    # Os 4 tipos de dia são simulados juntos em um único lote
+    return float(consumo_anual_diesel_lote(
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia
+    )[0])
+
+
+def _consumo_anual_bloco(bloco):
+    """Executa um bloco da grade (função de topo para ser enviada aos processos)."""
+    consumo_lote, *argumentos = bloco
+    return consumo_lote(*argumentos)
+
+
+def consumo_anual_diesel_grade(
+    fv_range_kwp, bess_range_kwh, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    processos=1, tamanho_bloco=None, ao_progredir=None, consumo_lote=consumo_anual_diesel_lote,
+    diesel_parcial=None, ao_concluir_bloco=None
+):
+    """
+    Consumo anual ponderado de diesel para toda a grade FV x BESS (BESS em
+    0.5C). Retorna uma matriz (FV x BESS).
+
+    Os pontos da grade são divididos em blocos, cada um simulado como um lote
+    vetorizado. Com ``processos`` > 1 (None = todos os núcleos) os blocos são
+    distribuídos em um pool de processos; os resultados são remontados pela
+    posição dos pontos, então a matriz não depende da ordem de término nem do
+    número de processos. ``ao_progredir(pontos_concluidos, total_pontos)`` é
+    chamado a cada bloco concluído. ``consumo_lote`` é a função de topo que
+    calcula um bloco (padrão: os 4 tipos de dia de ``consumo_anual_diesel_lote``;
+    ver também ``cronologico.consumo_anual_cronologico_lote``).
+
+    Para retomar uma grade interrompida, ``diesel_parcial`` é a matriz já
+    calculada com NaN nos pontos que faltam: só esses são simulados.
+    ``ao_concluir_bloco(indices, diesel_bloco)`` recebe cada bloco concluído
+    (índices na matriz achatada); uma exceção levantada por ele interrompe a
+    grade sem iniciar os blocos pendentes.
+    """
+    fv_kwp, bess_kwh = np.meshgrid(fv_range_kwp, bess_range_kwh, indexing='ij')
+    fv_kwp_pontos = fv_kwp.ravel()
+    bess_kwh_pontos = bess_kwh.ravel()
+    total_pontos = len(fv_kwp_pontos)
+    if diesel_parcial is None:
+        diesel = np.full(total_pontos, np.nan)
+    else:
+        diesel = np.array(diesel_parcial, dtype=float).ravel()
+    pendentes = np.flatnonzero(np.isnan(diesel))
+    if processos is None:
+        processos = os.cpu_count() or 1
+    processos = max(1, int(processos))
+    if tamanho_bloco is None:
+        tamanho_bloco = max(TAMANHO_MINIMO_BLOCO, math.ceil(len(pendentes) / (processos * BLOCOS_POR_PROCESSO)))
+
+    indices_blocos, blocos = [], []
+    for inicio in range(0, len(pendentes), tamanho_bloco):
+        indices = pendentes[inicio:inicio + tamanho_bloco]
+        bess_kwh_bloco = bess_kwh_pontos[indices]
+        indices_blocos.append(indices)
+        blocos.append((
+            consumo_lote, fv_kwp_pontos[indices],
+            np.maximum(bess_kwh_bloco, 1e-6), np.maximum(bess_kwh_bloco * 0.5, 1e-6),
+            numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia
+        ))
+
+    pontos_concluidos = total_pontos - len(pendentes)
+
+    def registrar(indice_bloco, resultado_bloco):
+        nonlocal pontos_concluidos
+        indices = indices_blocos[indice_bloco]
+        diesel[indices] = resultado_bloco
+        pontos_concluidos += len(indices)
+        if ao_progredir is not None:
+            ao_progredir(pontos_concluidos, total_pontos)
+        if ao_concluir_bloco is not None:
+            ao_concluir_bloco(indices, diesel[indices])
+
+    with fase("grade_anual", len(pendentes) * len(FATORES_E_PESOS_ANUAIS) * PASSOS_POR_DIA):
+        if processos == 1 or len(blocos) <= 1:
+            for indice_bloco, bloco in enumerate(blocos):
+                registrar(indice_bloco, _consumo_anual_bloco(bloco))
+        else:
+            with ProcessPoolExecutor(max_workers=min(processos, len(blocos))) as pool:
+                futuros = {pool.submit(_consumo_anual_bloco, bloco): indice_bloco for indice_bloco, bloco in enumerate(blocos)}
+                try:
+                    for futuro in as_completed(futuros):
+                        registrar(futuros[futuro], futuro.result())
+                except BaseException:
+                    # Interrompida: não espera os blocos que ainda não começaram
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+    return diesel.reshape(fv_kwp.shape)
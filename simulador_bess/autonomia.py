@@ -0,0 +1,101 @@
+"""Análise de autonomia do diesel em longo prazo (Gráfico 2)."""
+import numpy as np
+
+from .constantes import (
+    CAPACIDADE_TOTAL_DIESEL_L, DIAS_SIMULACAO_LONGA, INTERVALOS_POR_HORA,
+)
+from .despacho import executar_despacho
+from .instrumentacao import fase
+from .perfis import (
+    PASSOS_POR_DIA, montar_vetor_carga, montar_vetor_tempo, perfil_fv_diario,
+    semente_ruido_fv,
+)
+
+
+def simular_autonomia(
+    potencia_pico_base_fv, fator_irradiacao, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    dias_simulacao=DIAS_SIMULACAO_LONGA, capacidade_diesel_l=CAPACIDADE_TOTAL_DIESEL_L,
+    soc_inicial_fracao=0.5, use_noise=True, estrategia=None
+):
+    """
+    Simula continuamente até ``dias_simulacao`` dias (SOC e tanque de diesel
+    carregados de um dia para o outro) e para no instante em que o diesel acaba.
+
+    Cada dia usa o mesmo perfil de carga e FV de um dia isolado. Retorna o
+    nível do tanque ao fim de cada dia ('tempo' em dias, 'nivel_diesel' em L,
+    incluindo o ponto exato de esgotamento) e a autonomia em dias fracionários
+    ('autonomia', ou None se o diesel não acabar no horizonte).
+    ``estrategia`` é a estratégia de despacho (ver simulador_bess.estrategias).
+    """
+    bess_capacidade_kwh = max(bess_capacidade_kwh, 1e-6)
+    vetor_tempo = montar_vetor_tempo(dias_simulacao)
+    vetor_carga = np.tile(montar_vetor_carga(1), dias_simulacao)
+
+    with fase("perfil_fv"):
+        geracao_fv_dia, geracao_fv_suavizada_dia = perfil_fv_diario(
+            potencia_pico_base_fv, fator_irradiacao, semente_ruido_fv(use_noise))
+        vetor_geracao_fv_original = np.tile(geracao_fv_dia, dias_simulacao)
+        vetor_geracao_fv_suavizada = np.tile(geracao_fv_suavizada_dia, dias_simulacao)
+
+    resultado = executar_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+        bess_capacidade_kwh * soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, 1.0 / INTERVALOS_POR_HORA,
+        passos_por_periodo=PASSOS_POR_DIA, tanque_diesel_l=capacidade_diesel_l,
+        estrategia=estrategia
+    )
+
+    nivel_diesel = np.zeros(dias_simulacao + 1)
+    nivel_diesel[0] = capacidade_diesel_l
+    niveis_diarios = resultado["nivel_diesel_por_periodo"]
+    nivel_diesel[1:len(niveis_diarios) + 1] = niveis_diarios
+    tempo = np.arange(dias_simulacao + 1, dtype=float)
+
+    autonomia = None
+    if resultado["passo_esgotamento"] is not None:
+        autonomia = resultado["passo_esgotamento"] / PASSOS_POR_DIA
+        if autonomia != int(autonomia):
+            # Insere o ponto de esgotamento para a curva tocar o zero no instante exato
+            posicao = int(autonomia) + 1
+            tempo = np.insert(tempo, posicao, autonomia)
+            nivel_diesel = np.insert(nivel_diesel, posicao, 0.0)
+
+    return {
+        'tempo': tempo,
+        'nivel_diesel': nivel_diesel,
+        'autonomia': autonomia,
+        'soc_final_kwh': resultado["soc_final_kwh"],
+    }
+
+
+def simular_cenarios_autonomia(
+    potencia_pico_base_fv, p_ceu_aberto_slider, bess_capacidade_kwh,
+    bess_potencia_max_kw, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, ao_concluir_cenario=None
+):
+    """
+    Executa a simulação de longo prazo para autonomia: uma simulação contínua
+    por cenário de irradiação (SOC e tanque de diesel contínuos), que para
+    quando o diesel acaba. ``ao_concluir_cenario(nome, resultado)`` é chamado
+    a cada cenário concluído (resultados parciais).
+    """
+    cenarios_autonomia = {
+        f'Dias Normais (Fator {p_ceu_aberto_slider:.2f})': p_ceu_aberto_slider,
+        f'Dias Nublados (Fator {p_ceu_aberto_slider * 0.5:.2f})': p_ceu_aberto_slider * 0.5,
+        f'Dia com Tempestade (Fator {p_ceu_aberto_slider * 0.2:.2f})': p_ceu_aberto_slider * 0.2,
+        'Apenas GMG (Fator 0.0)': 0.0
+    }
+    resultados_autonomia = {}
+
+    for nome, fator in cenarios_autonomia.items():
+        # Começa a simulação de 120 dias com 50% de SOC
+        resultados_autonomia[nome] = simular_autonomia(
+            potencia_pico_base_fv, fator, bess_capacidade_kwh, bess_potencia_max_kw,
+            numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+            carga_limite_emergencia, dias_simulacao=DIAS_SIMULACAO_LONGA, soc_inicial_fracao=0.5
+        )
+        if ao_concluir_cenario is not None:
+            ao_concluir_cenario(nome, resultados_autonomia[nome])
+    return resultados_autonomia
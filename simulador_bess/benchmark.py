@@ -0,0 +1,245 @@
+"""
+Benchmarks do modelo, sem servidor Streamlit.
+
+    python -m simulador_bess.benchmark [--salvar base.json] [--comparar base.json --tolerancia 0.25]
+
+Mede as funções do pacote que o app chama (sem os caches do Streamlit nem o
+cache em disco): a simulação detalhada (Gráficos 1 e 3) com 1, 3, 30, 365 e
+3650 dias, a autonomia nos 4 cenários (Gráfico 2), o consumo anual de uma
+configuração, a grade completa do Gráfico 4, o despacho ótimo de 7 dias e o otimizador de dimensionamento. Para cada caso informa o menor
+tempo entre as repetições, os passos de simulação por segundo e o pico de
+memória alocada (medido em uma execução à parte, com ``tracemalloc``).
+
+Com ``--comparar``, o resultado é confrontado com uma base salva antes (na
+mesma máquina) e o comando termina com código 1 se algum caso ficar mais
+lento que a base além da tolerância.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from .anual import consumo_anual_diesel, consumo_anual_diesel_grade
+from .autonomia import simular_cenarios_autonomia
+from .cli import PARAMETROS_PADRAO
+from .constantes import DIAS_SIMULACAO_LONGA
+from .cronologico import DIAS_ANO, consumo_anual_cronologico_grade, simular_ano_cronologico
+from .instrumentacao import ativar_instrumentacao, exportar_json, exportar_trace_chrome
+from .otimizacao import MAXIMO_AVALIACOES, otimizar_dimensionamento
+from .otimo import simular_otimo
+from .perfis import PASSOS_POR_DIA, perfil_fv_diario
+from .simulacao import simular_detalhado
+
+DIAS_DETALHADO = (1, 3, 30, 365, 3650)
+# Horizonte do caso do despacho ótimo (programação dinâmica)
+DIAS_OTIMO = 7
+# Grade padrão do Gráfico 4 (11 x 11 pontos de 250 a 1250)
+GRADE_FV_KWP = np.linspace(250, 1250, 11)
+GRADE_BESS_KWH = np.linspace(250, 1250, 11)
+NUMERO_TIPOS_DIA = 4
+# Meta de diesel anual do caso do otimizador
+DIESEL_MAXIMO_OTIMIZACAO_L = 60000.0
+REPETICOES = 3
+TOLERANCIA = 0.25
+
+
+def _parametros(*nomes):
+    return [PARAMETROS_PADRAO[nome] for nome in nomes]
+
+
+def montar_casos():
+    """Casos de benchmark: nome -> (função sem argumentos, passos simulados)."""
+    casos = {}
+    detalhado = _parametros(
+        "potencia_pico_fv_base", "fator_irradiacao", "bess_capacidade_kwh", "bess_potencia_max_kw",
+        "soc_inicial_fracao", "numero_total_gmgs", "gmg_potencia_unitaria",
+        "gmg_fator_potencia_eficiente", "carga_limite_emergencia", "use_noise")
+    for dias in DIAS_DETALHADO:
+        casos[f"detalhado_{dias}d"] = (
+            lambda dias=dias: simular_detalhado(dias, *detalhado), dias * PASSOS_POR_DIA)
+
+    # Os 4 cenários correm até o fim do horizonte ou até o diesel acabar; os
+    # passos contados são o limite (horizonte completo)
+    casos["autonomia_4_cenarios"] = (
+        lambda: simular_cenarios_autonomia(*_parametros(
+            "potencia_pico_fv_base", "fator_irradiacao", "bess_capacidade_kwh", "bess_potencia_max_kw",
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia")),
+        NUMERO_TIPOS_DIA * DIAS_SIMULACAO_LONGA * PASSOS_POR_DIA)
+
+    casos["consumo_anual"] = (
+        lambda: consumo_anual_diesel(*_parametros(
+            "potencia_pico_fv_base", "bess_capacidade_kwh", "bess_potencia_max_kw",
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia")),
+        NUMERO_TIPOS_DIA * PASSOS_POR_DIA)
+
+    casos["grade_grafico_4"] = (
+        lambda: consumo_anual_diesel_grade(GRADE_FV_KWP, GRADE_BESS_KWH, *_parametros(
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia")),
+        len(GRADE_FV_KWP) * len(GRADE_BESS_KWH) * NUMERO_TIPOS_DIA * PASSOS_POR_DIA)
+
+    casos["ano_cronologico"] = (
+        lambda: simular_ano_cronologico(*_parametros(
+            "potencia_pico_fv_base", "bess_capacidade_kwh", "bess_potencia_max_kw",
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia")),
+        DIAS_ANO * PASSOS_POR_DIA)
+
+    casos["grade_grafico_4_cronologico"] = (
+        lambda: consumo_anual_cronologico_grade(GRADE_FV_KWP, GRADE_BESS_KWH, *_parametros(
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia")),
+        len(GRADE_FV_KWP) * len(GRADE_BESS_KWH) * DIAS_ANO * PASSOS_POR_DIA)
+
+    casos[f"otimo_{DIAS_OTIMO}d"] = (
+        lambda: simular_otimo(DIAS_OTIMO, *_parametros(
+            "potencia_pico_fv_base", "fator_irradiacao", "bess_capacidade_kwh", "bess_potencia_max_kw",
+            "soc_inicial_fracao", "numero_total_gmgs", "gmg_potencia_unitaria",
+            "gmg_fator_potencia_eficiente", "use_noise")),
+        DIAS_OTIMO * PASSOS_POR_DIA)
+
+    # Passos contados pelo limite de avaliações (a busca pode parar antes)
+    casos["otimizacao"] = (
+        lambda: otimizar_dimensionamento(*_parametros(
+            "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente",
+            "carga_limite_emergencia"), diesel_maximo_l_ano=DIESEL_MAXIMO_OTIMIZACAO_L),
+        MAXIMO_AVALIACOES * NUMERO_TIPOS_DIA * PASSOS_POR_DIA)
+    return casos
+
+
+def medir_caso(funcao, passos, repeticoes=REPETICOES):
+    """Menor tempo entre ``repeticoes`` execuções, passos/s e pico de memória."""
+    tempos = []
+    for _ in range(repeticoes):
+        perfil_fv_diario.cache_clear()  # cada execução monta os perfis do zero
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+
+    perfil_fv_diario.cache_clear()
+    tracemalloc.start()
+    try:
+        funcao()
+        _, pico_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    tempo_s = min(tempos)
+    return {
+        "tempo_s": tempo_s,
+        "tempo_mediano_s": float(np.median(tempos)),
+        "passos": passos,
+        "passos_por_s": passos / tempo_s if tempo_s > 0 else float("inf"),
+        "pico_memoria_mb": pico_bytes / (1024 * 1024),
+    }
+
+
+def executar_benchmarks(nomes=None, repeticoes=REPETICOES, ao_concluir=None):
+    """Executa os casos (todos, ou os de ``nomes``) e devolve nome -> medidas."""
+    casos = montar_casos()
+    desconhecidos = sorted(set(nomes or ()) - set(casos))
+    if desconhecidos:
+        raise ValueError(f"Casos desconhecidos: {', '.join(desconhecidos)}; disponíveis: {', '.join(casos)}")
+
+    resultados = {}
+    for nome, (funcao, passos) in casos.items():
+        if nomes and nome not in nomes:
+            continue
+        resultados[nome] = medir_caso(funcao, passos, repeticoes)
+        if ao_concluir is not None:
+            ao_concluir(nome, resultados[nome])
+    return resultados
+
+
+def comparar_com_base(resultados, base, tolerancia=TOLERANCIA):
+    """
+    Razão tempo atual / tempo da base para os casos presentes nas duas, e a
+    lista dos casos mais lentos que a base além de ``tolerancia`` (fração).
+    """
+    razoes = {}
+    regressoes = []
+    for nome, medidas in resultados.items():
+        if nome not in base:
+            continue
+        razoes[nome] = medidas["tempo_s"] / base[nome]["tempo_s"]
+        if razoes[nome] > 1 + tolerancia:
+            regressoes.append(nome)
+    return razoes, regressoes
+
+
+def _formatar_linha(nome, medidas, razao=None):
+    linha = (f"{nome:<24} {medidas['tempo_s'] * 1000:>10.1f} ms {medidas['passos_por_s']:>14,.0f} passos/s "
+             f"{medidas['pico_memoria_mb']:>9.1f} MB")
+    if razao is not None:
+        linha += f"  {razao:>6.2f}x base"
+    return linha
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulador_bess.benchmark", description="Mede o desempenho do simulador de despacho.")
+    parser.add_argument("--casos", nargs="+", metavar="CASO", help="Casos a executar (padrão: todos)")
+    parser.add_argument("--repeticoes", type=int, default=REPETICOES, help=f"Execuções por caso; vale a mais rápida (padrão: {REPETICOES})")
+    parser.add_argument("--salvar", metavar="ARQUIVO", help="Grava os resultados como base (JSON)")
+    parser.add_argument("--comparar", metavar="ARQUIVO", help="Compara com uma base gravada antes e falha se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=TOLERANCIA,
+                        help=f"Lentidão aceita em relação à base, em fração (padrão: {TOLERANCIA} = 25%%)")
+    parser.add_argument("--instrumentar", metavar="PREFIXO",
+                        help="Ativa a instrumentação e grava PREFIXO.json (fases e caches) e PREFIXO.trace.json (trace do Chrome)")
+    parser.add_argument("--listar", action="store_true", help="Lista os casos disponíveis e sai")
+    args = parser.parse_args(argv)
+
+    if args.listar:
+        print("\n".join(montar_casos()))
+        return 0
+    if args.repeticoes < 1:
+        parser.error("--repeticoes deve ser pelo menos 1")
+    if args.tolerancia < 0:
+        parser.error("--tolerancia não pode ser negativa")
+    base = None
+    if args.comparar:
+        try:
+            with open(args.comparar, encoding="utf-8") as arquivo:
+                base = json.load(arquivo)["casos"]
+        except (OSError, ValueError, KeyError) as erro:
+            parser.error(f"{args.comparar}: {erro}")
+
+    if args.instrumentar:
+        ativar_instrumentacao()
+
+    def imprimir(nome, medidas):
+        razao = medidas["tempo_s"] / base[nome]["tempo_s"] if base and nome in base else None
+        print(_formatar_linha(nome, medidas, razao), flush=True)
+
+    try:
+        resultados = executar_benchmarks(args.casos, args.repeticoes, ao_concluir=imprimir)
+    except ValueError as erro:
+        parser.error(str(erro))
+
+    if args.instrumentar:
+        exportar_json(f"{args.instrumentar}.json")
+        exportar_trace_chrome(f"{args.instrumentar}.trace.json")
+
+    if args.salvar:
+        with open(args.salvar, "w", encoding="utf-8") as arquivo:
+            json.dump({
+                "python": platform.python_version(), "numpy": np.__version__,
+                "maquina": platform.platform(), "casos": resultados,
+            }, arquivo, indent=2)
+
+    if base is not None:
+        _, regressoes = comparar_com_base(resultados, base, args.tolerancia)
+        if regressoes:
+            print(f"Regressão de desempenho (> {args.tolerancia:.0%} mais lento que a base): {', '.join(regressoes)}",
+                  file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Cache de resultados em disco, compartilhado entre processos e reinícios.
+
+Cada resultado é endereçado pelo SHA-256 de uma representação canônica do
+nome da função, dos argumentos e de todas as constantes do modelo (incluindo
+``VERSAO_MODELO`` e as estratégias de despacho pré-definidas); mudar qualquer
+constante invalida as entradas antigas.
+
+Os resultados (dicionários, listas, arrays NumPy, escalares e
+``colunar.ResultadoColunar``) são gravados em
+``.npz`` sem pickle: os arrays em formato binário e a estrutura em JSON. A
+escrita vai para um arquivo temporário renomeado atomicamente, então leitores
+e escritores concorrentes (várias réplicas do app) nunca veem um arquivo pela
+metade. A data de modificação marca o último acesso e, quando o total passa
+do limite, as entradas menos usadas recentemente são removidas.
+
+Configuração por variáveis de ambiente: ``SIMULADOR_BESS_CACHE`` (pasta) e
+``SIMULADOR_BESS_CACHE_MB`` (limite em MB; 0 desativa o cache).
+"""
+import functools
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from . import constantes, estrategias
+from .colunar import ResultadoColunar
+from .instrumentacao import fase, registrar_cache
+
+PASTA_CACHE_PADRAO = os.path.join(os.path.expanduser("~"), ".cache", "simulador_bess")
+LIMITE_CACHE_MB_PADRAO = 512
+# Temporários mais antigos que isso são restos de escritas interrompidas
+IDADE_MAXIMA_TEMPORARIO_S = 3600
+
+
+def pasta_cache():
+    return os.environ.get("SIMULADOR_BESS_CACHE", PASTA_CACHE_PADRAO)
+
+
+def limite_cache_bytes():
+    return int(float(os.environ.get("SIMULADOR_BESS_CACHE_MB", LIMITE_CACHE_MB_PADRAO)) * 1024 * 1024)
+
+
+def _canonico(valor):
+    """Representação canônica (serializável em JSON) de um argumento."""
+    if isinstance(valor, np.ndarray):
+        return ["array", valor.dtype.str, list(valor.shape), hashlib.sha256(np.ascontiguousarray(valor).tobytes()).hexdigest()]
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, bool) or valor is None or isinstance(valor, str):
+        return valor
+    if isinstance(valor, int):
+        return ["int", valor]
+    if isinstance(valor, float):
+        return ["float", repr(valor)]
+    if isinstance(valor, (list, tuple)):
+        return ["lista", [_canonico(v) for v in valor]]
+    if isinstance(valor, dict):
+        return ["dict", sorted(([_canonico(k), _canonico(v)] for k, v in valor.items()), key=json.dumps)]
+    raise TypeError(f"Argumento do tipo {type(valor).__name__} não pode ser usado na chave do cache")
+
+
+@functools.lru_cache(maxsize=1)
+def assinatura_modelo():
+    """
+    Hash das constantes do modelo (nomes em maiúsculas do módulo constantes)
+    e das estratégias de despacho, que podem ser escolhidas pelo nome.
+    """
+    valores = {nome: _canonico(getattr(constantes, nome)) for nome in sorted(dir(constantes)) if nome.isupper()}
+    valores["estrategias.ESTRATEGIAS"] = _canonico(estrategias.ESTRATEGIAS)
+    return hashlib.sha256(json.dumps(valores, sort_keys=True).encode()).hexdigest()
+
+
+def chave_cache(nome_funcao, argumentos):
+    """Chave (hex) de um resultado: função + argumentos + constantes do modelo."""
+    conteudo = json.dumps([nome_funcao, _canonico(argumentos), assinatura_modelo()], sort_keys=True)
+    return hashlib.sha256(conteudo.encode()).hexdigest()
+
+
+def _caminho(chave, pasta):
+    return os.path.join(pasta, chave[:2], f"{chave}.npz")
+
+
+def _achatar(valor, arrays):
+    """Estrutura JSON do resultado; os arrays vão para ``arrays``."""
+    if isinstance(valor, np.ndarray):
+        nome = f"a{len(arrays)}"
+        arrays[nome] = valor
+        return {"t": "a", "n": nome}
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return {"t": "v", "v": valor}
+    if isinstance(valor, (list, tuple)):
+        return {"t": "l" if isinstance(valor, list) else "u", "c": [_achatar(v, arrays) for v in valor]}
+    if isinstance(valor, dict):
+        return {"t": "d", "c": [[_achatar(k, arrays), _achatar(v, arrays)] for k, v in valor.items()]}
+    if isinstance(valor, ResultadoColunar):
+        return {"t": "c", "c": _achatar(valor.estado(), arrays)}
+    raise TypeError(f"Resultado do tipo {type(valor).__name__} não pode ser gravado no cache")
+
+
+def _reconstruir(estrutura, arrays):
+    tipo = estrutura["t"]
+    if tipo == "a":
+        return arrays[estrutura["n"]]
+    if tipo == "v":
+        return estrutura["v"]
+    if tipo in ("l", "u"):
+        itens = [_reconstruir(v, arrays) for v in estrutura["c"]]
+        return itens if tipo == "l" else tuple(itens)
+    if tipo == "c":
+        return ResultadoColunar.de_estado(_reconstruir(estrutura["c"], arrays))
+    return {_reconstruir(k, arrays): _reconstruir(v, arrays) for k, v in estrutura["c"]}
+
+
+def _mapear_npz(caminho):
+    """
+    Arrays de um ``.npz`` sem compressão (como grava ``np.savez``) abertos como
+    memmap somente leitura, direto no arquivo: nada é copiado, e processos que
+    leem a mesma entrada compartilham as páginas do cache do sistema.
+    """
+    arrays = {}
+    with zipfile.ZipFile(caminho) as pacote, open(caminho, "rb") as arquivo:
+        for membro in pacote.infolist():
+            if membro.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{caminho}: membro comprimido não pode ser mapeado")
+            # Cabeçalho local: 30 bytes fixos + nome + campo extra (tamanhos nos bytes 26-29)
+            arquivo.seek(membro.header_offset + 26)
+            tamanho_nome, tamanho_extra = np.frombuffer(arquivo.read(4), dtype="<u2")
+            arquivo.seek(membro.header_offset + 30 + int(tamanho_nome) + int(tamanho_extra))
+            versao = np.lib.format.read_magic(arquivo)
+            ler_cabecalho = np.lib.format.read_array_header_1_0 if versao == (1, 0) else np.lib.format.read_array_header_2_0
+            formato, ordem_fortran, tipo = ler_cabecalho(arquivo)
+            nome = membro.filename[:-len(".npy")] if membro.filename.endswith(".npy") else membro.filename
+            if tipo.hasobject:
+                raise ValueError(f"{caminho}: array de objetos no cache")
+            if int(np.prod(formato)) == 0:
+                arrays[nome] = np.zeros(formato, dtype=tipo)
+                arrays[nome].flags.writeable = False
+            else:
+                arrays[nome] = np.memmap(arquivo.name, dtype=tipo, mode="r", offset=arquivo.tell(),
+                                         shape=formato, order="F" if ordem_fortran else "C")
+    return arrays
+
+
+def ler_cache(chave, pasta=None, mapear=False):
+    """
+    Devolve (True, resultado) se a chave estiver no cache, senão (False,
+    None). Com ``mapear`` os arrays do resultado são memmaps somente leitura
+    do próprio arquivo (sem cópia) em vez de arrays carregados na memória.
+    """
+    caminho = _caminho(chave, pasta or pasta_cache())
+    try:
+        if mapear:
+            arrays = _mapear_npz(caminho)
+            estrutura = json.loads(np.asarray(arrays.pop("__estrutura__")).tobytes().decode())
+            resultado = _reconstruir(estrutura, arrays)
+        else:
+            with np.load(caminho, allow_pickle=False) as arquivo:
+                estrutura = json.loads(arquivo["__estrutura__"].tobytes().decode())
+                resultado = _reconstruir(estrutura, {nome: arquivo[nome] for nome in arquivo.files if nome != "__estrutura__"})
+    except FileNotFoundError:
+        return False, None
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # Arquivo corrompido, truncado ou vazio (ou removido durante a leitura):
+        # é apagado e tratado como ausente
+        _remover(caminho)
+        return False, None
+    try:
+        os.utime(caminho)  # marca o acesso (LRU)
+    except OSError:
+        pass
+    return True, resultado
+
+
+def gravar_cache(chave, resultado, pasta=None, limite_bytes=None):
+    """Grava o resultado de forma atômica e aplica o limite de tamanho."""
+    pasta = pasta or pasta_cache()
+    caminho = _caminho(chave, pasta)
+    arrays = {}
+    estrutura = json.dumps(_achatar(resultado, arrays))
+    arrays["__estrutura__"] = np.frombuffer(estrutura.encode(), dtype=np.uint8)
+
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            np.savez(arquivo, **arrays)
+            # Conteúdo no disco antes da renomeação: uma queda não publica uma entrada vazia
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        _remover(temporario)
+        raise
+    limitar_cache(pasta, limite_bytes if limite_bytes is not None else limite_cache_bytes())
+
+
+def _remover(caminho):
+    try:
+        os.remove(caminho)
+    except OSError:
+        pass
+
+
+def limitar_cache(pasta=None, limite_bytes=None):
+    """Remove as entradas menos usadas recentemente até caber no limite."""
+    pasta = pasta or pasta_cache()
+    limite_bytes = limite_cache_bytes() if limite_bytes is None else limite_bytes
+    entradas = []
+    agora = time.time()
+    for subpasta in os.scandir(pasta) if os.path.isdir(pasta) else ():
+        if not subpasta.is_dir():
+            continue
+        for entrada in os.scandir(subpasta.path):
+            try:
+                informacao = entrada.stat()
+            except OSError:
+                continue
+            if entrada.name.endswith(".tmp"):
+                if agora - informacao.st_mtime > IDADE_MAXIMA_TEMPORARIO_S:
+                    _remover(entrada.path)
+            elif entrada.name.endswith(".npz"):
+                entradas.append((informacao.st_mtime, informacao.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        _remover(caminho)
+        total -= tamanho
+
+
+def limpar_cache(pasta=None):
+    """Remove todas as entradas do cache."""
+    limitar_cache(pasta, 0)
+
+
+def cache_em_disco(funcao=None, ignorar=(), mapear=False):
+    """
+    Decorador que guarda os resultados de ``funcao`` no cache em disco. Os
+    argumentos em ``ignorar`` (ex.: callbacks de progresso, número de
+    processos) não entram na chave. Com limite 0, ou se os argumentos não
+    puderem formar uma chave, a função é chamada direto; falhas de escrita
+    no cache não interrompem a chamada. Com ``mapear`` os acertos devolvem
+    os arrays como memmaps somente leitura (ver ``ler_cache``).
+    """
+    if funcao is None:
+        return functools.partial(cache_em_disco, ignorar=ignorar, mapear=mapear)
+    assinatura = inspect.signature(funcao)
+    nome_funcao = f"{funcao.__module__}.{funcao.__qualname__}"
+
+    @functools.wraps(funcao)
+    def funcao_com_cache(*args, **kwargs):
+        if limite_cache_bytes() <= 0:
+            return funcao(*args, **kwargs)
+        argumentos = assinatura.bind(*args, **kwargs)
+        argumentos.apply_defaults()
+        try:
+            chave = chave_cache(nome_funcao, {nome: valor for nome, valor in argumentos.arguments.items() if nome not in ignorar})
+        except TypeError:
+            return funcao(*args, **kwargs)
+        with fase("cache_disco.leitura"):
+            encontrado, resultado = ler_cache(chave, mapear=mapear)
+        registrar_cache(f"disco:{funcao.__qualname__}", encontrado)
+        if encontrado:
+            return resultado
+        resultado = funcao(*args, **kwargs)
+        try:
+            with fase("cache_disco.gravacao"):
+                gravar_cache(chave, resultado)
+        except (OSError, TypeError):
+            pass
+        return resultado
+
+    return funcao_com_cache
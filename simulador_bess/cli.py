@@ -0,0 +1,233 @@
+"""
+Execução em lote pela linha de comando, sem Streamlit.
+
+    python -m simulador_bess cenarios.json -o resultados.csv [--series pasta/]
+
+O arquivo de cenários pode ser JSON (lista de objetos, ou {"cenarios": [...]})
+ou CSV (uma linha por cenário). Cada cenário informa ``analise`` ("operacao",
+"autonomia" ou "anual"), opcionalmente ``nome`` e os parâmetros que quiser
+alterar; os demais usam os valores padrão da interface (na autonomia o SOC
+inicial padrão é 50%, como no Gráfico 2; a análise anual usa sempre SOC de 50%
+e perfil sem ruído). A saída (CSV ou JSON, pela extensão) traz uma linha de
+resumo por cenário, com os parâmetros que a análise usou.
+Nos cenários de operação o resumo inclui os ciclos equivalentes, a perda de
+capacidade e a vida útil estimada do BESS (contagem rainflow; vazios sem
+BESS); com
+``degradar_bess`` a capacidade é reduzida a cada ano simulado. ``estrategia``
+escolhe a estratégia de despacho pelo nome (ver
+``simulador_bess.estrategias.ESTRATEGIAS``). Nos cenários anuais o resumo
+inclui também o diesel pela curva de carga parcial dos GMGs e as horas e
+partidas da frota no ano (``simulador_bess.frota``).
+
+Os cenários de operação rodam em blocos de dias (``--dias-por-bloco``) e as
+séries são gravadas bloco a bloco, então horizontes de vários anos usam
+memória limitada.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+from .anual import consumo_anual_diesel_lote
+from .autonomia import simular_autonomia
+from .estrategias import ESTRATEGIAS
+from .simulacao import DIAS_POR_BLOCO, simular_detalhado_em_blocos
+
+# Valores padrão dos parâmetros (os mesmos da barra lateral do app)
+PARAMETROS_PADRAO = {
+    "dias_simulacao": 3,
+    "potencia_pico_fv_base": 450.0,
+    "fator_irradiacao": 1.0,
+    "bess_capacidade_kwh": 750.0,
+    "bess_potencia_max_kw": 200.0,
+    "soc_inicial_fracao": 0.38,
+    "numero_total_gmgs": 10,
+    "gmg_potencia_unitaria": 20.0,
+    "gmg_fator_potencia_eficiente": 0.80,
+    "carga_limite_emergencia": 100.0,
+    "use_noise": True,
+    "degradar_bess": False,  # operação: reduz a capacidade do BESS a cada ano simulado
+    "estrategia": "padrao",  # estratégia de despacho (simulador_bess.estrategias.ESTRATEGIAS)
+}
+ANALISES = ("operacao", "autonomia", "anual")
+
+PARAMETROS_ANUAIS = (
+    "potencia_pico_fv_base", "bess_capacidade_kwh", "bess_potencia_max_kw", "numero_total_gmgs",
+    "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente", "carga_limite_emergencia",
+)
+# Parâmetros que cada análise de fato usa (só eles vão para a linha de resumo)
+PARAMETROS_POR_ANALISE = {
+    "operacao": tuple(PARAMETROS_PADRAO),
+    "autonomia": tuple(nome for nome in PARAMETROS_PADRAO if nome not in ("dias_simulacao", "degradar_bess")),
+    "anual": PARAMETROS_ANUAIS + ("estrategia",),
+}
+SERIES_OPERACAO = (
+    "vetor_tempo", "vetor_carga", "vetor_geracao_fv_original", "vetor_geracao_fv_suavizada",
+    "vetor_gmg_potencia_despachada", "vetor_gmgs_despachados", "vetor_potencia_bess",
+    "vetor_soc_kwh", "vetor_fv_para_carga",
+)
+
+
+def _converter_valor(nome, valor):
+    """Converte os valores lidos (texto no CSV) para o tipo do parâmetro."""
+    padrao = PARAMETROS_PADRAO[nome]
+    if isinstance(padrao, str):
+        return str(valor).strip()
+    if isinstance(padrao, bool):
+        if isinstance(valor, str):
+            return valor.strip().lower() in ("1", "true", "sim", "s", "yes")
+        return bool(valor)
+    if isinstance(padrao, int):
+        return int(float(valor))
+    return float(valor)
+
+
+def ler_cenarios(caminho):
+    """Lê o arquivo de cenários e devolve a lista de cenários normalizados."""
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        if caminho.lower().endswith(".csv"):
+            brutos = list(csv.DictReader(arquivo))
+        else:
+            brutos = json.load(arquivo)
+            if isinstance(brutos, dict):
+                brutos = brutos["cenarios"]
+
+    cenarios = []
+    for indice, bruto in enumerate(brutos):
+        bruto = {chave: valor for chave, valor in bruto.items() if valor not in (None, "")}
+        desconhecidos = set(bruto) - set(PARAMETROS_PADRAO) - {"nome", "analise"}
+        if desconhecidos:
+            raise ValueError(f"Cenário {indice}: parâmetros desconhecidos {sorted(desconhecidos)}")
+        analise = bruto.get("analise", "operacao")
+        if analise not in ANALISES:
+            raise ValueError(f"Cenário {indice}: análise '{analise}' inválida (use {', '.join(ANALISES)})")
+        parametros = dict(PARAMETROS_PADRAO)
+        if analise == "autonomia":
+            parametros["soc_inicial_fracao"] = 0.5
+        parametros.update({nome: _converter_valor(nome, valor) for nome, valor in bruto.items() if nome in PARAMETROS_PADRAO})
+        if parametros["estrategia"] not in ESTRATEGIAS:
+            raise ValueError(f"Cenário {indice}: estratégia '{parametros['estrategia']}' inválida (use {', '.join(ESTRATEGIAS)})")
+        cenarios.append({"nome": str(bruto.get("nome", f"cenario_{indice}")), "analise": analise, "parametros": parametros})
+    return cenarios
+
+
+def executar_cenarios(cenarios, pasta_series=None, dias_por_bloco=DIAS_POR_BLOCO):
+    """
+    Executa os cenários e devolve uma linha de resumo (dict) por cenário, na
+    ordem de entrada. Os cenários anuais são executados juntos em um único lote;
+    os de operação rodam em blocos de ``dias_por_bloco`` dias.
+    """
+    linhas = [None] * len(cenarios)
+
+    indices_anuais = [i for i, cenario in enumerate(cenarios) if cenario["analise"] == "anual"]
+    if indices_anuais:
+        diesel_anual, frota_anual = consumo_anual_diesel_lote(*(
+            np.array([cenarios[i]["parametros"][nome] for i in indices_anuais], dtype=float)
+            for nome in PARAMETROS_ANUAIS
+        ), estrategia=[cenarios[i]["parametros"]["estrategia"] for i in indices_anuais], frota=True)
+        for k, (i, diesel) in enumerate(zip(indices_anuais, diesel_anual)):
+            linhas[i] = {
+                "consumo_anual_diesel_l": float(diesel),
+                "consumo_anual_diesel_frota_l": float(frota_anual["diesel_total_l"][k]),
+                "horas_gmg_ano": float(frota_anual["horas_por_unidade"][k].sum()),
+                "partidas_gmg_ano": float(frota_anual["partidas_por_unidade"][k].sum()),
+            }
+
+    for i, cenario in enumerate(cenarios):
+        p = cenario["parametros"]
+        if cenario["analise"] == "operacao":
+            linhas[i] = {"total_diesel_consumido_l": 0.0, "soc_final_kwh": float(p["bess_capacidade_kwh"] * p["soc_inicial_fracao"])}
+            arquivo_series = _abrir_series(os.path.join(pasta_series, f"{cenario['nome']}.csv")) if pasta_series else None
+            try:
+                for bloco in simular_detalhado_em_blocos(**p, dias_por_bloco=dias_por_bloco):
+                    degradacao = bloco["degradacao"]
+                    linhas[i] = {
+                        "total_diesel_consumido_l": bloco["total_diesel_consumido"], "soc_final_kwh": float(bloco["soc_final_kwh"]),
+                        "ciclos_equivalentes": degradacao["ciclos_equivalentes"],
+                        "perda_capacidade": degradacao["perda_capacidade"],
+                        "vida_util_anos": degradacao["vida_util_anos"],
+                        "bess_capacidade_final_kwh": float(bloco["bess_capacidade_kwh"]),
+                    }
+                    if arquivo_series is not None:
+                        _escrever_series(arquivo_series, bloco)
+            finally:
+                if arquivo_series is not None:
+                    arquivo_series.close()
+        elif cenario["analise"] == "autonomia":
+            resultado = simular_autonomia(
+                p["potencia_pico_fv_base"], p["fator_irradiacao"], p["bess_capacidade_kwh"], p["bess_potencia_max_kw"],
+                p["numero_total_gmgs"], p["gmg_potencia_unitaria"], p["gmg_fator_potencia_eficiente"],
+                p["carga_limite_emergencia"], soc_inicial_fracao=p["soc_inicial_fracao"], use_noise=p["use_noise"],
+                estrategia=p["estrategia"]
+            )
+            linhas[i] = {"autonomia_dias": resultado["autonomia"], "nivel_diesel_final_l": float(resultado["nivel_diesel"][-1])}
+
+    return [
+        {"nome": cenario["nome"], "analise": cenario["analise"],
+         **{nome: cenario["parametros"][nome] for nome in PARAMETROS_POR_ANALISE[cenario["analise"]]}, **linha}
+        for cenario, linha in zip(cenarios, linhas)
+    ]
+
+
+def _abrir_series(caminho):
+    """Cria o CSV das séries passo a passo de um cenário de operação (com cabeçalho)."""
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    arquivo = open(caminho, "w", encoding="utf-8")
+    arquivo.write(",".join(SERIES_OPERACAO) + "\n")
+    return arquivo
+
+
+def _escrever_series(arquivo, bloco):
+    """Acrescenta ao CSV as séries de um bloco da simulação de operação."""
+    colunas = np.column_stack([bloco[nome] for nome in SERIES_OPERACAO])
+    np.savetxt(arquivo, colunas, delimiter=",", fmt="%.6g")
+
+
+def _sem_nan(linhas):
+    """Troca NaN (ex.: degradação sem BESS) por None, que sai vazio no CSV e null no JSON."""
+    return [{nome: None if isinstance(valor, float) and np.isnan(valor) else valor
+             for nome, valor in linha.items()} for linha in linhas]
+
+
+def escrever_resultados(caminho, linhas):
+    """Grava as linhas de resumo em CSV ou JSON (pela extensão do arquivo)."""
+    linhas = _sem_nan(linhas)
+    if caminho.lower().endswith(".json"):
+        with open(caminho, "w", encoding="utf-8") as arquivo:
+            json.dump(linhas, arquivo, ensure_ascii=False, indent=2)
+        return
+    colunas = list(dict.fromkeys(coluna for linha in linhas for coluna in linha))
+    with open(caminho, "w", newline="", encoding="utf-8") as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=colunas)
+        escritor.writeheader()
+        escritor.writerows(linhas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m simulador_bess", description="Executa cenários do simulador de despacho em lote.")
+    parser.add_argument("cenarios", help="Arquivo de cenários (.json ou .csv)")
+    parser.add_argument("-o", "--saida", default="-", help="Arquivo de resultados (.csv ou .json); '-' escreve CSV na saída padrão")
+    parser.add_argument("--series", metavar="PASTA", help="Grava as séries passo a passo dos cenários de operação nesta pasta")
+    parser.add_argument("--dias-por-bloco", type=int, default=DIAS_POR_BLOCO, metavar="DIAS",
+                        help=f"Dias simulados por bloco nos cenários de operação (padrão: {DIAS_POR_BLOCO})")
+    args = parser.parse_args(argv)
+
+    try:
+        cenarios = ler_cenarios(args.cenarios)
+    except (OSError, ValueError, KeyError) as erro:
+        parser.error(str(erro))
+    if args.dias_por_bloco < 1:
+        parser.error("--dias-por-bloco deve ser pelo menos 1")
+    linhas = executar_cenarios(cenarios, pasta_series=args.series, dias_por_bloco=args.dias_por_bloco)
+
+    if args.saida == "-":
+        colunas = list(dict.fromkeys(coluna for linha in linhas for coluna in linha))
+        escritor = csv.DictWriter(sys.stdout, fieldnames=colunas)
+        escritor.writeheader()
+        escritor.writerows(_sem_nan(linhas))
+    else:
+        escrever_resultados(args.saida, linhas)
+    return 0
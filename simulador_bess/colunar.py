@@ -0,0 +1,228 @@
+"""
+Resultados em formato colunar compacto.
+
+``ResultadoColunar`` guarda as séries passo a passo de uma simulação como
+colunas tipadas: potências e SOC em float32, número de GMGs no menor inteiro
+sem sinal que comporta o máximo e o eixo de tempo implícito (passo inicial e
+duração do passo). Ocupa menos da metade da memória das séries em float64 e é
+o que as simulações detalhadas devolvem e os caches guardam. As contas
+(despacho, diesel, indicadores) continuam em float64; só o resultado guardado
+é compacto.
+
+O objeto se comporta como o dicionário de antes (``resultado["vetor_soc_kwh"]``,
+``resultado["total_diesel_consumido"]``): as colunas são devolvidas como
+estão (somente leitura) e ``vetor_tempo`` é recalculado a partir do índice
+do passo, com os mesmos valores de ``perfis.montar_vetor_tempo``.
+``para_pandas`` monta um DataFrame sem copiar as colunas e ``exportar`` grava
+CSV, Parquet ou Arrow (Feather); Parquet e Arrow usam o pyarrow, opcional.
+"""
+import io
+from collections.abc import Mapping
+
+import numpy as np
+
+NOME_TEMPO = "vetor_tempo"
+# Séries de potência, energia e SOC: float32 (~7 algarismos significativos)
+SERIES_FLOAT32 = (
+    "vetor_carga", "vetor_geracao_fv_original", "vetor_geracao_fv_suavizada",
+    "vetor_gmg_potencia_despachada", "vetor_potencia_bess", "vetor_soc_kwh", "vetor_fv_para_carga",
+)
+# Contagens inteiras (número de GMGs despachados)
+SERIES_CONTAGEM = ("vetor_gmgs_despachados",)
+FORMATOS_EXPORTACAO = ("csv", "parquet", "arrow")
+
+
+def _somente_leitura(vetor):
+    vetor = np.asarray(vetor)
+    if vetor.flags.writeable:
+        vetor = vetor.view()
+        vetor.flags.writeable = False
+    return vetor
+
+
+def _compactar_serie(nome, valores):
+    valores = np.asarray(valores)
+    if nome in SERIES_FLOAT32:
+        return valores.astype(np.float32)
+    if nome in SERIES_CONTAGEM:
+        maximo = int(valores.max()) if len(valores) else 0
+        return valores.astype(np.min_scalar_type(max(maximo, 0)))
+    return valores
+
+
+class ResultadoColunar(Mapping):
+    """
+    Colunas de mesmo comprimento (uma linha por passo) e valores escalares
+    (diesel total, indicadores...). Com ``passo_de_tempo_h`` o eixo de tempo
+    (``vetor_tempo``, em horas) é implícito: (passo_inicial + i) * passo.
+    ``categorias`` associa uma coluna de códigos inteiros aos seus rótulos.
+    """
+
+    def __init__(self, colunas, escalares=None, passo_de_tempo_h=None, passo_inicial=0, categorias=None):
+        self.colunas = {nome: _somente_leitura(valores) for nome, valores in colunas.items()}
+        comprimentos = {len(valores) for valores in self.colunas.values()}
+        if len(comprimentos) > 1:
+            raise ValueError("Todas as colunas devem ter o mesmo número de linhas")
+        self.numero_de_linhas = comprimentos.pop() if comprimentos else 0
+        self.escalares = dict(escalares or {})
+        self.passo_de_tempo_h = passo_de_tempo_h
+        self.passo_inicial = int(passo_inicial)
+        self.categorias = {nome: list(rotulos) for nome, rotulos in (categorias or {}).items()}
+
+    # --- Acesso como dicionário ---
+    def __getitem__(self, nome):
+        if nome in self.colunas:
+            return self.colunas[nome]
+        if nome == NOME_TEMPO and self.passo_de_tempo_h is not None:
+            return self.vetor_tempo()
+        return self.escalares[nome]
+
+    def __iter__(self):
+        yield from self.colunas
+        if self.passo_de_tempo_h is not None:
+            yield NOME_TEMPO
+        yield from self.escalares
+
+    def __len__(self):
+        return len(self.colunas) + (self.passo_de_tempo_h is not None) + len(self.escalares)
+
+    def __repr__(self):
+        return (f"ResultadoColunar({self.numero_de_linhas} linhas, colunas={list(self.colunas)}, "
+                f"{self.nbytes / 1024 / 1024:.1f} MB)")
+
+    def vetor_tempo(self):
+        """
+        Tempo (h) de cada linha, calculado a partir do índice do passo na
+        primeira leitura e guardado (somente leitura) no objeto.
+        """
+        tempo = self.__dict__.get("_vetor_tempo")
+        if tempo is None:
+            tempo = np.arange(self.passo_inicial, self.passo_inicial + self.numero_de_linhas) * self.passo_de_tempo_h
+            tempo.flags.writeable = False
+            self._vetor_tempo = tempo
+        return tempo
+
+    def __getstate__(self):
+        # O tempo é recalculado: não vai para o pickle
+        estado = dict(self.__dict__)
+        estado.pop("_vetor_tempo", None)
+        return estado
+
+    @property
+    def nbytes(self):
+        """Memória ocupada pelas colunas (bytes)."""
+        return sum(valores.nbytes for valores in self.colunas.values())
+
+    # --- Pandas e exportação ---
+    def para_pandas(self, incluir_tempo=False):
+        """
+        DataFrame com uma coluna por série e índice ``passo`` (RangeIndex).
+        As colunas numéricas são visões dos arrays do resultado (sem cópia,
+        somente leitura); ``incluir_tempo`` acrescenta a coluna de tempo (h).
+        """
+        import pandas as pd
+
+        dados = {}
+        for nome, valores in self.colunas.items():
+            if nome in self.categorias:
+                dados[nome] = pd.Categorical.from_codes(valores, self.categorias[nome])
+            else:
+                dados[nome] = valores
+        indice = pd.RangeIndex(self.passo_inicial, self.passo_inicial + self.numero_de_linhas, name="passo")
+        tabela = pd.DataFrame(dados, index=indice, copy=False)
+        if incluir_tempo and self.passo_de_tempo_h is not None:
+            tabela.insert(0, "tempo_h", self.vetor_tempo())
+        return tabela
+
+    def exportar(self, destino=None, formato="csv"):
+        """
+        Grava as colunas (com o tempo em horas) em ``destino`` (caminho ou
+        arquivo binário) como CSV, Parquet ou Arrow (Feather). Sem
+        ``destino``, devolve os bytes do arquivo (ex.: para um download).
+        """
+        if formato not in FORMATOS_EXPORTACAO:
+            raise ValueError(f"Formato '{formato}' inválido (use {', '.join(FORMATOS_EXPORTACAO)})")
+        arquivo = io.BytesIO() if destino is None else destino
+        tabela = self.para_pandas(incluir_tempo=True)
+        if formato == "csv":
+            tabela.to_csv(arquivo, index=False, float_format="%.6g")
+        elif formato == "parquet":
+            tabela.to_parquet(arquivo, index=False, engine="pyarrow")
+        else:
+            tabela.reset_index(drop=True).to_feather(arquivo)
+        return arquivo.getvalue() if destino is None else None
+
+    # --- Serialização (cache em disco) ---
+    def estado(self):
+        """Dicionário de arrays e valores simples que ``de_estado`` reconstrói."""
+        return {
+            "colunas": dict(self.colunas), "escalares": self.escalares,
+            "passo_de_tempo_h": self.passo_de_tempo_h, "passo_inicial": self.passo_inicial,
+            "categorias": self.categorias,
+        }
+
+    @classmethod
+    def de_estado(cls, estado):
+        return cls(**estado)
+
+
+def congelar(valor):
+    """
+    Torna somente leitura todos os arrays de um resultado (dicionários,
+    listas, tuplas e ``ResultadoColunar``, recursivamente) e o devolve, para
+    ser compartilhado entre sessões sem cópia.
+    """
+    if isinstance(valor, np.ndarray):
+        valor.flags.writeable = False
+    elif isinstance(valor, ResultadoColunar):
+        for coluna in valor.colunas.values():
+            coluna.flags.writeable = False
+        congelar(valor.escalares)
+    elif isinstance(valor, dict):
+        for item in valor.values():
+            congelar(item)
+    elif isinstance(valor, (list, tuple)):
+        for item in valor:
+            congelar(item)
+    return valor
+
+
+def compactar_resultado(resultado, passo_de_tempo_h, passo_inicial=0):
+    """
+    Converte o dicionário de uma simulação detalhada (séries em float64 e
+    valores escalares) em ``ResultadoColunar``. Com ``passo_de_tempo_h``,
+    ``vetor_tempo`` é descartado (o eixo é implícito); sem ele (séries
+    medidas, tempo qualquer) fica como coluna float64. Os demais valores
+    ficam como escalares.
+    """
+    colunas, escalares = {}, {}
+    for nome, valor in resultado.items():
+        if nome == NOME_TEMPO:
+            if passo_de_tempo_h is None:
+                colunas[nome] = np.asarray(valor, dtype=float)
+            continue
+        if nome in SERIES_FLOAT32 or nome in SERIES_CONTAGEM:
+            colunas[nome] = _compactar_serie(nome, valor)
+        else:
+            escalares[nome] = valor
+    return ResultadoColunar(colunas, escalares, passo_de_tempo_h=passo_de_tempo_h, passo_inicial=passo_inicial)
+
+
+def autonomia_colunar(resultados_autonomia):
+    """
+    Resultados de ``simular_cenarios_autonomia`` (cenário -> curva do tanque)
+    como uma tabela longa: 'cenario' (categoria), 'tempo_dias' e
+    'nivel_diesel_l', com a autonomia de cada cenário nos escalares.
+    """
+    nomes = list(resultados_autonomia)
+    curvas = [resultados_autonomia[nome] for nome in nomes]
+    return ResultadoColunar(
+        {
+            "cenario": np.repeat(np.arange(len(nomes), dtype=np.min_scalar_type(max(len(nomes) - 1, 0))),
+                                 [len(curva["tempo"]) for curva in curvas]),
+            "tempo_dias": np.concatenate([np.asarray(curva["tempo"], dtype=np.float32) for curva in curvas]),
+            "nivel_diesel_l": np.concatenate([np.asarray(curva["nivel_diesel"], dtype=np.float32) for curva in curvas]),
+        },
+        escalares={"autonomia_dias": {nome: curva["autonomia"] for nome, curva in zip(nomes, curvas)}},
+        categorias={"cenario": nomes},
+    )
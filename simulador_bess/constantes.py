@@ -0,0 +1,70 @@
+"""Constantes do modelo (não alteráveis pela UI)."""
+
+# Versão da lógica do modelo: incrementar quando uma mudança no código alterar
+# os resultados, para invalidar o cache em disco (simulador_bess.cache_disco)
+VERSAO_MODELO = 3
+
+INTERVALOS_POR_HORA = 12 # Intervalos de 5 min (60/12 = 5 min)
+DIAS_SIMULACAO_LONGA = 120 # Limite de dias para o gráfico de autonomia
+EFICIENCIA_FV = 0.75
+
+# Carga (Dados mantidos)
+DADOS_CARGA_HORARIA_STR = "17.000-17.000-17.000-17.000-17.000-20.000-34.000-39.000-45.000-50.000-65.000-85.000-80.000-75.000-60.000-42.000-50.000-84.000-150.000-79.000-61.000-45.000-30.000-25.000"
+CARGA_HORARIA_24H = [float(val.replace('.', ''))/1000 for val in DADOS_CARGA_HORARIA_STR.split('-')]
+
+# BESS (Constantes) DADOS DO CASE DO BESS
+BESS_EFICIENCIA_CICLO_COMPLETO = 0.82
+EFICIENCIA_CARREGAMENTO = 0.86
+EFICIENCIA_DESCARREGAMENTO = 0.96
+
+SOC_LIMITE_MAX_SUA = 92
+SOC_LIMITE_MAX = 90
+SOC_LIMITE_MIN_NORMAL = 40
+SOC_LIMITE_MIN_EMERGENCIA = 20
+SOC_RAMPA_INICIO = 85 # SOC (%) em que a potência de carga começa a ser reduzida
+
+POT_MAX_BESS_RECARREGAR = 0.9 # (%) da Potência Nominal
+
+# Degradação do BESS (simulador_bess.degradacao): ciclos até o fim de vida com
+# 100% de DoD, expoente da curva ciclos x DoD (N = N100 * DoD^-k), perda de
+# capacidade no fim de vida e perda por calendário (fração ao ano)
+CICLOS_VIDA_100_DOD = 4000
+EXPOENTE_PROFUNDIDADE_CICLO = 1.5
+PERDA_CAPACIDADE_FIM_DE_VIDA = 0.20
+PERDA_CAPACIDADE_CALENDARIO_ANUAL = 0.01
+
+# Aplicações (Constantes)
+ATIVAR_SUAVIZACAO_FV = True
+JANELA_SUAVIZACAO_MINUTOS = 15 # Define a "suavidade" da rampa.
+
+# Diesel (Constantes)
+CAPACIDADE_TOTAL_DIESEL_L = 12000
+SFC = 0.31 # Fator de Consumo Específico: L/kWh
+
+# Frota de GMGs (simulador_bess.frota): curva de consumo em carga parcial,
+# fração da potência nominal -> L/h por kW nominal (a plena carga, igual ao
+# SFC), combustível de cada partida (L por kW nominal) e tempos mínimos de
+# cada unidade ligada e desligada (h)
+CURVA_CONSUMO_GMG = {0.0: 0.08, 0.25: 0.135, 0.5: 0.19, 0.75: 0.25, 1.0: 0.31}
+CONSUMO_PARTIDA_GMG_L_POR_KW = 0.01
+TEMPO_MINIMO_LIGADO_GMG_H = 0.5
+TEMPO_MINIMO_DESLIGADO_GMG_H = 0.25
+
+# Perfil de Geração FV (Constante)
+LIMIAR_SUAVIZACAO = 0.02  # em fração da potência nominal FV (2%)
+
+FATOR_GERACAO_HORARIA = {
+    6: 0.1, 7: 0.3, 8: 0.5, 9: 0.65, 10: 0.72, 11: 0.75, 12: 0.73,
+    13: 0.68, 14: 0.58, 15: 0.45, 16: 0.28, 17: 0.1, 18: 0.0
+}
+
+# Ruído do perfil FV: desvio padrão e limite (fração do valor interpolado) e semente padrão
+RUIDO_FV_DESVIO = 0.08
+RUIDO_FV_LIMITE = 0.15
+SEMENTE_RUIDO_FV = 42
+
+# Ano cronológico (simulador_bess.cronologico): fatores mensais (jan a dez)
+# aplicados ao perfil FV e à carga, e semente da sequência de tipos de dia
+FATOR_SAZONAL_FV = (1.08, 1.06, 1.02, 0.97, 0.91, 0.87, 0.89, 0.95, 1.00, 1.04, 1.08, 1.10)
+FATOR_SAZONAL_CARGA = (1.10, 1.10, 1.06, 1.00, 0.94, 0.90, 0.89, 0.92, 0.97, 1.02, 1.06, 1.09)
+SEMENTE_CLIMA_ANUAL = 2024
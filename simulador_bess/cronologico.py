@@ -0,0 +1,175 @@
+"""
+Simulação anual cronológica: 365 dias (8760 h) em passos de 5 min, com o SOC
+contínuo ao longo do ano inteiro.
+
+Cada dia tem um mês, que define os fatores sazonais do FV e da carga
+(``FATOR_SAZONAL_FV`` / ``FATOR_SAZONAL_CARGA``), e um tipo de clima (fatores
+de ``FATORES_E_PESOS_ANUAIS``), sorteado uma única vez pela cadeia de Markov
+do Monte Carlo com a semente ``SEMENTE_CLIMA_ANUAL``. O ano tem, portanto, no
+máximo 12 x 4 dias distintos.
+
+- ``simular_ano_cronologico``: despacho passo a passo dos ~105 mil passos de
+  uma configuração (dias repetidos com o mesmo SOC inicial são reaproveitados).
+- ``consumo_anual_cronologico_lote``: o diesel anual de várias configurações
+  (Gráfico 4), com o mesmo despacho exato de cada uma. Encadear uma tabela de
+  dias simulados sobre uma grade de SOC inicial não era mais rápido e errava
+  até ~0,6%; o lote vetorizado de ``lote.simular_lote`` ao longo do ano
+  também é mais lento que o despacho com dias reaproveitados.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from .anual import FATORES_E_PESOS_ANUAIS, consumo_anual_diesel_grade
+from .colunar import compactar_resultado
+from .constantes import FATOR_SAZONAL_CARGA, FATOR_SAZONAL_FV, INTERVALOS_POR_HORA, SEMENTE_CLIMA_ANUAL
+from .despacho import calcular_consumo_diesel, executar_despacho
+from .frota import simular_frota
+from .instrumentacao import fase
+from .montecarlo import PERSISTENCIA_CLIMA, ajustar_cadeia_clima, gerar_sequencias_clima
+from .perfis import PASSOS_POR_DIA, montar_vetor_carga, montar_vetor_tempo, perfil_fv_diario
+
+DIAS_POR_MES = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+DIAS_ANO = sum(DIAS_POR_MES)
+SOC_INICIAL_ANUAL = 0.5
+# Configurações por bloco da grade do Gráfico 4 (~0,15 s cada): define a
+# frequência do progresso e do cancelamento
+CONFIGURACOES_POR_BLOCO_ANUAL = 4
+
+
+@lru_cache(maxsize=8)
+def calendario_anual(semente=SEMENTE_CLIMA_ANUAL, persistencia=PERSISTENCIA_CLIMA):
+    """
+    Mês (0 a 11) e tipo de clima (índice em FATORES_E_PESOS_ANUAIS) de cada
+    dia do ano, e os dias distintos: 'perfil_do_dia' indexa 'fator_fv' (fator
+    de irradiação) e 'fator_carga' de cada par (mês, tipo) que ocorre no ano.
+    """
+    pesos = np.array(list(FATORES_E_PESOS_ANUAIS.values()))
+    fatores = np.array(list(FATORES_E_PESOS_ANUAIS.keys()))
+    tipo_do_dia = gerar_sequencias_clima(
+        1, DIAS_ANO, ajustar_cadeia_clima(pesos, persistencia), pesos, np.random.default_rng(semente))[:, 0]
+    mes_do_dia = np.repeat(np.arange(12), DIAS_POR_MES)
+    pares, perfil_do_dia = np.unique(mes_do_dia * len(fatores) + tipo_do_dia, return_inverse=True)
+    mes, tipo = np.divmod(pares, len(fatores))
+    calendario = {
+        "mes_do_dia": mes_do_dia, "tipo_do_dia": tipo_do_dia, "perfil_do_dia": perfil_do_dia,
+        "fator_fv": fatores[tipo] * np.array(FATOR_SAZONAL_FV)[mes],
+        "fator_carga": np.array(FATOR_SAZONAL_CARGA)[mes],
+    }
+    for valor in calendario.values():
+        valor.flags.writeable = False
+    return calendario
+
+
+def _despacho_ano(
+    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    soc_inicial_fracao, estrategia
+):
+    """Vetores de carga e FV do ano e o resultado de ``executar_despacho`` de uma configuração."""
+    calendario = calendario_anual()
+    bess_capacidade_kwh = max(bess_capacidade_kwh, 1e-6)
+
+    with fase("perfil_fv"):
+        perfis_fv = [perfil_fv_diario(potencia_pico_base_fv, float(fator), None) for fator in calendario["fator_fv"]]
+        perfil_do_dia = calendario["perfil_do_dia"]
+        vetor_geracao_fv_original = np.concatenate([perfis_fv[p][0] for p in perfil_do_dia])
+        vetor_geracao_fv_suavizada = np.concatenate([perfis_fv[p][1] for p in perfil_do_dia])
+    vetor_tempo = montar_vetor_tempo(DIAS_ANO)
+    # Cada dia usa a carga de um dia isolado (como na autonomia), escalada pelo mês
+    vetor_carga = (np.repeat(calendario["fator_carga"][perfil_do_dia], PASSOS_POR_DIA)
+                   * np.tile(montar_vetor_carga(1), DIAS_ANO))
+
+    resultado = executar_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+        bess_capacidade_kwh * soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, 1.0 / INTERVALOS_POR_HORA,
+        passos_por_periodo=PASSOS_POR_DIA, estrategia=estrategia
+    )
+    return vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, resultado
+
+
+def simular_ano_cronologico(
+    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    soc_inicial_fracao=SOC_INICIAL_ANUAL, estrategia=None
+):
+    """
+    Despacho cronológico do ano inteiro (sem ruído FV) de uma configuração.
+
+    Retorna um resultado colunar com as séries passo a passo (mesmas chaves
+    de ``simular_detalhado``),
+    'total_diesel_consumido' (L no ano), 'diesel_mensal_l' (12 valores),
+    'soc_final_kwh', a frota de GMGs no ano ('frota_gmg': horas e partidas
+    por unidade, ver simulador_bess.frota) e o calendário ('mes_do_dia',
+    'tipo_do_dia').
+    """
+    calendario = calendario_anual()
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, resultado = _despacho_ano(
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw, numero_total_gmgs,
+        gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+        soc_inicial_fracao, estrategia)
+    gasto_diario_l = (calcular_consumo_diesel(resultado["vetor_gmg_potencia_despachada"]) * passo_de_tempo_h).reshape(DIAS_ANO, PASSOS_POR_DIA).sum(axis=1)
+    return compactar_resultado({
+        "vetor_carga": vetor_carga,
+        "vetor_geracao_fv_original": vetor_geracao_fv_original, "vetor_geracao_fv_suavizada": vetor_geracao_fv_suavizada,
+        "vetor_gmg_potencia_despachada": resultado["vetor_gmg_potencia_despachada"],
+        "vetor_potencia_bess": resultado["vetor_potencia_bess"], "vetor_soc_kwh": resultado["vetor_soc_kwh"],
+        "vetor_gmgs_despachados": resultado["vetor_gmgs_despachados"], "vetor_fv_para_carga": resultado["vetor_fv_para_carga"],
+        "numero_de_passos": DIAS_ANO * PASSOS_POR_DIA,
+        "total_diesel_consumido": resultado["total_diesel_consumido"],
+        "diesel_mensal_l": np.bincount(calendario["mes_do_dia"], weights=gasto_diario_l, minlength=12),
+        "soc_final_kwh": resultado["soc_final_kwh"],
+        "frota_gmg": simular_frota(resultado["vetor_gmg_potencia_despachada"], resultado["vetor_gmgs_despachados"],
+                                   numero_total_gmgs, gmg_potencia_unitaria, passo_de_tempo_h),
+        "mes_do_dia": calendario["mes_do_dia"], "tipo_do_dia": calendario["tipo_do_dia"],
+    }, passo_de_tempo_h)
+
+
+def consumo_anual_cronologico_lote(
+    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    ao_progredir=None, estrategia=None
+):
+    """
+    Consumo anual de diesel (L) do ano cronológico para várias configurações
+    (mesma assinatura de ``anual.consumo_anual_diesel_lote``): o despacho exato
+    de ``simular_ano_cronologico`` de cada uma, sem a frota nem as séries.
+    """
+    configuracoes = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float)) for v in (
+        potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia)))
+    numero_de_configuracoes = len(configuracoes[0])
+    estrategia_por_configuracao = estrategia is not None and not isinstance(estrategia, (str, dict))
+    diesel_anual = np.empty(numero_de_configuracoes)
+    with fase("anual_cronologico", numero_de_configuracoes * DIAS_ANO * PASSOS_POR_DIA):
+        for indice, (kwp, kwh, kw, gmgs, potencia_gmg, fator_eficiente, limite_emergencia) in enumerate(
+                zip(*(v.tolist() for v in configuracoes))):
+            *_, resultado = _despacho_ano(
+                kwp, kwh, kw, int(gmgs), potencia_gmg, fator_eficiente, limite_emergencia, SOC_INICIAL_ANUAL,
+                estrategia[indice] if estrategia_por_configuracao else estrategia)
+            diesel_anual[indice] = resultado["total_diesel_consumido"]
+            if ao_progredir is not None:
+                ao_progredir(indice + 1, numero_de_configuracoes)
+    return diesel_anual
+
+
+def consumo_anual_cronologico_grade(
+    fv_range_kwp, bess_range_kwh, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    processos=1, tamanho_bloco=CONFIGURACOES_POR_BLOCO_ANUAL, ao_progredir=None, diesel_parcial=None,
+    ao_concluir_bloco=None
+):
+    """
+    ``anual.consumo_anual_diesel_grade`` com o ano cronológico (matriz FV x
+    BESS), em blocos de poucas configurações para que o progresso, o
+    cancelamento e o pool de processos acompanhem o cálculo.
+    """
+    return consumo_anual_diesel_grade(
+        fv_range_kwp, bess_range_kwh, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, processos=processos,
+        tamanho_bloco=tamanho_bloco, ao_progredir=ao_progredir, consumo_lote=consumo_anual_cronologico_lote,
+        diesel_parcial=diesel_parcial, ao_concluir_bloco=ao_concluir_bloco
+    )
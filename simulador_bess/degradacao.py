@@ -0,0 +1,144 @@
+"""
+Degradação do BESS a partir da trajetória de SOC: contagem rainflow de
+ciclos, histograma de profundidade de descarga (DoD) e estimativa de perda
+de capacidade.
+
+A contagem é incremental: ``ContadorRainflow.adicionar`` recebe a série em
+trechos (ex.: um bloco de dias por vez), extrai os pontos de reversão de
+forma vetorizada e fecha os ciclos com a pilha do método de três pontos
+(ASTM E1049). Só a pilha de reversões ainda abertas fica em memória, então
+simulações de vários anos não precisam guardar a trajetória inteira.
+
+O dano de ciclagem segue a regra de Miner com ciclos até o fim de vida
+N(DoD) = CICLOS_VIDA_100_DOD * DoD^-EXPOENTE_PROFUNDIDADE_CICLO; a perda de
+capacidade soma a parcela de ciclagem (PERDA_CAPACIDADE_FIM_DE_VIDA no dano
+1) e a de calendário.
+"""
+import numpy as np
+
+from .constantes import (
+    CICLOS_VIDA_100_DOD, EXPOENTE_PROFUNDIDADE_CICLO, PERDA_CAPACIDADE_CALENDARIO_ANUAL,
+    PERDA_CAPACIDADE_FIM_DE_VIDA,
+)
+
+DIAS_POR_ANO = 365
+# Faixas de DoD do histograma (fração da capacidade), de 5 em 5%
+LIMITES_HISTOGRAMA_DOD = np.linspace(0, 1, 21)
+
+
+def perda_capacidade(dano_ciclagem, anos):
+    """Perda de capacidade (fração) por ciclagem (dano de Miner) e calendário em ``anos``."""
+    return min(1.0, PERDA_CAPACIDADE_FIM_DE_VIDA * dano_ciclagem + PERDA_CAPACIDADE_CALENDARIO_ANUAL * anos)
+
+
+class ContadorRainflow:
+    """
+    Contagem rainflow incremental de uma série de SOC em fração da
+    capacidade (0 a 1). Acumula o histograma de DoD, os ciclos equivalentes
+    (soma dos DoD) e o dano de ciclagem; os meio-ciclos que sobram na pilha
+    entram em ``indicadores`` sem encerrar a contagem.
+    """
+
+    def __init__(self, limites_dod=LIMITES_HISTOGRAMA_DOD):
+        self.limites_dod = np.asarray(limites_dod, dtype=float)
+        self.histograma = np.zeros(len(self.limites_dod) - 1)
+        self.ciclos_equivalentes = 0.0
+        self.dano_ciclagem = 0.0
+        self._pilha = []  # reversões ainda sem ciclo fechado
+        self._anterior = None  # última amostra (reversão candidata)
+        self._sentido = 0.0  # sinal da última variação não nula
+
+    def _contar(self, amplitudes, pesos):
+        amplitudes = np.asarray(amplitudes, dtype=float)
+        pesos = np.asarray(pesos, dtype=float)
+        return (
+            np.histogram(amplitudes, self.limites_dod, weights=pesos)[0],
+            float(np.sum(pesos * amplitudes)),
+            float(np.sum(pesos * amplitudes ** EXPOENTE_PROFUNDIDADE_CICLO)) / CICLOS_VIDA_100_DOD,
+        )
+
+    def adicionar(self, soc_fracao):
+        """Acrescenta um trecho da série (continuação do anterior)."""
+        valores = np.asarray(soc_fracao, dtype=float).ravel()
+        if not len(valores):
+            return
+        if self._anterior is not None:
+            valores = np.concatenate(([self._anterior], valores))
+        variacoes = np.diff(valores)
+        indices = np.flatnonzero(variacoes)
+        sentidos = np.sign(variacoes[indices])
+        anteriores = np.concatenate(([self._sentido], sentidos[:-1]))
+        # Reversão: início de uma variação com sentido diferente da anterior
+        # (a primeira amostra da série conta como reversão)
+        reversoes = valores[indices[sentidos != anteriores]]
+        if self._anterior is None and not len(indices):
+            reversoes = valores[:1]
+        self._anterior = float(valores[-1])
+        if len(sentidos):
+            self._sentido = sentidos[-1]
+
+        amplitudes, pesos = [], []
+        pilha = self._pilha
+        for ponto in reversoes.tolist():
+            if pilha and pilha[-1] == ponto:
+                continue
+            pilha.append(ponto)
+            while len(pilha) >= 3:
+                recente = abs(pilha[-1] - pilha[-2])
+                anterior = abs(pilha[-2] - pilha[-3])
+                if recente < anterior:
+                    break
+                amplitudes.append(anterior)
+                if len(pilha) == 3:
+                    # A faixa contém o ponto inicial: meio ciclo e descarta o início
+                    pesos.append(0.5)
+                    del pilha[0]
+                else:
+                    pesos.append(1.0)
+                    del pilha[-3:-1]
+        if amplitudes:
+            histograma, ciclos_equivalentes, dano = self._contar(amplitudes, pesos)
+            self.histograma += histograma
+            self.ciclos_equivalentes += ciclos_equivalentes
+            self.dano_ciclagem += dano
+
+    def indicadores(self, anos=None, com_bess=True):
+        """
+        Ciclos equivalentes, ciclos contados, histograma de DoD e dano até
+        agora, com os meio-ciclos residuais. Com ``anos`` (tempo simulado),
+        inclui a perda de capacidade no período, a perda anual e a vida útil
+        estimada (anos até PERDA_CAPACIDADE_FIM_DE_VIDA no mesmo regime);
+        sem BESS (``com_bess=False``) esses três campos são NaN.
+        """
+        residuo = list(self._pilha)
+        if self._anterior is not None and (not residuo or residuo[-1] != self._anterior):
+            residuo.append(self._anterior)
+        amplitudes = np.abs(np.diff(residuo))
+        histograma, ciclos_equivalentes, dano = self._contar(amplitudes, np.full(len(amplitudes), 0.5))
+        histograma = self.histograma + histograma
+        resultado = {
+            "ciclos_equivalentes": self.ciclos_equivalentes + ciclos_equivalentes,
+            "ciclos_contados": float(np.sum(histograma)),
+            "histograma_dod": histograma,
+            "limites_dod": self.limites_dod,
+            "dano_ciclagem": self.dano_ciclagem + dano,
+        }
+        if anos and not com_bess:
+            resultado.update(dict.fromkeys(("perda_capacidade", "perda_capacidade_anual", "vida_util_anos"), float("nan")))
+        elif anos:
+            perda_anual = (PERDA_CAPACIDADE_FIM_DE_VIDA * resultado["dano_ciclagem"] / anos
+                           + PERDA_CAPACIDADE_CALENDARIO_ANUAL)
+            resultado.update({
+                "perda_capacidade": perda_capacidade(resultado["dano_ciclagem"], anos),
+                "perda_capacidade_anual": perda_anual,
+                "vida_util_anos": PERDA_CAPACIDADE_FIM_DE_VIDA / perda_anual if perda_anual > 0 else float("inf"),
+            })
+        return resultado
+
+
+def indicadores_degradacao(vetor_soc_kwh, bess_capacidade_kwh, dias_simulados=None):
+    """Indicadores de ``ContadorRainflow`` para uma série de SOC completa (kWh)."""
+    contador = ContadorRainflow()
+    contador.adicionar(np.asarray(vetor_soc_kwh) / max(bess_capacidade_kwh, 1e-6))
+    return contador.indicadores(None if dias_simulados is None else dias_simulados / DIAS_POR_ANO,
+                                com_bess=bess_capacidade_kwh > 0)
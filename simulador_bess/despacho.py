@@ -0,0 +1,347 @@
+"""
+Núcleo (kernel) de despacho da simulação detalhada.
+
+Tudo o que não depende do estado do BESS (hora do dia, janela de suavização,
+diferença FV bruta x meta, carga acima do limite de emergência) é calculado de
+forma vetorizada antes do laço. O laço passo a passo trabalha apenas com
+floats do Python (sem np.ceil / np.clip / indexação de arrays NumPy). Se o
+numba estiver instalado, o mesmo laço é compilado com ``njit``.
+
+Quando as entradas se repetem por período (perfis diários replicados), o
+despacho é feito período a período e memorizado por (entradas do período, SOC
+inicial): como o SOC converge para um ciclo diário exato em poucos dias, as
+simulações longas passam a custar apenas esses primeiros dias.
+
+A política de despacho (participação do GMG por faixa de SOC, cobertura FV,
+divisão do déficit, horários) vem de uma estratégia declarada em
+``simulador_bess.estrategias`` e entra no laço como números e tabelas.
+"""
+import math
+
+import numpy as np
+
+from .constantes import (
+    ATIVAR_SUAVIZACAO_FV, EFICIENCIA_CARREGAMENTO, EFICIENCIA_DESCARREGAMENTO,
+    LIMIAR_SUAVIZACAO, POT_MAX_BESS_RECARREGAR, SFC, SOC_LIMITE_MAX,
+    SOC_LIMITE_MAX_SUA, SOC_LIMITE_MIN_EMERGENCIA, SOC_LIMITE_MIN_NORMAL,
+    SOC_RAMPA_INICIO,
+)
+from .estrategias import compilar_estrategia
+from .instrumentacao import fase, registrar_cache
+
+try:
+    from numba import njit
+except ImportError:  # numba é opcional: sem ele o laço roda em Python puro
+    njit = None
+
+
+def calcular_consumo_diesel(potencia_saida_kw):
+    """Calcula o consumo de diesel em L/h com base na potência gerada."""
+    return potencia_saida_kw * SFC
+
+
+def _laco_despacho(
+    carga, fv_bruta, fv_meta, diferenca_fv, periodo_noturno, recarga_fv_permitida, acima_emergencia,
+    potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw, bess_soc_kwh,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_potencia_max_por_unidade, passo_de_tempo_h,
+    limites_soc_gmg_noturno, participacao_gmg_noturno, cobertura_fv_minima, participacao_gmg_cobertura_fv,
+    soc_divisao_deficit, participacao_bess_deficit, participacao_gmg_deficit, ganho_acompanhamento_fv,
+    saida_potencia_bess, saida_soc_kwh, saida_gmg_potencia, saida_gmgs, saida_fv_para_carga
+):
+    """
+    Laço sequencial de despacho. Escreve os resultados de cada passo nos
+    vetores de saída e devolve o SOC final em kWh. As regras da estratégia
+    seguem a ordem de ``estrategias.compilar_estrategia``.
+    """
+    tem_capacidade = bess_capacidade_kwh > 1e-6
+    fv_presente = potencia_pico_fv_base > 0
+    soc_max_sua_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX_SUA / 100
+    soc_max_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX / 100
+    soc_min_normal_kwh = bess_capacidade_kwh * SOC_LIMITE_MIN_NORMAL / 100
+    soc_min_emergencia_kwh = bess_capacidade_kwh * SOC_LIMITE_MIN_EMERGENCIA / 100
+    potencia_carga_nominal = bess_potencia_max_kw * POT_MAX_BESS_RECARREGAR
+    capacidade_eficiente_total = numero_total_gmgs * gmg_potencia_max_por_unidade
+
+    for i in range(len(carga)):
+        potencia_carga_atual = carga[i]
+        geracao_fv_bruta = fv_bruta[i]
+        geracao_fv_meta = fv_meta[i]
+        soc_percentual_atual = (bess_soc_kwh / bess_capacidade_kwh) * 100 if tem_capacidade else 0.0
+
+        bess_potencia_disponivel_carga = potencia_carga_nominal
+        bess_potencia_disponivel_descarga = bess_potencia_max_kw
+        potencia_bess_suavizacao = 0.0
+
+        fator_rampa_carga = 1.0
+        if soc_percentual_atual > SOC_RAMPA_INICIO:
+            fator_rampa_carga = (SOC_LIMITE_MAX_SUA - soc_percentual_atual) / (SOC_LIMITE_MAX_SUA - SOC_RAMPA_INICIO)
+            fator_rampa_carga = max(0.0, min(1.0, fator_rampa_carga))
+
+        # Suavização FV (diferença já zerada fora da janela e abaixo do limiar)
+        diferenca = diferenca_fv[i]
+        if diferenca > 0:
+            potencia_carregamento = min(diferenca, bess_potencia_disponivel_carga) * fator_rampa_carga
+            espaco_disponivel_kwh = max(0.0, soc_max_sua_kwh - bess_soc_kwh)
+            energia_final_adicionada = min((potencia_carregamento * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO, espaco_disponivel_kwh)
+            if energia_final_adicionada > 0:
+                bess_soc_kwh += energia_final_adicionada
+                potencia_bess_suavizacao = (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h
+                bess_potencia_disponivel_carga -= potencia_bess_suavizacao
+        elif diferenca < 0:
+            potencia_descarga = min(-diferenca, bess_potencia_disponivel_descarga)
+            soc_min_kwh_atual = soc_min_emergencia_kwh if acima_emergencia[i] else soc_min_normal_kwh
+            energia_disponivel_kwh = max(0.0, bess_soc_kwh - soc_min_kwh_atual)
+            energia_final_removida = min((potencia_descarga * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO, energia_disponivel_kwh)
+            if energia_final_removida > 0:
+                bess_soc_kwh -= energia_final_removida
+                potencia_bess_suavizacao = -((energia_final_removida * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h)
+                bess_potencia_disponivel_descarga -= abs(potencia_bess_suavizacao)
+
+        bess_despacho_para_carga = 0.0
+        bess_carga_pelo_fv = 0.0
+        fv_despacho_para_carga = 0.0
+        soc_percentual_atual = (bess_soc_kwh / bess_capacidade_kwh) * 100 if tem_capacidade else 0.0
+        bess_pode_ajudar = fv_presente and (
+            soc_percentual_atual > SOC_LIMITE_MIN_NORMAL
+            or (acima_emergencia[i] and soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA)
+        )
+
+        if periodo_noturno[i]:
+            if bess_pode_ajudar:
+                # Primeira faixa cujo limite o SOC supera (a última participação se nenhum)
+                faixa = len(limites_soc_gmg_noturno)
+                for k in range(len(limites_soc_gmg_noturno)):
+                    if soc_percentual_atual > limites_soc_gmg_noturno[k]:
+                        faixa = k
+                        break
+                gmg_meta_para_carga = participacao_gmg_noturno[faixa] * potencia_carga_atual
+            else:
+                gmg_meta_para_carga = potencia_carga_atual
+
+            potencia_unitaria_a_usar = gmg_potencia_max_por_unidade
+            if not bess_pode_ajudar and gmg_meta_para_carga > capacidade_eficiente_total:
+                potencia_unitaria_a_usar = gmg_potencia_unitaria
+
+            gmgs_despachados = numero_total_gmgs
+            if potencia_unitaria_a_usar > 0:
+                gmgs_necessarios = float(math.ceil(gmg_meta_para_carga / potencia_unitaria_a_usar))
+                if gmgs_necessarios < numero_total_gmgs:
+                    gmgs_despachados = gmgs_necessarios
+            gmg_despacho_para_carga = min(gmg_meta_para_carga, gmgs_despachados * potencia_unitaria_a_usar)
+            if bess_pode_ajudar:
+                bess_despacho_para_carga = min(potencia_carga_atual - gmg_despacho_para_carga, bess_potencia_disponivel_descarga)
+        else:
+            if geracao_fv_meta >= (potencia_carga_atual * cobertura_fv_minima):
+                gmg_meta_para_carga = participacao_gmg_cobertura_fv * potencia_carga_atual
+                fv_despacho_para_carga = cobertura_fv_minima * potencia_carga_atual
+                bess_carga_pelo_fv = max(0.0, geracao_fv_bruta - fv_despacho_para_carga)
+            elif geracao_fv_meta > 0 and soc_percentual_atual > soc_divisao_deficit:
+                fv_despacho_para_carga = geracao_fv_meta
+                deficit = potencia_carga_atual - fv_despacho_para_carga
+                bess_despacho_para_carga = participacao_bess_deficit * deficit
+                gmg_meta_para_carga = participacao_gmg_deficit * deficit
+            else:
+                fv_despacho_para_carga = geracao_fv_meta
+                gmg_meta_para_carga = potencia_carga_atual - fv_despacho_para_carga
+
+                bess_potencia_variacao = 0.0
+                if soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA:
+                    bess_potencia_variacao = (geracao_fv_bruta - geracao_fv_meta) * ganho_acompanhamento_fv
+                    if bess_potencia_variacao < -bess_potencia_disponivel_carga:
+                        bess_potencia_variacao = -bess_potencia_disponivel_carga
+                    if bess_potencia_variacao > bess_potencia_disponivel_descarga:
+                        bess_potencia_variacao = bess_potencia_disponivel_descarga
+
+                # Acompanhamento da variação FV: altera apenas o SOC, não a potência reportada
+                if abs(bess_potencia_variacao) > 1e-3:
+                    energia_suavizacao = abs(bess_potencia_variacao) * passo_de_tempo_h
+                    if bess_potencia_variacao > 0:
+                        bess_soc_kwh = min(bess_soc_kwh + energia_suavizacao * EFICIENCIA_CARREGAMENTO, soc_max_kwh)
+                    else:
+                        bess_soc_kwh = max(bess_soc_kwh - energia_suavizacao / EFICIENCIA_DESCARREGAMENTO, soc_min_emergencia_kwh)
+
+            gmgs_despachados = numero_total_gmgs
+            if gmg_potencia_max_por_unidade > 0:
+                gmgs_necessarios = float(math.ceil(gmg_meta_para_carga / gmg_potencia_max_por_unidade))
+                if gmgs_necessarios < numero_total_gmgs:
+                    gmgs_despachados = gmgs_necessarios
+            gmg_despacho_para_carga = min(gmg_meta_para_carga, gmgs_despachados * gmg_potencia_max_por_unidade)
+            deficit_final = potencia_carga_atual - fv_despacho_para_carga - gmg_despacho_para_carga
+            bess_despacho_para_carga = max(bess_despacho_para_carga, deficit_final)
+
+        potencia_total_bess = potencia_bess_suavizacao
+        if bess_carga_pelo_fv > 0 and recarga_fv_permitida[i]:
+            potencia_carregamento_max_fv = min(bess_carga_pelo_fv, bess_potencia_disponivel_carga) * fator_rampa_carga
+            espaco_disponivel_kwh = max(0.0, soc_max_kwh - bess_soc_kwh)
+            energia_final_adicionada = min((potencia_carregamento_max_fv * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO, espaco_disponivel_kwh)
+            if energia_final_adicionada > 0:
+                bess_soc_kwh += energia_final_adicionada
+                potencia_total_bess += (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h
+
+        if bess_despacho_para_carga > 0 and ((bess_soc_kwh / bess_capacidade_kwh * 100) if tem_capacidade else 0.0) > SOC_LIMITE_MIN_EMERGENCIA:
+            potencia_descarga_necessaria = min(bess_despacho_para_carga, bess_potencia_disponivel_descarga)
+            energia_bruta_drenar = (potencia_descarga_necessaria * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO
+            energia_final_drenada = min(energia_bruta_drenar, max(0.0, bess_soc_kwh - soc_min_emergencia_kwh))
+            if energia_final_drenada > 0:
+                bess_soc_kwh -= energia_final_drenada
+                potencia_total_bess -= (energia_final_drenada * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h
+
+
+        saida_fv_para_carga[i] = min(fv_despacho_para_carga, geracao_fv_bruta)
+        saida_gmg_potencia[i] = gmg_despacho_para_carga
+        saida_gmgs[i] = gmgs_despachados
+        saida_potencia_bess[i] = potencia_total_bess
+        saida_soc_kwh[i] = bess_soc_kwh
+
+    return bess_soc_kwh
+
+
+if njit is not None:
+    _laco_despacho = njit(cache=True)(_laco_despacho)
+
+
+def preparar_entradas_despacho(vetor_tempo, vetor_carga, vetor_geracao_fv_original,
+                               vetor_geracao_fv_suavizada, potencia_pico_fv_base, carga_limite_emergencia,
+                               horarios=None):
+    """
+    Calcula, de forma vetorizada, as grandezas de cada passo que não dependem
+    do SOC: diferença FV a suavizar, período noturno, janela de recarga pelo
+    FV e carga acima do limite de emergência. Os vetores FV podem ser matrizes
+    (cenários x passos), com parâmetros em forma de coluna.
+
+    ``horarios`` são os horários de ``estrategias.compilar_estrategia``
+    (padrão: os da estratégia padrão); no lote, podem ser colunas.
+    """
+    if horarios is None:
+        horarios = compilar_estrategia()[0]
+    hora_inicio_diurno, hora_fim_diurno, hora_fim_recarga_fv, hora_inicio_suavizacao, hora_fim_suavizacao = horarios
+    hora_do_dia = vetor_tempo % 24
+    diferenca_fv = vetor_geracao_fv_original - vetor_geracao_fv_suavizada
+    if ATIVAR_SUAVIZACAO_FV:
+        # Ignorar variações pequenas e tudo que estiver fora da janela de suavização
+        diferenca_fv[np.abs(diferenca_fv) < LIMIAR_SUAVIZACAO * potencia_pico_fv_base] = 0
+        fora_da_janela = (hora_do_dia < hora_inicio_suavizacao) | (hora_do_dia >= hora_fim_suavizacao)
+        diferenca_fv[np.broadcast_to(fora_da_janela, diferenca_fv.shape)] = 0
+    else:
+        diferenca_fv[:] = 0
+    periodo_noturno = (hora_do_dia < hora_inicio_diurno) | (hora_do_dia >= hora_fim_diurno) | (vetor_geracao_fv_original <= 0)
+    recarga_fv_permitida = hora_do_dia < hora_fim_recarga_fv
+    acima_emergencia = vetor_carga > carga_limite_emergencia
+    return diferenca_fv, periodo_noturno, recarga_fv_permitida, acima_emergencia
+
+
+def executar_despacho(
+    vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+    potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw, soc_inicial_kwh,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+    carga_limite_emergencia, passo_de_tempo_h, passos_por_periodo=None, tanque_diesel_l=None,
+    memoria_periodos=None, estrategia=None
+):
+    """
+    Executa o despacho passo a passo sobre vetores de carga e FV já montados.
+    Retorna um dicionário com os vetores de saída, o diesel total consumido e o
+    SOC final (kWh), que pode ser usado para continuar a simulação.
+
+    Se ``passos_por_periodo`` for informado (ex.: passos de um dia), os períodos
+    com entradas idênticas e mesmo SOC inicial reaproveitam o resultado já
+    calculado em vez de repetir o laço. ``memoria_periodos`` (dict) permite
+    manter esses resultados entre chamadas, como nos blocos consecutivos de
+    uma simulação longa; a chave inclui os parâmetros escalares e as regras,
+    então a mesma memória pode ser passada com parâmetros diferentes.
+
+    Se ``tanque_diesel_l`` for informado, o nível do tanque é descontado ao fim
+    de cada período e a simulação para no passo em que o diesel acaba: os
+    vetores de saída terminam nesse passo e ``passo_esgotamento`` traz o
+    instante exato (fracionário, em passos) do esgotamento.
+
+    ``estrategia`` (dicionário ou nome, ver ``simulador_bess.estrategias``)
+    define a política de despacho; o padrão é ``ESTRATEGIA_PADRAO``.
+    """
+    numero_de_passos = len(vetor_carga)
+    horarios, regras = compilar_estrategia(estrategia)
+    entradas = (vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada) + preparar_entradas_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_fv_base, carga_limite_emergencia, horarios
+    )
+    if njit is None:
+        # Tabelas pequenas como tuplas: indexação mais rápida no laço interpretado
+        regras = tuple(tuple(r.tolist()) if isinstance(r, np.ndarray) else r for r in regras)
+    # Os dias memorizados só valem para os mesmos parâmetros e regras
+    chave_regras = tuple(tuple(r.tolist()) if isinstance(r, np.ndarray) else r for r in regras)
+    if njit is not None:
+        entradas = tuple(np.ascontiguousarray(v) for v in entradas)
+    parametros = (
+        float(potencia_pico_fv_base), float(bess_capacidade_kwh), float(bess_potencia_max_kw)
+    ), (
+        int(numero_total_gmgs), float(gmg_potencia_unitaria),
+        float(gmg_potencia_unitaria * gmg_fator_potencia_eficiente), float(passo_de_tempo_h)
+    )
+    chave_parametros = (parametros, chave_regras)
+    saidas = tuple(np.zeros(numero_de_passos) for _ in range(5))
+
+    if not passos_por_periodo or numero_de_passos % passos_por_periodo != 0:
+        passos_por_periodo = max(numero_de_passos, 1)
+
+    periodos_calculados = {} if memoria_periodos is None else memoria_periodos
+    soc_kwh = float(soc_inicial_kwh)
+    numero_de_passos_executados = numero_de_passos
+    passo_esgotamento = None
+    nivel_diesel_por_periodo = []
+    periodos_executados = periodos_reaproveitados = 0
+    with fase("despacho", numero_de_passos):
+        for inicio in range(0, numero_de_passos, passos_por_periodo):
+            fatia = slice(inicio, inicio + passos_por_periodo)
+            chave = (tuple(v[fatia].tobytes() for v in entradas), soc_kwh, chave_parametros)
+            if chave in periodos_calculados:
+                periodos_reaproveitados += 1
+            else:
+                periodos_executados += 1
+                if njit is not None:
+                    saidas_periodo = tuple(np.zeros(passos_por_periodo) for _ in range(5))
+                    entradas_periodo = tuple(v[fatia] for v in entradas)
+                else:
+                    # Listas de floats do Python são bem mais rápidas que arrays NumPy no laço interpretado
+                    saidas_periodo = tuple([0.0] * passos_por_periodo for _ in range(5))
+                    entradas_periodo = tuple(v[fatia].tolist() for v in entradas)
+                soc_final_periodo = _laco_despacho(
+                    *entradas_periodo, *parametros[0], soc_kwh, *parametros[1], *regras, *saidas_periodo
+                )
+                saidas_periodo = tuple(np.asarray(v, dtype=float) for v in saidas_periodo)
+                consumo_acumulado_periodo = np.cumsum(calcular_consumo_diesel(saidas_periodo[2]) * passo_de_tempo_h)
+                periodos_calculados[chave] = (saidas_periodo, soc_final_periodo, consumo_acumulado_periodo)
+            saidas_periodo, soc_kwh, consumo_acumulado_periodo = periodos_calculados[chave]
+            for saida, saida_periodo in zip(saidas, saidas_periodo):
+                saida[fatia] = saida_periodo
+
+            if tanque_diesel_l is not None:
+                if consumo_acumulado_periodo[-1] >= tanque_diesel_l:
+                    # O diesel acaba dentro deste período: localiza o passo e a fração do passo
+                    indice = int(np.searchsorted(consumo_acumulado_periodo, tanque_diesel_l))
+                    consumo_anterior = consumo_acumulado_periodo[indice - 1] if indice > 0 else 0.0
+                    gasto_passo = consumo_acumulado_periodo[indice] - consumo_anterior
+                    fracao_passo = (tanque_diesel_l - consumo_anterior) / gasto_passo if gasto_passo > 0 else 0.0
+                    passo_esgotamento = inicio + indice + fracao_passo
+                    numero_de_passos_executados = inicio + indice + 1
+                    soc_kwh = float(saidas[1][numero_de_passos_executados - 1])
+                    tanque_diesel_l = 0.0
+                    nivel_diesel_por_periodo.append(tanque_diesel_l)
+                    break
+                tanque_diesel_l -= consumo_acumulado_periodo[-1]
+                nivel_diesel_por_periodo.append(tanque_diesel_l)
+    registrar_cache("despacho.periodos", True, periodos_reaproveitados)
+    registrar_cache("despacho.periodos", False, periodos_executados)
+
+    vetor_potencia_bess, vetor_soc_kwh, vetor_gmg_potencia_despachada, vetor_gmgs_despachados, vetor_fv_para_carga = (
+        v[:numero_de_passos_executados] for v in saidas
+    )
+    # Acumulação sequencial (mesma ordem de soma do laço passo a passo)
+    gasto_passos_l = calcular_consumo_diesel(vetor_gmg_potencia_despachada) * passo_de_tempo_h
+    total_diesel_consumido_litros = float(np.cumsum(gasto_passos_l)[-1]) if numero_de_passos_executados > 0 else 0.0
+    return {
+        "vetor_potencia_bess": vetor_potencia_bess, "vetor_soc_kwh": vetor_soc_kwh,
+        "vetor_gmg_potencia_despachada": vetor_gmg_potencia_despachada,
+        "vetor_gmgs_despachados": vetor_gmgs_despachados, "vetor_fv_para_carga": vetor_fv_para_carga,
+        "total_diesel_consumido": total_diesel_consumido_litros, "soc_final_kwh": soc_kwh,
+        "tanque_diesel_final_l": tanque_diesel_l, "nivel_diesel_por_periodo": nivel_diesel_por_periodo,
+        "passo_esgotamento": passo_esgotamento,
+    }
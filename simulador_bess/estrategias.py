@@ -0,0 +1,145 @@
+"""
+Estratégias de despacho declaradas como tabelas de regras.
+
+Uma estratégia é um dicionário com os parâmetros da política aplicada pelo
+laço de despacho (ver ``ESTRATEGIA_PADRAO``): participação do GMG à noite por
+faixa de SOC, cobertura FV, divisão do déficit, ganho do acompanhamento da
+variação FV e horários. ``compilar_estrategia`` converte a estratégia nos
+números e arrays recebidos pelos kernels (``despacho._laco_despacho`` e
+``lote._laco_despacho_lote``): trocar de estratégia não muda o laço nem
+acrescenta chamadas Python por passo, e no lote cada cenário pode ter a sua
+(``compilar_estrategias_lote``), para comparar estratégias lado a lado.
+"""
+import numpy as np
+
+ESTRATEGIA_PADRAO = {
+    # Período noturno (ou sem FV) com o BESS disponível: participação do GMG na
+    # carga na primeira faixa em que o SOC (%) supera o limite (limites
+    # decrescentes); abaixo de todos, a última participação
+    "limites_soc_gmg_noturno": (75.0, 60.0, 50.0),
+    "participacao_gmg_noturno": (0.4, 0.5, 0.6, 0.65),
+    # Período diurno: se a meta FV cobre ao menos esta fração da carga, o FV
+    # atende essa fração, o GMG a sua participação e o excedente recarrega o BESS
+    "cobertura_fv_minima": 0.85,
+    "participacao_gmg_cobertura_fv": 0.15,
+    # Sem cobertura, com FV e SOC (%) acima do limite: divisão do déficit
+    "soc_divisao_deficit": 75.0,
+    "participacao_bess_deficit": 0.75,
+    "participacao_gmg_deficit": 0.25,
+    # Nos demais casos o BESS acompanha esta fração da variação FV (bruta - meta)
+    "ganho_acompanhamento_fv": 0.3,
+    # Horários (h): período diurno, recarga pelo FV e janela de suavização
+    "hora_inicio_diurno": 6.0,
+    "hora_fim_diurno": 17.0,
+    "hora_fim_recarga_fv": 17.0,
+    "hora_inicio_suavizacao": 6.0,
+    "hora_fim_suavizacao": 18.0,
+}
+
+# Estratégias prontas para comparação (variações da padrão)
+ESTRATEGIAS = {
+    "padrao": ESTRATEGIA_PADRAO,
+    "economia_diesel": {
+        **ESTRATEGIA_PADRAO,
+        "participacao_gmg_noturno": (0.2, 0.3, 0.45, 0.6),
+        "participacao_bess_deficit": 0.9, "participacao_gmg_deficit": 0.1,
+    },
+    "preservar_bess": {
+        **ESTRATEGIA_PADRAO,
+        "limites_soc_gmg_noturno": (80.0, 65.0),
+        "participacao_gmg_noturno": (0.6, 0.75, 0.9),
+        "soc_divisao_deficit": 85.0,
+        "participacao_bess_deficit": 0.5, "participacao_gmg_deficit": 0.5,
+    },
+}
+
+HORARIOS = ("hora_inicio_diurno", "hora_fim_diurno", "hora_fim_recarga_fv", "hora_inicio_suavizacao", "hora_fim_suavizacao")
+REGRAS_ESCALARES = (
+    "cobertura_fv_minima", "participacao_gmg_cobertura_fv", "soc_divisao_deficit",
+    "participacao_bess_deficit", "participacao_gmg_deficit", "ganho_acompanhamento_fv",
+)
+
+
+def definir_estrategia(estrategia=None, **alteracoes):
+    """
+    Estratégia completa e validada: ``estrategia`` (dicionário, nome de
+    ``ESTRATEGIAS`` ou None para a padrão) com ``alteracoes`` aplicadas. As
+    chaves ausentes vêm de ``ESTRATEGIA_PADRAO``.
+    """
+    if estrategia is None or isinstance(estrategia, str):
+        estrategia = ESTRATEGIAS[estrategia or "padrao"]
+    estrategia = {**ESTRATEGIA_PADRAO, **dict(estrategia), **alteracoes}
+    desconhecidas = set(estrategia) - set(ESTRATEGIA_PADRAO)
+    if desconhecidas:
+        raise ValueError(f"Regras desconhecidas na estratégia: {sorted(desconhecidas)}")
+    limites = tuple(float(v) for v in estrategia["limites_soc_gmg_noturno"])
+    participacoes = tuple(float(v) for v in estrategia["participacao_gmg_noturno"])
+    if len(participacoes) != len(limites) + 1:
+        raise ValueError("'participacao_gmg_noturno' deve ter uma participação a mais que os limites de SOC")
+    if any(a <= b for a, b in zip(limites, limites[1:])):
+        raise ValueError("'limites_soc_gmg_noturno' deve ser estritamente decrescente")
+    if any(not 0 <= float(estrategia[nome]) <= 24 for nome in HORARIOS):
+        raise ValueError("Horários da estratégia devem estar entre 0 e 24 h")
+    estrategia.update({nome: float(estrategia[nome]) for nome in HORARIOS + REGRAS_ESCALARES})
+    estrategia["limites_soc_gmg_noturno"] = limites
+    estrategia["participacao_gmg_noturno"] = participacoes
+    return estrategia
+
+
+def chave_estrategia(estrategia=None):
+    """Tupla imutável que identifica a estratégia (``dict(chave)`` a reconstrói)."""
+    return tuple(sorted(definir_estrategia(estrategia).items()))
+
+
+def compilar_estrategia(estrategia=None):
+    """
+    Converte a estratégia em ``(horarios, regras)``: os horários (na ordem de
+    ``HORARIOS``) usados por ``despacho.preparar_entradas_despacho`` e as
+    regras na ordem dos argumentos do kernel de despacho (limites e
+    participações noturnas como arrays, seguidos de ``REGRAS_ESCALARES``).
+    """
+    estrategia = definir_estrategia(estrategia)
+    horarios = tuple(estrategia[nome] for nome in HORARIOS)
+    regras = (
+        np.array(estrategia["limites_soc_gmg_noturno"], dtype=float),
+        np.array(estrategia["participacao_gmg_noturno"], dtype=float),
+    ) + tuple(estrategia[nome] for nome in REGRAS_ESCALARES)
+    return horarios, regras
+
+
+def compilar_estrategias_lote(estrategias, numero_de_cenarios):
+    """
+    Versão de ``compilar_estrategia`` para o lote: ``estrategias`` é uma
+    estratégia única ou uma sequência com uma por cenário. As regras viram
+    arrays por cenário (tabelas noturnas como matrizes cenários x faixas,
+    completadas à esquerda com limites infinitos, que nunca são superados) e
+    os horários viram colunas (cenários x 1), ou escalares se forem comuns.
+    """
+    if estrategias is None or isinstance(estrategias, (str, dict)):
+        estrategias = [estrategias] * numero_de_cenarios
+    if len(estrategias) != numero_de_cenarios:
+        raise ValueError("Informe uma estratégia por cenário")
+    # Cada estratégia distinta é compilada uma vez (lotes grandes repetem a
+    # mesma) e as tabelas por cenário são indexadas a partir delas
+    posicoes, compiladas, indice = {}, [], np.empty(numero_de_cenarios, dtype=np.intp)
+    for cenario, e in enumerate(estrategias):
+        chave = e if e is None or isinstance(e, str) else id(e)
+        if chave not in posicoes:
+            posicoes[chave] = len(compiladas)
+            compiladas.append(compilar_estrategia(e))
+        indice[cenario] = posicoes[chave]
+    numero_de_faixas = max(len(regras[0]) for _, regras in compiladas)
+    limites = np.full((len(compiladas), numero_de_faixas), np.inf)
+    participacoes = np.zeros((len(compiladas), numero_de_faixas + 1))
+    for distinta, (_, regras) in enumerate(compiladas):
+        completar = numero_de_faixas - len(regras[0])
+        limites[distinta, completar:] = regras[0]
+        participacoes[distinta, completar:] = regras[1]
+    escalares = tuple(np.array([regras[k] for _, regras in compiladas])[indice] for k in range(2, 2 + len(REGRAS_ESCALARES)))
+
+    horarios = np.array([h for h, _ in compiladas])
+    if np.all(horarios == horarios[0]):
+        horarios = tuple(float(v) for v in horarios[0])
+    else:
+        horarios = tuple(coluna[indice, None] for coluna in horarios.T)
+    return horarios, (limites[indice], participacoes[indice]) + escalares
@@ -0,0 +1,260 @@
+"""
+Simulação detalhada em etapas memorizadas: carga, FV bruta, FV suavizada,
+despacho e indicadores.
+
+Cada etapa declara os parâmetros de que depende e as etapas anteriores que
+usa; sua chave é formada pelos valores desses parâmetros e pelas chaves das
+etapas anteriores. Assim, mudar um parâmetro invalida apenas a etapa que o
+usa e as seguintes (ex.: ``carga_limite_emergencia`` ou a estratégia de
+despacho refazem o despacho e os indicadores, mas reaproveitam os perfis).
+
+Mudar só ``dias_simulacao`` reaproveita a trajetória já calculada com os
+mesmos parâmetros: os dias iniciais em comum são mantidos e o despacho
+continua do SOC em que eles terminam. O último dia do horizonte é sempre
+refeito, pois sua carga na última hora difere da de um dia intermediário
+(ver ``montar_vetor_carga``). O resultado é idêntico ao de
+``simular_detalhado``.
+"""
+import threading
+
+import numpy as np
+
+from .colunar import compactar_resultado
+from .constantes import EFICIENCIA_FV, INTERVALOS_POR_HORA
+from .degradacao import indicadores_degradacao
+from .despacho import calcular_consumo_diesel, executar_despacho
+from .frota import simular_frota
+from .estrategias import chave_estrategia
+from .instrumentacao import fase, registrar_cache
+from .perfis import (
+    PASSOS_POR_DIA, montar_vetor_carga, montar_vetor_tempo, perfil_fv_24h_normalizado,
+    semente_ruido_fv, suavizar_fv_circular, janela_suavizacao_passos,
+)
+
+# Etapa -> (parâmetros de que depende, etapas anteriores). 'dias_simulacao'
+# entra no despacho pela carga, para a trajetória poder ser estendida
+ETAPAS = {
+    "carga": (("dias_simulacao",), ()),
+    "fv_bruta": (("potencia_pico_fv_base", "fator_irradiacao", "use_noise"), ()),
+    "fv_suavizada": ((), ("fv_bruta",)),
+    "despacho": ((
+        "potencia_pico_fv_base", "bess_capacidade_kwh", "bess_potencia_max_kw", "soc_inicial_fracao",
+        "numero_total_gmgs", "gmg_potencia_unitaria", "gmg_fator_potencia_eficiente", "carga_limite_emergencia",
+        "estrategia",
+    ), ("carga", "fv_bruta", "fv_suavizada")),
+    "indicadores": (("bess_capacidade_kwh", "numero_total_gmgs", "gmg_potencia_unitaria"), ("carga", "despacho")),
+}
+
+# Entradas guardadas por etapa (as menos usadas recentemente saem primeiro).
+# 'trajetoria' e 'periodos' guardam a última trajetória e os dias já
+# despachados de cada conjunto de parâmetros, para estender o horizonte
+LIMITE_ENTRADAS_PADRAO = 16
+LIMITE_ENTRADAS = {"despacho": 4, "trajetoria": 4, "periodos": 8}
+
+_AUSENTE = object()
+# A memória pode ser compartilhada entre sessões e cálculos em segundo plano
+_trava = threading.Lock()
+
+
+def _consultar(memoria, etapa, chave):
+    with _trava:
+        entradas = memoria.setdefault(etapa, {})
+        valor = entradas.pop(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            return False, None
+        entradas[chave] = valor  # volta para o fim (mais recente)
+        return True, valor
+
+
+def _guardar(memoria, etapa, chave, valor):
+    with _trava:
+        entradas = memoria.setdefault(etapa, {})
+        entradas[chave] = valor
+        while len(entradas) > LIMITE_ENTRADAS.get(etapa, LIMITE_ENTRADAS_PADRAO):
+            del entradas[next(iter(entradas))]
+
+
+def _somente_leitura(resultado):
+    for valor in resultado.values():
+        if isinstance(valor, np.ndarray):
+            valor.flags.writeable = False
+    return resultado
+
+
+def _replicar_dia(perfil_dia, dias_simulacao):
+    vetor = np.tile(perfil_dia, dias_simulacao)
+    vetor.flags.writeable = False
+    return vetor
+
+
+def _etapa_carga(parametros, anteriores, memoria, chaves):
+    dias_simulacao = parametros["dias_simulacao"]
+    return {"vetor_tempo": montar_vetor_tempo(dias_simulacao), "vetor_carga": montar_vetor_carga(dias_simulacao)}
+
+
+def _etapa_fv_bruta(parametros, anteriores, memoria, chaves):
+    # Mesma conta de montar_perfis_fv_dia, separada da suavização
+    potencia_pico_fv_curto = parametros["potencia_pico_fv_base"] * EFICIENCIA_FV * parametros["fator_irradiacao"]
+    perfil_normalizado = perfil_fv_24h_normalizado(semente_ruido_fv(parametros["use_noise"]))
+    return {"geracao_fv_dia": np.maximum(0, np.multiply.outer(potencia_pico_fv_curto, perfil_normalizado))}
+
+
+def _etapa_fv_suavizada(parametros, anteriores, memoria, chaves):
+    return {"geracao_fv_suavizada_dia": suavizar_fv_circular(
+        anteriores["fv_bruta"]["geracao_fv_dia"], janela_suavizacao_passos())}
+
+
+def _etapa_despacho(parametros, anteriores, memoria, chaves):
+    dias_simulacao = parametros["dias_simulacao"]
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    parametros_despacho = chaves["despacho"][0]
+    chave_perfis = (chaves["fv_bruta"], chaves["fv_suavizada"])
+    # Dias já despachados: valem para qualquer SOC inicial e horizonte
+    chave_periodos = (parametros_despacho[:3] + parametros_despacho[4:], chave_perfis)
+    chave_trajetoria = (parametros_despacho, chave_perfis)
+
+    encontrado, memoria_periodos = _consultar(memoria, "periodos", chave_periodos)
+    if not encontrado:
+        memoria_periodos = {}
+        _guardar(memoria, "periodos", chave_periodos, memoria_periodos)
+
+    # Dias iniciais reaproveitados de uma trajetória anterior (sem o último dia dela)
+    dias_reaproveitados = 0
+    soc_kwh = parametros["bess_capacidade_kwh"] * parametros["soc_inicial_fracao"]
+    encontrado, anterior = _consultar(memoria, "trajetoria", chave_trajetoria)
+    if encontrado:
+        dias_reaproveitados = min(anterior["dias_simulacao"], dias_simulacao) - 1
+        if dias_reaproveitados > 0:
+            soc_kwh = float(anterior["vetor_soc_kwh"][dias_reaproveitados * PASSOS_POR_DIA - 1])
+        dias_reaproveitados = max(dias_reaproveitados, 0)
+    registrar_cache("etapa:despacho.dias", True, dias_reaproveitados)
+    registrar_cache("etapa:despacho.dias", False, dias_simulacao - dias_reaproveitados)
+
+    passos_reaproveitados = dias_reaproveitados * PASSOS_POR_DIA
+    dias_novos = dias_simulacao - dias_reaproveitados
+    trecho = slice(passos_reaproveitados, None)
+    resultado_despacho = executar_despacho(
+        anteriores["carga"]["vetor_tempo"][trecho], anteriores["carga"]["vetor_carga"][trecho],
+        _replicar_dia(anteriores["fv_bruta"]["geracao_fv_dia"], dias_novos),
+        _replicar_dia(anteriores["fv_suavizada"]["geracao_fv_suavizada_dia"], dias_novos),
+        parametros["potencia_pico_fv_base"], parametros["bess_capacidade_kwh"], parametros["bess_potencia_max_kw"],
+        soc_kwh, parametros["numero_total_gmgs"], parametros["gmg_potencia_unitaria"],
+        parametros["gmg_fator_potencia_eficiente"], parametros["carga_limite_emergencia"], passo_de_tempo_h,
+        passos_por_periodo=PASSOS_POR_DIA, memoria_periodos=memoria_periodos,
+        estrategia=dict(parametros["estrategia"])
+    )
+
+    resultado = {"dias_simulacao": dias_simulacao}
+    for nome in ("vetor_potencia_bess", "vetor_soc_kwh", "vetor_gmg_potencia_despachada",
+                 "vetor_gmgs_despachados", "vetor_fv_para_carga"):
+        if dias_reaproveitados:
+            resultado[nome] = np.concatenate((anterior[nome][:passos_reaproveitados], resultado_despacho[nome]))
+        else:
+            resultado[nome] = resultado_despacho[nome]
+    # Soma sequencial sobre o horizonte inteiro (mesma ordem de uma execução única)
+    gasto_passos_l = calcular_consumo_diesel(resultado["vetor_gmg_potencia_despachada"]) * passo_de_tempo_h
+    resultado["total_diesel_consumido"] = float(np.cumsum(gasto_passos_l)[-1]) if len(gasto_passos_l) else 0.0
+    resultado["soc_final_kwh"] = resultado_despacho["soc_final_kwh"]
+    _somente_leitura(resultado)
+    _guardar(memoria, "trajetoria", chave_trajetoria, resultado)
+    return resultado
+
+
+def _etapa_indicadores(parametros, anteriores, memoria, chaves):
+    despacho = anteriores["despacho"]
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    vetor_carga = anteriores["carga"]["vetor_carga"]
+    energia_carga_kwh = float(np.sum(vetor_carga)) * passo_de_tempo_h
+    energia_fv_para_carga_kwh = float(np.sum(despacho["vetor_fv_para_carga"])) * passo_de_tempo_h
+    soc_percentual = despacho["vetor_soc_kwh"] / max(parametros["bess_capacidade_kwh"], 1e-6) * 100
+    return {
+        "diesel_total_l": despacho["total_diesel_consumido"],
+        "energia_carga_kwh": energia_carga_kwh,
+        "energia_fv_para_carga_kwh": energia_fv_para_carga_kwh,
+        "energia_gmg_kwh": float(np.sum(despacho["vetor_gmg_potencia_despachada"])) * passo_de_tempo_h,
+        "energia_bess_descarga_kwh": float(np.sum(np.maximum(0, -despacho["vetor_potencia_bess"]))) * passo_de_tempo_h,
+        "fracao_fv": energia_fv_para_carga_kwh / energia_carga_kwh if energia_carga_kwh > 0 else 0.0,
+        "soc_minimo_pct": float(soc_percentual.min()) if len(soc_percentual) else None,
+        "soc_maximo_pct": float(soc_percentual.max()) if len(soc_percentual) else None,
+        "degradacao": indicadores_degradacao(
+            despacho["vetor_soc_kwh"], parametros["bess_capacidade_kwh"], parametros["dias_simulacao"]),
+        "frota_gmg": simular_frota(
+            despacho["vetor_gmg_potencia_despachada"], despacho["vetor_gmgs_despachados"],
+            parametros["numero_total_gmgs"], parametros["gmg_potencia_unitaria"], passo_de_tempo_h),
+    }
+
+
+CALCULOS_ETAPAS = {
+    "carga": _etapa_carga,
+    "fv_bruta": _etapa_fv_bruta,
+    "fv_suavizada": _etapa_fv_suavizada,
+    "despacho": _etapa_despacho,
+    "indicadores": _etapa_indicadores,
+}
+
+
+def simular_detalhado_em_etapas(
+    dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise, memoria_etapas=None, estrategia=None
+):
+    """
+    Mesma simulação de ``simular_detalhado`` (com a mesma ``estrategia`` de
+    despacho), executada pelas etapas de ``ETAPAS``. ``memoria_etapas`` (dict) guarda os resultados de cada etapa
+    entre chamadas; sem ele nada é reaproveitado.
+
+    Retorna o mesmo resultado colunar de ``simular_detalhado`` mais
+    'indicadores' (diesel, energias, fração FV, faixa de SOC, degradação do
+    BESS e frota de GMGs). A memória guarda as etapas em float64, então estender o horizonte
+    continua do SOC exato; só o resultado devolvido é compacto.
+    """
+    parametros = {
+        "dias_simulacao": int(dias_simulacao), "potencia_pico_fv_base": potencia_pico_fv_base,
+        "fator_irradiacao": fator_irradiacao, "bess_capacidade_kwh": bess_capacidade_kwh,
+        "bess_potencia_max_kw": bess_potencia_max_kw, "soc_inicial_fracao": soc_inicial_fracao,
+        "numero_total_gmgs": numero_total_gmgs, "gmg_potencia_unitaria": gmg_potencia_unitaria,
+        "gmg_fator_potencia_eficiente": gmg_fator_potencia_eficiente,
+        "carga_limite_emergencia": carga_limite_emergencia, "use_noise": bool(use_noise),
+        "estrategia": chave_estrategia(estrategia),
+    }
+    memoria = {} if memoria_etapas is None else memoria_etapas
+    chaves = {}
+    resultados = {}
+
+    def chave(etapa):
+        if etapa not in chaves:
+            nomes, anteriores = ETAPAS[etapa]
+            chaves[etapa] = (tuple(parametros[nome] for nome in nomes), tuple(chave(a) for a in anteriores))
+        return chaves[etapa]
+
+    def executar(etapa):
+        if etapa not in resultados:
+            encontrado, resultado = _consultar(memoria, etapa, chave(etapa))
+            registrar_cache(f"etapa:{etapa}", encontrado)
+            if not encontrado:
+                anteriores = {a: executar(a) for a in ETAPAS[etapa][1]}
+                with fase(f"etapa.{etapa}"):
+                    resultado = _somente_leitura(CALCULOS_ETAPAS[etapa](parametros, anteriores, memoria, chaves))
+                _guardar(memoria, etapa, chave(etapa), resultado)
+            resultados[etapa] = resultado
+        return resultados[etapa]
+
+    indicadores = executar("indicadores")
+    carga, despacho = executar("carga"), executar("despacho")
+    fv_bruta, fv_suavizada = executar("fv_bruta"), executar("fv_suavizada")
+    return compactar_resultado({
+        "vetor_carga": carga["vetor_carga"],
+        "vetor_geracao_fv_original": _replicar_dia(fv_bruta["geracao_fv_dia"], dias_simulacao),
+        "vetor_geracao_fv_suavizada": _replicar_dia(fv_suavizada["geracao_fv_suavizada_dia"], dias_simulacao),
+        "vetor_gmg_potencia_despachada": despacho["vetor_gmg_potencia_despachada"],
+        "vetor_potencia_bess": despacho["vetor_potencia_bess"],
+        "vetor_soc_kwh": despacho["vetor_soc_kwh"],
+        "vetor_gmgs_despachados": despacho["vetor_gmgs_despachados"],
+        "potencia_pico_fv_curto": potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao,
+        "numero_de_passos": dias_simulacao * PASSOS_POR_DIA,
+        "vetor_fv_para_carga": despacho["vetor_fv_para_carga"],
+        "total_diesel_consumido": despacho["total_diesel_consumido"],
+        "degradacao": indicadores["degradacao"],
+        "frota_gmg": indicadores["frota_gmg"],
+        "indicadores": indicadores,
+    }, 1.0 / INTERVALOS_POR_HORA)
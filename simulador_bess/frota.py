@@ -0,0 +1,172 @@
+"""
+Frota de GMGs unidade a unidade: partidas, horas de operação e consumo pela
+curva de carga parcial.
+
+O despacho decide a potência total dos GMGs e quantos são necessários em
+cada passo. A frota liga as unidades em ordem fixa (a unidade 1 é a base e
+a última só entra nos picos) e aplica a cada uma os tempos mínimos ligada
+(``TEMPO_MINIMO_LIGADO_GMG_H``: uma unidade que parte fica ligada ao menos
+esse tempo) e desligada (``TEMPO_MINIMO_DESLIGADO_GMG_H``: paradas mais curtas
+não acontecem, a unidade segue ligada). As unidades ligadas dividem a
+potência igualmente.
+
+O consumo vem de ``CURVA_CONSUMO_GMG`` (L/h por kW nominal em função da
+fração de carga), convertida uma vez em uma tabela de passo uniforme: a
+consulta de cada passo é um índice e uma interpolação linear, sem avaliar a
+curva. Cada partida soma ``CONSUMO_PARTIDA_GMG_L_POR_KW``. As unidades antes
+do primeiro passo são consideradas desligadas.
+
+Todas as operações são vetorizadas sobre as unidades e, no lote, sobre os
+cenários (matrizes cenários x passos).
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from .constantes import (
+    CONSUMO_PARTIDA_GMG_L_POR_KW, CURVA_CONSUMO_GMG, TEMPO_MINIMO_DESLIGADO_GMG_H,
+    TEMPO_MINIMO_LIGADO_GMG_H,
+)
+
+# Pontos da tabela de consumo (frações de carga de 0 a 1 em passo uniforme)
+PONTOS_TABELA_CONSUMO = 1025
+
+
+@lru_cache(maxsize=8)
+def tabela_consumo(curva=tuple(CURVA_CONSUMO_GMG.items()), pontos=PONTOS_TABELA_CONSUMO):
+    """
+    Consumo (L/h por kW nominal) nas frações de carga ``linspace(0, 1,
+    pontos)``, interpolado dos pontos ``(fração, consumo)`` da curva.
+    """
+    fracoes, consumos = (np.array(v, dtype=float) for v in zip(*sorted(curva)))
+    tabela = np.interp(np.linspace(0.0, 1.0, pontos), fracoes, consumos)
+    tabela.flags.writeable = False
+    return tabela
+
+
+def consultar_tabela(tabela, fracao_carga):
+    """Consumo da tabela nas frações de carga (limitadas a 0–1), por interpolação linear."""
+    posicao = np.clip(fracao_carga, 0.0, 1.0) * (len(tabela) - 1)
+    indice = np.minimum(posicao.astype(np.intp), len(tabela) - 2)
+    return tabela[indice] + (posicao - indice) * (tabela[indice + 1] - tabela[indice])
+
+
+def _eventos(contagem, anterior):
+    """Passos e unidades das partidas (contagem > anterior) na ordem de partida."""
+    passos = np.flatnonzero(contagem > anterior)
+    quantidades = (contagem - anterior)[passos]
+    primeiras = np.repeat(np.cumsum(quantidades) - quantidades, quantidades)
+    unidades = np.repeat(anterior[passos], quantidades) + np.arange(len(primeiras)) - primeiras
+    return np.repeat(passos, quantidades), unidades
+
+
+def periodos_ligada(vetor_gmgs, passos_minimo_ligado, passos_minimo_desligado):
+    """
+    Períodos em que cada unidade fica ligada: as ``vetor_gmgs`` primeiras
+    unidades da ordem de partida, com os tempos mínimos aplicados. Trabalha
+    só com as partidas e paradas (não passo a passo por unidade). Devolve
+    arrays ``(cenario, unidade, inicio, fim)``, com ``fim`` exclusivo, para
+    ``vetor_gmgs`` com forma (cenários, passos).
+    """
+    vetor_gmgs = np.asarray(vetor_gmgs, dtype=np.int64)
+    numero_de_cenarios, numero_de_passos = vetor_gmgs.shape
+    # Cenários em sequência, separados por passos desligados: os períodos
+    # de um cenário não se juntam aos do seguinte
+    largura = numero_de_passos + max(passos_minimo_desligado, 1)
+    contagem = np.zeros((numero_de_cenarios, largura), dtype=np.int64)
+    contagem[:, :numero_de_passos] = vetor_gmgs
+    contagem = contagem.ravel()
+    anterior = np.concatenate(([0], contagem[:-1]))
+    inicios, unidades = _eventos(contagem, anterior)
+    fins, unidades_fim = _eventos(anterior, contagem)
+    # O k-ésimo início de uma unidade termina na k-ésima parada dela
+    ordem_inicio = np.lexsort((inicios, unidades))
+    ordem_fim = np.lexsort((fins, unidades_fim))
+    unidades, inicios, fins = unidades[ordem_inicio], inicios[ordem_inicio], fins[ordem_fim]
+
+    # Tempo mínimo ligada, sem passar do fim do cenário
+    fim_do_cenario = inicios // largura * largura + numero_de_passos
+    fins = np.minimum(np.maximum(fins, inicios + passos_minimo_ligado), fim_do_cenario)
+
+    # Tempo mínimo desligada: paradas mais curtas unem os períodos. Cada
+    # unidade ocupa um trecho próprio do eixo, para os períodos não se unirem
+    deslocamento = unidades * (len(contagem) + passos_minimo_desligado + 1)
+    fins_acumulados = np.maximum.accumulate(fins + deslocamento)
+    novos = np.flatnonzero(inicios[1:] + deslocamento[1:] - fins_acumulados[:-1] >= passos_minimo_desligado) + 1
+    primeiros = np.concatenate(([0], novos)) if len(inicios) else novos
+    ultimos = np.concatenate((novos - 1, [len(inicios) - 1])) if len(inicios) else novos
+    unidades = unidades[primeiros]
+    inicios = inicios[primeiros]
+    fins = fins_acumulados[ultimos] - deslocamento[primeiros]
+    cenarios = inicios // largura
+    return cenarios, unidades, inicios - cenarios * largura, fins - cenarios * largura
+
+
+def simular_frota(
+    vetor_gmg_potencia, vetor_gmgs, numero_total_gmgs, gmg_potencia_unitaria, passo_de_tempo_h,
+    curva=None, tempo_minimo_ligado_h=TEMPO_MINIMO_LIGADO_GMG_H,
+    tempo_minimo_desligado_h=TEMPO_MINIMO_DESLIGADO_GMG_H
+):
+    """
+    Operação unidade a unidade da frota para a potência e o número de GMGs
+    do despacho (vetores, ou matrizes cenários x passos com os parâmetros
+    por cenário). ``curva`` substitui ``CURVA_CONSUMO_GMG``.
+
+    Retorna um dicionário com 'diesel_total_l' (curva de carga parcial mais
+    partidas), 'diesel_partidas_l', 'partidas_por_unidade' e
+    'horas_por_unidade' (última dimensão: unidades, na ordem de partida) e
+    'fator_carga_medio' (fração média da potência nominal das unidades
+    ligadas). No lote, os totais têm um valor por cenário.
+    """
+    vetor_gmg_potencia = np.asarray(vetor_gmg_potencia, dtype=float)
+    lote = vetor_gmg_potencia.ndim > 1
+    numero_total_gmgs = np.asarray(numero_total_gmgs, dtype=float)
+    gmg_potencia_unitaria = np.asarray(gmg_potencia_unitaria, dtype=float)
+    if lote:
+        numero_total_gmgs, gmg_potencia_unitaria = (
+            np.broadcast_to(v, vetor_gmg_potencia.shape[:1]) for v in (numero_total_gmgs, gmg_potencia_unitaria))
+    potencia_unitaria = gmg_potencia_unitaria[:, None] if lote else gmg_potencia_unitaria
+    tabela = tabela_consumo() if curva is None else tabela_consumo(tuple(dict(curva).items()))
+
+    numero_de_unidades = int(np.max(numero_total_gmgs, initial=0))
+    vetor_gmgs = np.asarray(vetor_gmgs).reshape(-1, vetor_gmg_potencia.shape[-1])
+    cenarios, unidades, inicios, fins = periodos_ligada(
+        vetor_gmgs, math.ceil(tempo_minimo_ligado_h / passo_de_tempo_h - 1e-9),
+        math.ceil(tempo_minimo_desligado_h / passo_de_tempo_h - 1e-9))
+    numero_de_cenarios, numero_de_passos = vetor_gmgs.shape
+    por_unidade = cenarios * numero_de_unidades + unidades
+    formato_por_unidade = (numero_de_cenarios, numero_de_unidades) if lote else (numero_de_unidades,)
+    partidas_por_unidade = np.bincount(por_unidade, minlength=numero_de_cenarios * numero_de_unidades).reshape(formato_por_unidade)
+    horas_por_unidade = np.bincount(
+        por_unidade, weights=fins - inicios, minlength=numero_de_cenarios * numero_de_unidades
+    ).reshape(formato_por_unidade) * passo_de_tempo_h
+
+    # Unidades ligadas em cada passo (partidas menos paradas acumuladas)
+    linha = cenarios * (numero_de_passos + 1)
+    variacao = (np.bincount(linha + inicios, minlength=numero_de_cenarios * (numero_de_passos + 1))
+                - np.bincount(linha + fins, minlength=numero_de_cenarios * (numero_de_passos + 1)))
+    numero_ligadas = np.cumsum(variacao.reshape(numero_de_cenarios, -1), axis=-1)[:, :numero_de_passos]
+    numero_ligadas = numero_ligadas.reshape(vetor_gmg_potencia.shape)
+
+    # Potência dividida igualmente entre as unidades ligadas
+    potencia_nominal_ligada = numero_ligadas * potencia_unitaria
+    fracao_carga = np.divide(vetor_gmg_potencia, potencia_nominal_ligada,
+                             out=np.zeros_like(vetor_gmg_potencia), where=potencia_nominal_ligada > 0)
+    consumo_curva_l = (potencia_nominal_ligada * consultar_tabela(tabela, fracao_carga)).sum(axis=-1) * passo_de_tempo_h
+    diesel_partidas_l = partidas_por_unidade.sum(axis=-1) * CONSUMO_PARTIDA_GMG_L_POR_KW * gmg_potencia_unitaria
+
+    passos_ligadas = numero_ligadas.sum(axis=-1)
+    fator_carga_medio = np.divide((fracao_carga * numero_ligadas).sum(axis=-1), passos_ligadas,
+                                  out=np.zeros(np.shape(passos_ligadas)), where=passos_ligadas > 0)
+    diesel_total_l = consumo_curva_l + diesel_partidas_l
+    if not lote:
+        diesel_total_l, diesel_partidas_l, fator_carga_medio = (
+            float(v) for v in (diesel_total_l, diesel_partidas_l, fator_carga_medio))
+    return {
+        "diesel_total_l": diesel_total_l,
+        "diesel_partidas_l": diesel_partidas_l,
+        "partidas_por_unidade": partidas_por_unidade,
+        "horas_por_unidade": horas_por_unidade,
+        "fator_carga_medio": fator_carga_medio,
+    }
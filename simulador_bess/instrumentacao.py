@@ -0,0 +1,149 @@
+"""
+Instrumentação opcional do simulador: tempo e número de chamadas por fase,
+acertos e faltas por cache e passos simulados por segundo.
+
+Desativada por padrão. Ative com ``ativar_instrumentacao()`` ou com a
+variável de ambiente ``SIMULADOR_BESS_INSTRUMENTACAO=1``. Desativada, cada
+``fase`` custa apenas a checagem de uma flag e devolve um contexto vazio; as
+fases ficam em volta das funções (nunca dentro do laço passo a passo).
+
+Os dados são do processo inteiro (todas as sessões do app) e podem ser
+exportados como JSON (``relatorio``) ou como trace do Chrome
+(``trace_chrome``, aberto em chrome://tracing ou no Perfetto).
+"""
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# Eventos individuais guardados para o trace (os mais antigos são descartados)
+MAXIMO_EVENTOS = 100_000
+
+_ativa = os.environ.get("SIMULADOR_BESS_INSTRUMENTACAO", "") not in ("", "0")
+_trava = threading.Lock()
+_fases = {}  # nome -> [chamadas, tempo_s, passos]
+_caches = {}  # nome -> [acertos, faltas]
+_caches_lru = {}  # nome -> (função com lru_cache, cache_info no último zerar)
+_eventos = deque(maxlen=MAXIMO_EVENTOS)
+_origem = time.perf_counter()
+_CONTEXTO_VAZIO = contextlib.nullcontext()
+
+
+def ativar_instrumentacao(ativa=True):
+    global _ativa
+    _ativa = bool(ativa)
+
+
+def instrumentacao_ativa():
+    return _ativa
+
+
+def zerar_instrumentacao():
+    """Descarta tudo o que foi medido até agora."""
+    with _trava:
+        _fases.clear()
+        _caches.clear()
+        _eventos.clear()
+        for nome, (funcao, _) in _caches_lru.items():
+            _caches_lru[nome] = (funcao, funcao.cache_info())
+
+
+class _Fase:
+    __slots__ = ("nome", "passos", "inicio")
+
+    def __init__(self, nome, passos):
+        self.nome = nome
+        self.passos = passos
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        fim = time.perf_counter()
+        with _trava:
+            acumulado = _fases.setdefault(self.nome, [0, 0.0, 0])
+            acumulado[0] += 1
+            acumulado[1] += fim - self.inicio
+            acumulado[2] += self.passos
+            _eventos.append((self.nome, self.inicio, fim, self.passos, os.getpid(), threading.get_ident()))
+        return False
+
+
+def fase(nome, passos=0):
+    """
+    Contexto que mede uma fase (tempo de parede, chamadas e ``passos``
+    simulados). Sem instrumentação ativa, devolve um contexto vazio.
+    """
+    if not _ativa:
+        return _CONTEXTO_VAZIO
+    return _Fase(nome, passos)
+
+
+def registrar_cache(nome, acerto, quantidade=1):
+    """Conta ``quantidade`` acertos (``acerto=True``) ou faltas no cache ``nome``."""
+    if not _ativa or not quantidade:
+        return
+    with _trava:
+        _caches.setdefault(nome, [0, 0])[0 if acerto else 1] += quantidade
+
+
+def faltas_cache(nome):
+    with _trava:
+        return _caches.get(nome, (0, 0))[1]
+
+
+def observar_cache_lru(nome, funcao):
+    """Inclui no relatório os acertos e faltas de uma função com ``lru_cache``."""
+    with _trava:
+        _caches_lru[nome] = (funcao, funcao.cache_info())
+
+
+def relatorio():
+    """Resumo por fase e por cache (dicionário serializável em JSON)."""
+    with _trava:
+        fases = {
+            nome: {
+                "chamadas": chamadas, "tempo_total_s": tempo_s, "tempo_medio_s": tempo_s / chamadas,
+                "passos": passos, "passos_por_s": passos / tempo_s if passos and tempo_s > 0 else None,
+            }
+            for nome, (chamadas, tempo_s, passos) in sorted(_fases.items(), key=lambda item: -item[1][1])
+        }
+        contagens = {nome: tuple(contagem) for nome, contagem in _caches.items()}
+        for nome, (funcao, inicial) in _caches_lru.items():
+            atual = funcao.cache_info()
+            if atual.hits < inicial.hits or atual.misses < inicial.misses:
+                inicial = atual._replace(hits=0, misses=0)  # cache_clear() zerou as contagens
+            contagens[nome] = (atual.hits - inicial.hits, atual.misses - inicial.misses)
+    caches = {
+        nome: {"acertos": acertos, "faltas": faltas,
+               "taxa_acerto": acertos / (acertos + faltas) if acertos + faltas else None}
+        for nome, (acertos, faltas) in sorted(contagens.items())
+    }
+    return {"fases": fases, "caches": caches}
+
+
+def trace_chrome():
+    """Eventos no formato Trace Event do Chrome (um evento "X" por fase medida)."""
+    with _trava:
+        eventos = list(_eventos)
+    return {
+        "traceEvents": [
+            {"name": nome, "cat": "simulador_bess", "ph": "X", "pid": pid, "tid": tid,
+             "ts": (inicio - _origem) * 1e6, "dur": (fim - inicio) * 1e6, "args": {"passos": passos}}
+            for nome, inicio, fim, passos, pid, tid in eventos
+        ],
+        "displayTimeUnit": "ms",
+    }
+
+
+def exportar_json(caminho):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio(), arquivo, indent=2)
+
+
+def exportar_trace_chrome(caminho):
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(trace_chrome(), arquivo)
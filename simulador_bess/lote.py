@@ -0,0 +1,301 @@
+"""
+Simulação em lote: vários conjuntos de parâmetros avançam juntos no tempo.
+
+O estado (SOC) de todos os cenários é um único vetor NumPy e cada passo de
+tempo aplica a mesma lógica de ``despacho._laco_despacho`` com operações
+vetorizadas (np.where / np.minimum / np.maximum) sobre o eixo de cenários.
+O custo interpretado passa a ser por passo de tempo, não por cenário.
+As regras da estratégia de despacho (``simulador_bess.estrategias``) são
+arrays por cenário, então estratégias diferentes rodam no mesmo lote.
+"""
+import numpy as np
+
+from .constantes import (
+    EFICIENCIA_CARREGAMENTO, EFICIENCIA_DESCARREGAMENTO, EFICIENCIA_FV,
+    INTERVALOS_POR_HORA, POT_MAX_BESS_RECARREGAR, SOC_LIMITE_MAX,
+    SOC_LIMITE_MAX_SUA, SOC_LIMITE_MIN_EMERGENCIA, SOC_LIMITE_MIN_NORMAL,
+    SOC_RAMPA_INICIO,
+)
+from .despacho import calcular_consumo_diesel, preparar_entradas_despacho
+from .estrategias import compilar_estrategias_lote
+from .frota import simular_frota
+from .instrumentacao import fase
+from .perfis import (
+    montar_perfis_fv_dia, montar_vetor_carga, montar_vetor_tempo,
+    semente_ruido_fv,
+)
+
+
+def _laco_despacho_lote(
+    carga, fv_bruta, fv_meta, diferenca_fv, periodo_noturno, recarga_fv_permitida, acima_emergencia,
+    potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw, bess_soc_kwh,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_potencia_max_por_unidade, passo_de_tempo_h,
+    regras, ao_progredir=None
+):
+    """
+    Versão vetorizada (eixo 0 = cenários, eixo 1 = passos) do laço de despacho.
+    A carga pode ser comum a todos os cenários (eixo de passos apenas) ou uma
+    matriz; a janela de recarga FV é comum, a menos que as estratégias tenham
+    horários diferentes.
+    ``regras`` vem de ``estrategias.compilar_estrategias_lote``. Devolve as
+    matrizes de saída e o vetor de SOC final.
+    """
+    numero_de_cenarios, numero_de_passos = fv_bruta.shape
+    # Internamente os passos ficam no eixo 0, para que cada passo leia/escreva uma linha contígua
+    fv_bruta, fv_meta, diferenca_fv, periodo_noturno, acima_emergencia = (
+        np.ascontiguousarray(v.T) for v in (fv_bruta, fv_meta, diferenca_fv, periodo_noturno, acima_emergencia)
+    )
+    carga, recarga_fv_permitida = (np.ascontiguousarray(np.asarray(v).T) for v in (carga, recarga_fv_permitida))
+    (limites_soc_gmg_noturno, participacao_gmg_noturno, cobertura_fv_minima, participacao_gmg_cobertura_fv,
+     soc_divisao_deficit, participacao_bess_deficit, participacao_gmg_deficit, ganho_acompanhamento_fv) = regras
+    faixas_noturnas = tuple(zip(limites_soc_gmg_noturno.T, participacao_gmg_noturno.T))[::-1]
+    participacao_gmg_abaixo = participacao_gmg_noturno[:, -1]
+    tem_capacidade = bess_capacidade_kwh > 1e-6
+    capacidade_divisor = np.where(tem_capacidade, bess_capacidade_kwh, 1.0)
+    fv_presente = potencia_pico_fv_base > 0
+    soc_max_sua_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX_SUA / 100
+    soc_max_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX / 100
+    soc_min_normal_kwh = bess_capacidade_kwh * SOC_LIMITE_MIN_NORMAL / 100
+    soc_min_emergencia_kwh = bess_capacidade_kwh * SOC_LIMITE_MIN_EMERGENCIA / 100
+    potencia_carga_nominal = bess_potencia_max_kw * POT_MAX_BESS_RECARREGAR
+    capacidade_eficiente_total = numero_total_gmgs * gmg_potencia_max_por_unidade
+
+    saida_potencia_bess = np.zeros((numero_de_passos, numero_de_cenarios))
+    saida_soc_kwh = np.zeros((numero_de_passos, numero_de_cenarios))
+    saida_gmg_potencia = np.zeros((numero_de_passos, numero_de_cenarios))
+    saida_gmgs = np.zeros((numero_de_passos, numero_de_cenarios))
+    saida_fv_para_carga = np.zeros((numero_de_passos, numero_de_cenarios))
+
+    def soc_percentual(soc_kwh):
+        return np.where(tem_capacidade, (soc_kwh / capacidade_divisor) * 100, 0.0)
+
+    def gmgs_para_meta(gmg_meta, potencia_unitaria):
+        divisor = np.where(potencia_unitaria > 0, potencia_unitaria, 1.0)
+        gmgs = np.where(potencia_unitaria > 0, np.minimum(numero_total_gmgs, np.ceil(gmg_meta / divisor)), numero_total_gmgs)
+        return gmgs, np.minimum(gmg_meta, gmgs * potencia_unitaria)
+
+    for i in range(numero_de_passos):
+        potencia_carga_atual = carga[i]
+        geracao_fv_bruta = fv_bruta[i]
+        geracao_fv_meta = fv_meta[i]
+        emergencia = acima_emergencia[i]
+        soc_percentual_atual = soc_percentual(bess_soc_kwh)
+
+        bess_potencia_disponivel_carga = potencia_carga_nominal
+        bess_potencia_disponivel_descarga = bess_potencia_max_kw
+
+        fator_rampa_carga = np.where(
+            soc_percentual_atual > SOC_RAMPA_INICIO,
+            np.maximum(0.0, np.minimum(1.0, (SOC_LIMITE_MAX_SUA - soc_percentual_atual) / (SOC_LIMITE_MAX_SUA - SOC_RAMPA_INICIO))),
+            1.0
+        )
+
+        # Suavização FV (diferença já zerada fora da janela e abaixo do limiar)
+        diferenca = diferenca_fv[i]
+        energia_final_adicionada = np.minimum(
+            ((np.minimum(diferenca, bess_potencia_disponivel_carga) * fator_rampa_carga) * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO,
+            np.maximum(0.0, soc_max_sua_kwh - bess_soc_kwh)
+        )
+        carregando = (diferenca > 0) & (energia_final_adicionada > 0)
+        soc_min_kwh_atual = np.where(emergencia, soc_min_emergencia_kwh, soc_min_normal_kwh)
+        energia_final_removida = np.minimum(
+            (np.minimum(-diferenca, bess_potencia_disponivel_descarga) * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO,
+            np.maximum(0.0, bess_soc_kwh - soc_min_kwh_atual)
+        )
+        descarregando = (diferenca < 0) & (energia_final_removida > 0)
+        potencia_bess_suavizacao = np.where(
+            carregando, (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h,
+            np.where(descarregando, -((energia_final_removida * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h), 0.0)
+        )
+        bess_soc_kwh = np.where(carregando, bess_soc_kwh + energia_final_adicionada,
+                                np.where(descarregando, bess_soc_kwh - energia_final_removida, bess_soc_kwh))
+        bess_potencia_disponivel_carga = np.where(carregando, bess_potencia_disponivel_carga - potencia_bess_suavizacao, bess_potencia_disponivel_carga)
+        bess_potencia_disponivel_descarga = np.where(descarregando, bess_potencia_disponivel_descarga - np.abs(potencia_bess_suavizacao), bess_potencia_disponivel_descarga)
+
+        soc_percentual_atual = soc_percentual(bess_soc_kwh)
+        bess_pode_ajudar = fv_presente & (
+            (soc_percentual_atual > SOC_LIMITE_MIN_NORMAL)
+            | (emergencia & (soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA))
+        )
+        noturno = periodo_noturno[i]
+
+        # Período noturno (ou sem FV): participação do GMG na primeira faixa de
+        # SOC superada (percorridas da última para a primeira)
+        participacao_gmg = participacao_gmg_abaixo
+        for limite, participacao in faixas_noturnas:
+            participacao_gmg = np.where(soc_percentual_atual > limite, participacao, participacao_gmg)
+        gmg_meta_noturno = np.where(bess_pode_ajudar, participacao_gmg * potencia_carga_atual, potencia_carga_atual)
+        potencia_unitaria_a_usar = np.where(
+            ~bess_pode_ajudar & (gmg_meta_noturno > capacidade_eficiente_total),
+            gmg_potencia_unitaria, gmg_potencia_max_por_unidade
+        )
+        gmgs_noturno, gmg_despacho_noturno = gmgs_para_meta(gmg_meta_noturno, potencia_unitaria_a_usar)
+        bess_despacho_noturno = np.where(
+            bess_pode_ajudar, np.minimum(potencia_carga_atual - gmg_despacho_noturno, bess_potencia_disponivel_descarga), 0.0
+        )
+
+        # Período diurno: cobertura FV, divisão do déficit ou acompanhamento da variação FV
+        cobertura_fv = geracao_fv_meta >= (potencia_carga_atual * cobertura_fv_minima)
+        divisao_deficit = ~cobertura_fv & (geracao_fv_meta > 0) & (soc_percentual_atual > soc_divisao_deficit)
+        acompanhamento = ~noturno & ~cobertura_fv & ~divisao_deficit
+        fv_coberto = cobertura_fv_minima * potencia_carga_atual
+        fv_despacho_para_carga = np.where(noturno, 0.0, np.where(cobertura_fv, fv_coberto, geracao_fv_meta))
+        deficit = potencia_carga_atual - geracao_fv_meta
+        gmg_meta_diurno = np.where(cobertura_fv, participacao_gmg_cobertura_fv * potencia_carga_atual,
+                                   np.where(divisao_deficit, participacao_gmg_deficit * deficit, deficit))
+        bess_despacho_diurno = np.where(divisao_deficit, participacao_bess_deficit * deficit, 0.0)
+        bess_carga_pelo_fv = np.where(~noturno & cobertura_fv, np.maximum(0.0, geracao_fv_bruta - fv_coberto), 0.0)
+
+        bess_potencia_variacao = np.where(
+            soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA,
+            np.minimum(np.maximum((geracao_fv_bruta - geracao_fv_meta) * ganho_acompanhamento_fv, -bess_potencia_disponivel_carga), bess_potencia_disponivel_descarga),
+            0.0
+        )
+        energia_suavizacao = np.abs(bess_potencia_variacao) * passo_de_tempo_h
+        acompanhamento &= np.abs(bess_potencia_variacao) > 1e-3
+        bess_soc_kwh = np.where(
+            acompanhamento,
+            np.where(bess_potencia_variacao > 0,
+                     np.minimum(bess_soc_kwh + energia_suavizacao * EFICIENCIA_CARREGAMENTO, soc_max_kwh),
+                     np.maximum(bess_soc_kwh - energia_suavizacao / EFICIENCIA_DESCARREGAMENTO, soc_min_emergencia_kwh)),
+            bess_soc_kwh
+        )
+
+        gmgs_diurno, gmg_despacho_diurno = gmgs_para_meta(gmg_meta_diurno, gmg_potencia_max_por_unidade)
+        bess_despacho_diurno = np.maximum(bess_despacho_diurno, potencia_carga_atual - fv_despacho_para_carga - gmg_despacho_diurno)
+
+        gmgs_despachados = np.where(noturno, gmgs_noturno, gmgs_diurno)
+        gmg_despacho_para_carga = np.where(noturno, gmg_despacho_noturno, gmg_despacho_diurno)
+        bess_despacho_para_carga = np.where(noturno, bess_despacho_noturno, bess_despacho_diurno)
+
+        # Recarga do BESS com o excedente FV
+        potencia_total_bess = potencia_bess_suavizacao
+        recarga_permitida = recarga_fv_permitida[i]
+        if recarga_permitida.any():
+            energia_final_adicionada = np.minimum(
+                ((np.minimum(bess_carga_pelo_fv, bess_potencia_disponivel_carga) * fator_rampa_carga) * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO,
+                np.maximum(0.0, soc_max_kwh - bess_soc_kwh)
+            )
+            carregando = (bess_carga_pelo_fv > 0) & (energia_final_adicionada > 0)
+            if recarga_permitida.ndim:
+                carregando &= recarga_permitida
+            bess_soc_kwh = np.where(carregando, bess_soc_kwh + energia_final_adicionada, bess_soc_kwh)
+            potencia_total_bess = np.where(carregando, potencia_total_bess + (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h, potencia_total_bess)
+
+        # Descarga do BESS para a carga
+        energia_final_drenada = np.minimum(
+            (np.minimum(bess_despacho_para_carga, bess_potencia_disponivel_descarga) * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO,
+            np.maximum(0.0, bess_soc_kwh - soc_min_emergencia_kwh)
+        )
+        descarregando = (bess_despacho_para_carga > 0) & (soc_percentual(bess_soc_kwh) > SOC_LIMITE_MIN_EMERGENCIA) & (energia_final_drenada > 0)
+        bess_soc_kwh = np.where(descarregando, bess_soc_kwh - energia_final_drenada, bess_soc_kwh)
+        potencia_total_bess = np.where(descarregando, potencia_total_bess - (energia_final_drenada * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h, potencia_total_bess)
+
+        saida_fv_para_carga[i] = np.minimum(fv_despacho_para_carga, geracao_fv_bruta)
+        saida_gmg_potencia[i] = gmg_despacho_para_carga
+        saida_gmgs[i] = gmgs_despachados
+        saida_potencia_bess[i] = potencia_total_bess
+        saida_soc_kwh[i] = bess_soc_kwh
+
+        if ao_progredir is not None:
+            ao_progredir(i + 1, numero_de_passos)
+
+    saidas = (saida_potencia_bess, saida_soc_kwh, saida_gmg_potencia, saida_gmgs, saida_fv_para_carga)
+    return tuple(np.ascontiguousarray(v.T) for v in saidas), bess_soc_kwh
+
+
+def simular_lote(
+    dias_simulacao,
+    potencia_pico_fv_base,
+    fator_irradiacao,
+    bess_capacidade_kwh,
+    bess_potencia_max_kw,
+    soc_inicial_fracao,
+    numero_total_gmgs,
+    gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente,
+    carga_limite_emergencia,
+    use_noise,
+    ao_progredir=None,
+    estrategia=None,
+    fator_carga=1.0,
+    frota=False
+):
+    """
+    Executa a simulação detalhada para vários cenários de uma só vez.
+
+    Os parâmetros de cenário aceitam escalares ou arrays (um valor por
+    cenário), combinados por broadcasting. ``dias_simulacao`` e ``use_noise``
+    são comuns ao lote. ``ao_progredir(passo, total)`` é chamado a cada passo
+    de tempo, se informado.
+
+    ``estrategia`` é uma estratégia de despacho (dicionário ou nome, ver
+    ``simulador_bess.estrategias``) comum ao lote, ou uma lista com uma por
+    cenário, para comparar estratégias na mesma execução. ``fator_carga``
+    escala o perfil de carga (escalar ou um valor por cenário). Com
+    ``frota``, inclui 'frota_gmg' (``frota.simular_frota`` por cenário:
+    diesel pela curva de carga parcial, horas e partidas por unidade).
+
+    Retorna um dicionário com as mesmas chaves de ``_run_simulation_detailed``;
+    os vetores por cenário viram matrizes (cenários x passos) e os totais
+    viram vetores (um valor por cenário).
+    """
+    estrategia_por_cenario = estrategia is not None and not isinstance(estrategia, (str, dict))
+    (potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh, bess_potencia_max_kw,
+     soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+     carga_limite_emergencia, fator_carga, *_) = (np.array(v, dtype=float) for v in np.broadcast_arrays(
+        *(np.atleast_1d(v) for v in (
+            potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh, bess_potencia_max_kw,
+            soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+            carga_limite_emergencia, fator_carga)),
+        *([np.zeros(len(estrategia))] if estrategia_por_cenario else [])
+    ))
+    horarios, regras = compilar_estrategias_lote(estrategia, len(soc_inicial_fracao))
+
+    numero_de_passos = dias_simulacao * 24 * INTERVALOS_POR_HORA
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    vetor_tempo = montar_vetor_tempo(dias_simulacao)
+    vetor_carga = montar_vetor_carga(dias_simulacao)
+    if np.any(fator_carga != 1.0):
+        vetor_carga = np.multiply.outer(fator_carga, vetor_carga)
+
+    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
+    with fase("perfil_fv"):
+        geracao_fv_dia, geracao_fv_suavizada_dia = montar_perfis_fv_dia(potencia_pico_fv_curto, semente_ruido_fv(use_noise))
+    vetor_geracao_fv_original = np.tile(geracao_fv_dia, dias_simulacao)
+    vetor_geracao_fv_suavizada = np.tile(geracao_fv_suavizada_dia, dias_simulacao)
+
+    diferenca_fv, periodo_noturno, recarga_fv_permitida, acima_emergencia = preparar_entradas_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_fv_base[:, None], carga_limite_emergencia[:, None], horarios
+    )
+    with fase("despacho_lote", numero_de_passos * len(soc_inicial_fracao)):
+        saidas, soc_final_kwh = _laco_despacho_lote(
+            vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+            diferenca_fv, periodo_noturno, recarga_fv_permitida, acima_emergencia,
+            potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw,
+            bess_capacidade_kwh * soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+            gmg_potencia_unitaria * gmg_fator_potencia_eficiente, passo_de_tempo_h,
+            regras, ao_progredir=ao_progredir
+        )
+    vetor_potencia_bess, vetor_soc_kwh, vetor_gmg_potencia_despachada, vetor_gmgs_despachados, vetor_fv_para_carga = saidas
+
+    # Acumulação sequencial por cenário (mesma ordem de soma do laço passo a passo)
+    gasto_passos_l = calcular_consumo_diesel(vetor_gmg_potencia_despachada) * passo_de_tempo_h
+    total_diesel_consumido = np.cumsum(gasto_passos_l, axis=1)[:, -1] if numero_de_passos > 0 else np.zeros(len(soc_final_kwh))
+
+    resultado = {
+        "vetor_tempo": vetor_tempo, "vetor_carga": vetor_carga,
+        "vetor_geracao_fv_original": vetor_geracao_fv_original, "vetor_geracao_fv_suavizada": vetor_geracao_fv_suavizada,
+        "vetor_gmg_potencia_despachada": vetor_gmg_potencia_despachada, "vetor_potencia_bess": vetor_potencia_bess,
+        "vetor_soc_kwh": vetor_soc_kwh, "vetor_gmgs_despachados": vetor_gmgs_despachados,
+        "potencia_pico_fv_curto": potencia_pico_fv_curto, "numero_de_passos": numero_de_passos,
+        "vetor_fv_para_carga": vetor_fv_para_carga, "total_diesel_consumido": total_diesel_consumido,
+        "soc_final_kwh": soc_final_kwh
+    }
+    if frota:
+        with fase("frota_lote", numero_de_passos * len(soc_inicial_fracao)):
+            resultado["frota_gmg"] = simular_frota(
+                vetor_gmg_potencia_despachada, vetor_gmgs_despachados, numero_total_gmgs,
+                gmg_potencia_unitaria, passo_de_tempo_h)
+    return resultado
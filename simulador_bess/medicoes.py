@@ -0,0 +1,189 @@
+"""
+Séries medidas de carga e FV (ex.: SCADA em resolução de 1 min) lidas de
+CSV ou Parquet e reamostradas para a resolução do modelo.
+
+A leitura é feita por colunas e em blocos de linhas (pandas para CSV,
+pyarrow para Parquet quando disponível). Cada bloco é acumulado em somas e
+contagens por intervalo de simulação com ``np.bincount``, então a memória
+depende do número de intervalos de saída, não do número de linhas do arquivo.
+"""
+import numpy as np
+
+from .constantes import EFICIENCIA_FV, INTERVALOS_POR_HORA
+from .despacho import executar_despacho
+from .perfis import janela_suavizacao_passos, suavizar_fv
+from .simulacao import montar_resultado_detalhado
+
+LINHAS_POR_BLOCO = 1_000_000
+NANOSSEGUNDOS_POR_HORA = 3_600_000_000_000
+NANOSSEGUNDOS_POR_DIA = 24 * NANOSSEGUNDOS_POR_HORA
+
+
+def _ler_blocos(caminho, colunas, linhas_por_bloco, opcoes_leitura):
+    """Gera DataFrames com apenas ``colunas``, um bloco de linhas por vez."""
+    import pandas as pd
+
+    if str(caminho).lower().endswith((".parquet", ".pq")):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            # Sem pyarrow o pandas lê o arquivo de uma vez (ex.: com fastparquet)
+            yield pd.read_parquet(caminho, columns=colunas, **opcoes_leitura)
+            return
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=linhas_por_bloco, columns=colunas):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, usecols=colunas, chunksize=linhas_por_bloco, **opcoes_leitura)
+
+
+def _instantes_ns(coluna, formato_tempo):
+    """Converte a coluna de tempo em nanossegundos (horário local do registro)."""
+    import pandas as pd
+
+    instantes = pd.to_datetime(coluna, format=formato_tempo)
+    if getattr(instantes.dt, "tz", None) is not None:
+        instantes = instantes.dt.tz_localize(None)
+    return instantes.to_numpy(dtype="datetime64[ns]").view(np.int64)
+
+
+def ler_series_medidas(
+    caminho, coluna_tempo, colunas, inicio=None, fim=None, formato_tempo=None,
+    intervalos_por_hora=INTERVALOS_POR_HORA, linhas_por_bloco=LINHAS_POR_BLOCO, **opcoes_leitura
+):
+    """
+    Lê ``colunas`` (e a coluna de tempo) de um CSV ou Parquet e devolve as
+    médias por intervalo de simulação.
+
+    O tempo de saída é contado em horas desde a 0h do dia de ``inicio`` (ou do
+    primeiro registro), para que a hora do dia seja preservada. Registros fora
+    de [``inicio``, ``fim``) e valores não numéricos são ignorados; intervalos
+    sem nenhum registro são preenchidos por interpolação linear. Informando
+    ``inicio`` e ``fim``, arquivos diferentes (ex.: carga e FV) saem alinhados.
+    ``opcoes_leitura`` é repassado ao ``pd.read_csv`` (ex.: ``sep=';'``,
+    ``decimal=','``).
+
+    Retorna (vetor_tempo, {coluna: vetor}).
+    """
+    import pandas as pd
+
+    colunas = [colunas] if isinstance(colunas, str) else list(colunas)
+    passo_ns = NANOSSEGUNDOS_POR_HORA // intervalos_por_hora
+    inicio_ns = None if inicio is None else int(pd.Timestamp(inicio).value)
+    fim_ns = None if fim is None else int(pd.Timestamp(fim).value)
+    referencia_ns = None if inicio_ns is None else inicio_ns - inicio_ns % NANOSSEGUNDOS_POR_DIA
+
+    somas = {coluna: np.zeros(0) for coluna in colunas}
+    contagens = {coluna: np.zeros(0) for coluna in colunas}
+    for bloco in _ler_blocos(caminho, [coluna_tempo] + colunas, linhas_por_bloco, opcoes_leitura):
+        instantes = _instantes_ns(bloco[coluna_tempo], formato_tempo)
+        validos = np.ones(len(instantes), dtype=bool)
+        if inicio_ns is not None:
+            validos &= instantes >= inicio_ns
+        if fim_ns is not None:
+            validos &= instantes < fim_ns
+        if not validos.any():
+            continue
+        if referencia_ns is None:
+            primeiro = int(instantes[validos].min())
+            referencia_ns = primeiro - primeiro % NANOSSEGUNDOS_POR_DIA
+        indices = (instantes - referencia_ns) // passo_ns
+        if (indices[validos] < 0).any():
+            raise ValueError(f"{caminho}: registros anteriores ao primeiro dia lido; informe 'inicio'")
+
+        for coluna in colunas:
+            valores = pd.to_numeric(bloco[coluna], errors="coerce").to_numpy(dtype=float)
+            usar = validos & np.isfinite(valores)
+            tamanho = int(indices[usar].max()) + 1 if usar.any() else 0
+            if tamanho > len(somas[coluna]):
+                somas[coluna] = np.concatenate([somas[coluna], np.zeros(tamanho - len(somas[coluna]))])
+                contagens[coluna] = np.concatenate([contagens[coluna], np.zeros(tamanho - len(contagens[coluna]))])
+            somas[coluna][:tamanho] += np.bincount(indices[usar], weights=valores[usar], minlength=tamanho)
+            contagens[coluna][:tamanho] += np.bincount(indices[usar], minlength=tamanho)
+
+    if referencia_ns is None or not any(contagens[coluna].any() for coluna in colunas):
+        raise ValueError(f"{caminho}: nenhum registro válido em {colunas}")
+
+    # Janela de saída: [inicio, fim) se informados, senão do primeiro ao último intervalo com dados
+    contagem_total = np.zeros(max(len(contagens[coluna]) for coluna in colunas))
+    for coluna in colunas:
+        contagem_total[:len(contagens[coluna])] += contagens[coluna]
+    com_dados = np.flatnonzero(contagem_total)
+    primeiro_indice = (inicio_ns - referencia_ns) // passo_ns if inicio_ns is not None else int(com_dados[0])
+    fim_indice = -(-(fim_ns - referencia_ns) // passo_ns) if fim_ns is not None else int(com_dados[-1]) + 1
+    indices_saida = np.arange(primeiro_indice, fim_indice)
+
+    series = {}
+    for coluna in colunas:
+        soma = np.zeros(fim_indice)
+        contagem = np.zeros(fim_indice)
+        limite = min(fim_indice, len(somas[coluna]))
+        soma[:limite] = somas[coluna][:limite]
+        contagem[:limite] = contagens[coluna][:limite]
+        preenchidos = np.flatnonzero(contagem > 0)
+        if len(preenchidos) == 0:
+            raise ValueError(f"{caminho}: coluna '{coluna}' sem valores válidos no período")
+        medias = soma[preenchidos] / contagem[preenchidos]
+        series[coluna] = np.interp(indices_saida, preenchidos, medias)
+
+    vetor_tempo = indices_saida * (1.0 / intervalos_por_hora)
+    return vetor_tempo, series
+
+
+def fv_de_irradiancia(irradiancia_w_m2, potencia_pico_fv_base):
+    """Geração FV (kW) estimada a partir da irradiância no plano (W/m²)."""
+    return np.maximum(0.0, np.asarray(irradiancia_w_m2, dtype=float)) / 1000 * potencia_pico_fv_base * EFICIENCIA_FV
+
+
+def intervalos_por_hora_da_serie(vetor_tempo):
+    """
+    Resolução (intervalos por hora) de um ``vetor_tempo`` em horas. O passo
+    deve ser uniforme e dividir a hora em um número inteiro de intervalos;
+    com menos de dois instantes, vale a resolução do modelo.
+    """
+    if len(vetor_tempo) < 2:
+        return INTERVALOS_POR_HORA
+    passos_h = np.diff(vetor_tempo)
+    passo_h = float(passos_h[0])
+    if passo_h <= 0 or not np.allclose(passos_h, passo_h, rtol=1e-6, atol=1e-9):
+        raise ValueError("vetor_tempo deve ser crescente e com passo uniforme (ex.: saída de ler_series_medidas)")
+    intervalos_por_hora = round(1.0 / passo_h)
+    if intervalos_por_hora < 1 or abs(intervalos_por_hora * passo_h - 1.0) > 1e-6:
+        raise ValueError(f"Passo de {passo_h * 60:g} min não divide a hora em intervalos inteiros")
+    return intervalos_por_hora
+
+
+def simular_series_medidas(
+    vetor_tempo, vetor_carga, vetor_geracao_fv_original, potencia_pico_fv_base,
+    bess_capacidade_kwh, bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs,
+    gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia, estrategia=None
+):
+    """
+    Executa o despacho sobre séries medidas no lugar dos perfis sintéticos.
+    ``vetor_tempo`` em horas com a hora do dia preservada (como em
+    ``ler_series_medidas``) e FV em kW. O passo de tempo (e a janela de
+    suavização do FV) vem de ``vetor_tempo``, que deve ter passo uniforme.
+
+    Retorna o mesmo resultado colunar de ``simular_detalhado`` (com
+    'degradacao' e 'frota_gmg'), com o ``vetor_tempo`` medido como coluna.
+    """
+    vetor_tempo = np.asarray(vetor_tempo, dtype=float)
+    vetor_carga = np.asarray(vetor_carga, dtype=float)
+    vetor_geracao_fv_original = np.maximum(0.0, np.asarray(vetor_geracao_fv_original, dtype=float))
+    if not (len(vetor_tempo) == len(vetor_carga) == len(vetor_geracao_fv_original)):
+        raise ValueError("vetor_tempo, vetor_carga e vetor_geracao_fv_original devem ter o mesmo tamanho")
+    intervalos_por_hora = intervalos_por_hora_da_serie(vetor_tempo)
+    passo_de_tempo_h = 1.0 / intervalos_por_hora
+    vetor_geracao_fv_suavizada = suavizar_fv(vetor_geracao_fv_original, janela_suavizacao_passos(intervalos_por_hora))
+
+    resultado_despacho = executar_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw,
+        bess_capacidade_kwh * soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, passo_de_tempo_h,
+        passos_por_periodo=24 * intervalos_por_hora, estrategia=estrategia
+    )
+    return montar_resultado_detalhado(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, resultado_despacho,
+        float(vetor_geracao_fv_original.max(initial=0.0)), bess_capacidade_kwh, numero_total_gmgs,
+        gmg_potencia_unitaria, passo_de_tempo_h, tempo_implicito=False
+    )
@@ -0,0 +1,175 @@
+"""
+Monte Carlo da autonomia do diesel com sequências estocásticas de clima.
+
+Os tipos de dia (céu aberto, nublado, tempestade, sem sol) seguem uma cadeia
+de Markov cuja distribuição estacionária são os pesos anuais (40/35/20/5%).
+Como o despacho de um dia depende apenas do tipo do dia e do SOC no início
+dele, cada tipo é simulado uma única vez, em lote, sobre uma grade de SOC
+inicial (tabela de transição diária). As trajetórias avançam todas juntas,
+dia a dia, interpolando essa tabela; milhares de trajetórias custam o mesmo
+que algumas centenas de simulações de um dia.
+"""
+import numpy as np
+
+from .anual import FATORES_E_PESOS_ANUAIS
+from .constantes import CAPACIDADE_TOTAL_DIESEL_L, DIAS_SIMULACAO_LONGA, INTERVALOS_POR_HORA
+from .despacho import calcular_consumo_diesel
+from .instrumentacao import fase
+from .lote import simular_lote
+from .perfis import PASSOS_POR_DIA
+
+# Probabilidade de um dia repetir o tipo do dia anterior (além do sorteio pelos pesos)
+PERSISTENCIA_CLIMA = 0.5
+# Pontos da grade de SOC inicial (0 a 100%) da tabela de transição diária
+PONTOS_GRADE_SOC = 257
+PERCENTIS = (10, 50, 90)
+DIAS_ANO = 365
+
+
+def ajustar_cadeia_clima(pesos, persistencia=PERSISTENCIA_CLIMA):
+    """
+    Matriz de transição entre tipos de dia cuja distribuição estacionária são
+    os ``pesos``: com probabilidade ``persistencia`` o dia repete o tipo do
+    anterior; caso contrário o tipo é sorteado pelos pesos.
+    """
+    pesos = np.asarray(pesos, dtype=float)
+    pesos = pesos / pesos.sum()
+    return persistencia * np.eye(len(pesos)) + (1 - persistencia) * np.tile(pesos, (len(pesos), 1))
+
+
+def gerar_sequencias_clima(numero_trajetorias, dias, matriz_transicao, distribuicao_inicial, gerador):
+    """Sorteia as sequências de tipos de dia (dias x trajetórias) pela cadeia de Markov."""
+    acumulada = np.cumsum(matriz_transicao, axis=1)
+    acumulada[:, -1] = 1.0
+    acumulada_inicial = np.cumsum(distribuicao_inicial) / np.sum(distribuicao_inicial)
+    acumulada_inicial[-1] = 1.0
+
+    sequencias = np.empty((dias, numero_trajetorias), dtype=np.intp)
+    estado = np.searchsorted(acumulada_inicial, gerador.random(numero_trajetorias), side='right')
+    for dia in range(dias):
+        sequencias[dia] = estado
+        estado = (gerador.random(numero_trajetorias)[:, None] >= acumulada[estado]).sum(axis=1)
+    return sequencias
+
+
+def tabela_transicao_diaria(
+    potencia_pico_base_fv, fatores_irradiacao, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    use_noise=True, pontos_grade_soc=PONTOS_GRADE_SOC
+):
+    """
+    Simula, em um único lote, um dia de cada tipo para cada SOC inicial da
+    grade (fração de 0 a 1). Retorna a grade, o SOC final em fração (tipos x
+    pontos) e o diesel acumulado passo a passo ao longo do dia, em L (tipos x
+    pontos x passos).
+    """
+    grade_soc = np.linspace(0.0, 1.0, pontos_grade_soc)
+    numero_de_tipos = len(fatores_irradiacao)
+    resultado = simular_lote(
+        1, potencia_pico_base_fv, np.repeat(fatores_irradiacao, pontos_grade_soc),
+        bess_capacidade_kwh, bess_potencia_max_kw, np.tile(grade_soc, numero_de_tipos),
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+        carga_limite_emergencia, use_noise
+    )
+    diesel_acumulado = np.cumsum(
+        calcular_consumo_diesel(resultado["vetor_gmg_potencia_despachada"]) * (1.0 / INTERVALOS_POR_HORA), axis=1)
+    soc_final = resultado["soc_final_kwh"] / bess_capacidade_kwh
+    return (grade_soc, soc_final.reshape(numero_de_tipos, pontos_grade_soc),
+            diesel_acumulado.reshape(numero_de_tipos, pontos_grade_soc, PASSOS_POR_DIA))
+
+
+def _percentis(valores, eixo=None):
+    """P10/P50/P90 sem interpolação (valores infinitos continuam válidos)."""
+    return {p: np.percentile(valores, p, axis=eixo, method='inverted_cdf') for p in PERCENTIS}
+
+
+def simular_monte_carlo_autonomia(
+    potencia_pico_base_fv, fator_ceu_aberto, bess_capacidade_kwh, bess_potencia_max_kw,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    numero_trajetorias=5000, dias_simulacao=DIAS_SIMULACAO_LONGA,
+    capacidade_diesel_l=CAPACIDADE_TOTAL_DIESEL_L, soc_inicial_fracao=0.5,
+    persistencia=PERSISTENCIA_CLIMA, semente=None, use_noise=True
+):
+    """
+    Autonomia do diesel e consumo anual para ``numero_trajetorias`` sequências
+    de clima sorteadas pela cadeia de Markov (tipos de dia do Gráfico 2: fator
+    céu aberto x 1.0 / 0.5 / 0.2 e sem sol). O SOC é contínuo entre os dias.
+
+    Cada trajetória cobre max(``dias_simulacao``, 365) dias. A autonomia usa o
+    tanque de ``capacidade_diesel_l`` (infinita se não esgotar no horizonte);
+    o consumo anual soma os 365 primeiros dias sem limite de tanque.
+
+    Retorna um dicionário com 'tempo' (dias), 'nivel_diesel_percentis' (nível
+    do tanque por dia), 'autonomia' e 'diesel_anual' (um valor por trajetória)
+    e os respectivos percentis P10/P50/P90.
+    """
+    bess_capacidade_kwh = max(bess_capacidade_kwh, 1e-6)
+    fatores = fator_ceu_aberto * np.array(list(FATORES_E_PESOS_ANUAIS.keys()))
+    pesos = np.array(list(FATORES_E_PESOS_ANUAIS.values()))
+
+    with fase("monte_carlo.tabela"):
+        grade_soc, soc_final, diesel_acumulado_dia = tabela_transicao_diaria(
+            potencia_pico_base_fv, fatores, bess_capacidade_kwh, bess_potencia_max_kw,
+            numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+            carga_limite_emergencia, use_noise=use_noise
+        )
+    diesel_dia = diesel_acumulado_dia[:, :, -1]
+
+    gerador = np.random.default_rng(semente)
+    dias_total = max(dias_simulacao, DIAS_ANO)
+    sequencias = gerar_sequencias_clima(
+        numero_trajetorias, dias_total, ajustar_cadeia_clima(pesos, persistencia), pesos, gerador)
+
+    # Avanço dia a dia: interpolação linear na grade uniforme de SOC. As
+    # matrizes ficam com os dias no eixo 0 para cada dia gravar uma linha contígua
+    ultimo_intervalo = len(grade_soc) - 2
+    indice_grade = np.empty((dias_total, numero_trajetorias), dtype=np.intp)
+    peso_grade = np.empty((dias_total, numero_trajetorias))
+    diesel_diario = np.empty((dias_total, numero_trajetorias))
+    soc = np.full(numero_trajetorias, float(soc_inicial_fracao))
+    with fase("monte_carlo.trajetorias"):
+        for dia in range(dias_total):
+            posicao = np.clip(soc, 0.0, 1.0) * (len(grade_soc) - 1)
+            indice = np.minimum(posicao.astype(np.intp), ultimo_intervalo)
+            peso = posicao - indice
+            tipo = sequencias[dia]
+            indice_grade[dia] = indice
+            peso_grade[dia] = peso
+            diesel_diario[dia] = diesel_dia[tipo, indice] * (1 - peso) + diesel_dia[tipo, indice + 1] * peso
+            soc = soc_final[tipo, indice] * (1 - peso) + soc_final[tipo, indice + 1] * peso
+
+    consumo_acumulado = np.cumsum(diesel_diario, axis=0)
+    diesel_anual = consumo_acumulado[DIAS_ANO - 1]
+
+    # Tanque no horizonte da autonomia e instante (fracionário) do esgotamento
+    consumo_horizonte = consumo_acumulado[:dias_simulacao]
+    nivel_diesel = np.empty((dias_simulacao + 1, numero_trajetorias))
+    nivel_diesel[0] = capacidade_diesel_l
+    nivel_diesel[1:] = np.maximum(0.0, capacidade_diesel_l - consumo_horizonte)
+    autonomia = np.full(numero_trajetorias, np.inf)
+    esgotadas = np.flatnonzero(consumo_horizonte[-1] >= capacidade_diesel_l) if dias_simulacao > 0 else np.array([], dtype=np.intp)
+    if len(esgotadas):
+        dia_esgotamento = np.argmax(consumo_horizonte[:, esgotadas] >= capacidade_diesel_l, axis=0)
+        consumo_antes = np.where(dia_esgotamento > 0, consumo_horizonte[dia_esgotamento - 1, esgotadas], 0.0)
+        restante = capacidade_diesel_l - consumo_antes
+        tipo = sequencias[dia_esgotamento, esgotadas]
+        indice = indice_grade[dia_esgotamento, esgotadas]
+        peso = peso_grade[dia_esgotamento, esgotadas][:, None]
+        perfil = diesel_acumulado_dia[tipo, indice] * (1 - peso) + diesel_acumulado_dia[tipo, indice + 1] * peso
+        passo = np.minimum((perfil < restante[:, None]).sum(axis=1), PASSOS_POR_DIA - 1)
+        linhas = np.arange(len(esgotadas))
+        anterior = np.where(passo > 0, perfil[linhas, passo - 1], 0.0)
+        gasto_passo = perfil[linhas, passo] - anterior
+        fracao_passo = np.where(gasto_passo > 0, (restante - anterior) / np.where(gasto_passo > 0, gasto_passo, 1.0), 0.0)
+        autonomia[esgotadas] = dia_esgotamento + (passo + fracao_passo) / PASSOS_POR_DIA
+
+    return {
+        'tempo': np.arange(dias_simulacao + 1, dtype=float),
+        'nivel_diesel_percentis': _percentis(nivel_diesel, eixo=1),
+        'autonomia': autonomia,
+        'autonomia_percentis': _percentis(autonomia),
+        'fracao_esgotadas': len(esgotadas) / numero_trajetorias,
+        'diesel_anual': diesel_anual,
+        'diesel_anual_percentis': _percentis(diesel_anual),
+        'numero_trajetorias': numero_trajetorias,
+    }
@@ -0,0 +1,178 @@
+"""
+Otimização do dimensionamento FV x BESS (kWp, kWh de BESS e kW de BESS)
+sobre o modelo de despacho.
+
+A busca vai do grosso para o fino em uma grade implícita com a resolução de
+cada variável: começa com poucos pontos por eixo, e a cada rodada avalia os
+vizinhos (passo pela metade) da melhor configuração viável e dos pontos da
+fronteira de Pareto diesel x investimento. As avaliações são memorizadas pelo
+ponto da grade e feitas em lote (``consumo_anual_diesel_lote``); a autonomia
+(mais cara, uma simulação de longo prazo por ponto) só é calculada para os
+pontos que podem entrar na fronteira ou ser a melhor configuração.
+
+O investimento usa custos unitários simples (``CUSTOS_PADRAO``, substituíveis)
+e, com ``preco_diesel_l``, o custo total soma o diesel de ``anos_operacao``
+anos.
+"""
+import math
+
+import numpy as np
+
+from .anual import consumo_anual_diesel_lote
+from .autonomia import simular_autonomia
+from .instrumentacao import fase
+
+VARIAVEIS = ("potencia_pico_fv_base", "bess_capacidade_kwh", "bess_potencia_max_kw")
+LIMITES_PADRAO = {"potencia_pico_fv_base": (0.0, 1500.0), "bess_capacidade_kwh": (0.0, 2000.0), "bess_potencia_max_kw": (0.0, 1000.0)}
+RESOLUCAO_PADRAO = {"potencia_pico_fv_base": 10.0, "bess_capacidade_kwh": 10.0, "bess_potencia_max_kw": 5.0}
+# Custo de investimento por unidade instalada (mesma moeda do preço do diesel)
+CUSTOS_PADRAO = {"potencia_pico_fv_base": 1000.0, "bess_capacidade_kwh": 350.0, "bess_potencia_max_kw": 150.0}
+PONTOS_GROSSOS = 5
+# Pontos da fronteira refinados por rodada (espalhados ao longo dela)
+CENTROS_POR_RODADA = 12
+MAXIMO_AVALIACOES = 2000
+ANOS_OPERACAO = 10
+# Fator de irradiação dos dias usados na autonomia (dias nublados do Gráfico 2)
+FATOR_IRRADIACAO_AUTONOMIA = 0.5
+
+
+def fronteira_pareto(diesel, custo, aceitar=None):
+    """
+    Índices dos pontos não dominados (menor diesel e menor custo), em ordem de
+    custo. Com ``aceitar(indice)``, só os pontos aceitos concorrem; ele só é
+    chamado para os pontos que reduziriam o diesel da fronteira.
+    """
+    fronteira = []
+    menor_diesel = np.inf
+    for indice in np.lexsort((diesel, custo)):
+        if diesel[indice] < menor_diesel and (aceitar is None or aceitar(indice)):
+            fronteira.append(int(indice))
+            menor_diesel = diesel[indice]
+    return fronteira
+
+
+def otimizar_dimensionamento(
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    diesel_maximo_l_ano=None, autonomia_minima_dias=None, fator_irradiacao_autonomia=FATOR_IRRADIACAO_AUTONOMIA,
+    limites=None, resolucao=None, custos=None, preco_diesel_l=None, anos_operacao=ANOS_OPERACAO,
+    pontos_grossos=PONTOS_GROSSOS, maximo_avaliacoes=MAXIMO_AVALIACOES, ao_progredir=None
+):
+    """
+    Procura a configuração (kWp, kWh, kW) de menor custo que atende às metas
+    de diesel anual (``diesel_maximo_l_ano``) e de autonomia com o tanque
+    cheio em dias com ``fator_irradiacao_autonomia`` (``autonomia_minima_dias``).
+    Sem preço do diesel, o custo é só o investimento; com ele, soma o diesel
+    de ``anos_operacao`` anos.
+
+    ``limites`` e ``resolucao`` (dicionários por variável de ``VARIAVEIS``)
+    substituem os padrões. ``ao_progredir(avaliacoes, maximo_avaliacoes)`` é
+    chamado a cada rodada.
+
+    Retorna os pontos avaliados (um array por variável, 'diesel_anual_l',
+    'investimento', 'custo_total' e 'autonomia_dias', com NaN onde a autonomia
+    não foi calculada e inf se o diesel não acaba no horizonte), 'viavel'
+    (atende às metas; None se a autonomia não foi calculada), 'fronteira_pareto'
+    (índices dos pontos não dominados em diesel x investimento entre os que
+    atendem à meta de autonomia), 'melhor' (índice
+    da configuração escolhida, ou None se nenhuma atende às metas),
+    'numero_avaliacoes' e 'tamanho_grade_exaustiva' (pontos de uma grade
+    completa na mesma resolução).
+    """
+    limites = {**LIMITES_PADRAO, **(limites or {})}
+    resolucao = {**RESOLUCAO_PADRAO, **(resolucao or {})}
+    custos = {**CUSTOS_PADRAO, **(custos or {})}
+    inicio = np.array([limites[v][0] for v in VARIAVEIS], dtype=float)
+    fim = np.array([limites[v][1] for v in VARIAVEIS], dtype=float)
+    passo_grade = np.array([resolucao[v] for v in VARIAVEIS], dtype=float)
+    if np.any(fim < inicio) or np.any(passo_grade <= 0):
+        raise ValueError("Limites invertidos ou resolução não positiva")
+    pontos_por_eixo = np.floor((fim - inicio) / passo_grade + 1e-9).astype(int) + 1
+    custo_unitario = np.array([custos[v] for v in VARIAVEIS], dtype=float)
+
+    def valores(indices):
+        return np.minimum(inicio + np.asarray(indices, dtype=float) * passo_grade, fim)
+
+    pontos = []  # índices na grade, na ordem de avaliação
+    posicao = {}  # índices na grade -> posição em 'pontos'
+    diesel = []
+    autonomia = {}  # posição -> dias (inf se o diesel não acaba no horizonte)
+
+    def avaliar(novos):
+        novos = [p for p in dict.fromkeys(novos) if p not in posicao][:maximo_avaliacoes - len(pontos)]
+        if not novos:
+            return
+        kwp, kwh, kw = valores(novos).T
+        with fase("otimizacao.avaliacao"):
+            diesel.extend(consumo_anual_diesel_lote(
+                kwp, np.maximum(kwh, 1e-6), np.maximum(kw, 1e-6), numero_total_gmgs, gmg_potencia_unitaria,
+                gmg_fator_potencia_eficiente, carga_limite_emergencia))
+        for ponto in novos:
+            posicao[ponto] = len(pontos)
+            pontos.append(ponto)
+        if ao_progredir is not None:
+            ao_progredir(len(pontos), maximo_avaliacoes)
+
+    def autonomia_de(i):
+        if i not in autonomia:
+            kwp, kwh, kw = valores(pontos[i])
+            with fase("otimizacao.autonomia"):
+                dias = simular_autonomia(
+                    kwp, fator_irradiacao_autonomia, kwh, max(kw, 1e-6), numero_total_gmgs, gmg_potencia_unitaria,
+                    gmg_fator_potencia_eficiente, carga_limite_emergencia)["autonomia"]
+            autonomia[i] = math.inf if dias is None else dias
+        return autonomia[i]
+
+    def viavel(i, diesel_l):
+        if diesel_maximo_l_ano is not None and diesel_l[i] > diesel_maximo_l_ano:
+            return False
+        return autonomia_minima_dias is None or autonomia_de(i) >= autonomia_minima_dias
+
+    def analisar():
+        """Melhor ponto viável e fronteira de Pareto viável entre os avaliados."""
+        diesel_l = np.array(diesel)
+        investimento = valores(pontos) @ custo_unitario
+        custo_total = investimento + (0.0 if preco_diesel_l is None else diesel_l * preco_diesel_l * anos_operacao)
+        melhor = next((int(i) for i in np.lexsort((diesel_l, custo_total)) if viavel(i, diesel_l)), None)
+        fronteira = fronteira_pareto(diesel_l, investimento, None if autonomia_minima_dias is None else
+                                     lambda i: autonomia_de(i) >= autonomia_minima_dias)
+        return melhor, fronteira, diesel_l, investimento, custo_total
+
+    # Rodada grossa: ``pontos_grossos`` pontos por eixo, incluindo as pontas
+    eixos = [np.unique(np.round(np.linspace(0, n - 1, min(pontos_grossos, n))).astype(int)) for n in pontos_por_eixo]
+    avaliar([tuple(int(i) for i in p) for p in np.stack(np.meshgrid(*eixos, indexing="ij"), -1).reshape(-1, 3)])
+    passo = np.maximum(1, np.ceil((pontos_por_eixo - 1) / max(pontos_grossos - 1, 1))).astype(int)
+    deslocamentos = np.array([d for d in np.ndindex(3, 3, 3) if d != (1, 1, 1)]) - 1
+
+    with fase("otimizacao"):
+        while len(pontos) < maximo_avaliacoes:
+            melhor, fronteira, *_ = analisar()
+            passo = np.maximum(1, passo // 2)
+            espalhados = np.unique(np.round(np.linspace(0, len(fronteira) - 1, min(CENTROS_POR_RODADA, len(fronteira)))).astype(int))
+            centros = ([pontos[melhor]] if melhor is not None else []) + [pontos[fronteira[k]] for k in espalhados]
+            novos = []
+            for centro in centros:
+                vizinhos = np.clip(np.array(centro) + deslocamentos * passo, 0, pontos_por_eixo - 1)
+                novos.extend(tuple(int(i) for i in v) for v in vizinhos)
+            quantidade_anterior = len(pontos)
+            avaliar(novos)
+            if len(pontos) == quantidade_anterior and np.all(passo == 1):
+                break
+        melhor, fronteira, diesel_l, investimento, custo_total = analisar()
+
+    kwp, kwh, kw = valores(pontos).T
+    autonomia_dias = np.full(len(pontos), np.nan)
+    for i, dias in autonomia.items():
+        autonomia_dias[i] = dias
+    atende_diesel = diesel_l <= (np.inf if diesel_maximo_l_ano is None else diesel_maximo_l_ano)
+    avaliados_viaveis = [
+        None if atende_diesel[i] and autonomia_minima_dias is not None and i not in autonomia
+        else bool(atende_diesel[i]) and viavel(i, diesel_l)
+        for i in range(len(pontos))
+    ]
+    return {
+        "potencia_pico_fv_base": kwp, "bess_capacidade_kwh": kwh, "bess_potencia_max_kw": kw,
+        "diesel_anual_l": diesel_l, "investimento": investimento, "custo_total": custo_total,
+        "autonomia_dias": autonomia_dias, "viavel": avaliados_viaveis,
+        "fronteira_pareto": fronteira, "melhor": melhor,
+        "numero_avaliacoes": len(pontos), "tamanho_grade_exaustiva": int(np.prod(pontos_por_eixo)),
+    }
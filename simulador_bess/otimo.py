@@ -0,0 +1,203 @@
+"""
+Despacho ótimo por programação dinâmica: limite inferior do diesel.
+
+A recursão é feita de trás para frente sobre uma grade de SOC, com as mesmas
+eficiências de carga e descarga (``EFICIENCIA_CARREGAMENTO`` /
+``EFICIENCIA_DESCARREGAMENTO``), limites de SOC, potência de recarga (com a
+rampa acima de ``SOC_RAMPA_INICIO``) e ``SFC`` do despacho heurístico. A cada
+passo a decisão é o ponto da grade de destino (a energia trocada com o BESS);
+o FV atende a carga primeiro, o BESS a variação escolhida e os GMGs o resto,
+até a capacidade da frota. Como a decisão só muda o ponto de destino, o custo
+de um passo depende apenas do passo e do deslocamento na grade: a recursão é
+uma soma de matrizes (pontos da grade x deslocamentos) seguida de um mínimo
+por linha, vetorizada com NumPy.
+
+O ótimo escolhe livremente quando carregar (inclusive pelos GMGs) e quanto
+descarregar, sem as regras da estratégia, e usa toda a faixa do SOC (do
+mínimo de emergência ao máximo da suavização). Qualquer trajetória que o
+despacho heurístico segue está disponível para ele, a menos da discretização
+da grade, então o diesel ótimo é um limite inferior para o da heurística com
+a mesma entrada: a distância entre os dois é o que uma estratégia melhor
+ainda poderia economizar. A carga que passa da capacidade dos GMGs e do BESS
+fica sem atendimento, com uma penalidade alta: o ótimo atende tudo o que for
+possível. O diesel ótimo só é limite inferior quando a heurística também
+atende toda a carga (``carga_nao_atendida_kwh``); quando ela deixa carga sem
+atender (ex.: sem sol, com o BESS impedido de ajudar), o limite vale para o
+custo equivalente, diesel mais a mesma penalidade pela carga não atendida
+nos dois lados (``custo_equivalente_l``).
+
+Com ``SFC`` constante o custo depende só da energia dos GMGs; o número de
+GMGs em operação é a menor quantidade inteira que entrega a potência (na
+potência eficiente por unidade e, acima da capacidade eficiente da frota, na
+unitária).
+"""
+import numpy as np
+
+from .colunar import compactar_resultado
+from .constantes import (
+    EFICIENCIA_CARREGAMENTO, EFICIENCIA_DESCARREGAMENTO, EFICIENCIA_FV, INTERVALOS_POR_HORA,
+    POT_MAX_BESS_RECARREGAR, SOC_LIMITE_MAX_SUA, SOC_LIMITE_MIN_EMERGENCIA, SOC_RAMPA_INICIO,
+)
+from .despacho import calcular_consumo_diesel
+from .instrumentacao import fase
+from .perfis import montar_vetor_carga, montar_vetor_tempo, perfil_fv_diario, semente_ruido_fv
+
+# Pontos da grade de SOC: define a menor variação de potência do BESS que o
+# ótimo consegue representar (faixa de SOC / (pontos - 1) / passo de tempo)
+PONTOS_GRADE_SOC_OTIMO = 1001
+# Penalidade da carga não atendida (L de diesel equivalentes por kWh): muito
+# acima do custo de atendê-la, para que o ótimo só deixe de atender a carga
+# quando nem os GMGs nem o BESS conseguem
+PENALIDADE_CARGA_NAO_ATENDIDA = 1000.0
+
+
+def carga_nao_atendida_kwh(resultado, passo_de_tempo_h):
+    """
+    Energia da carga que um despacho (resultado de ``simular_detalhado``)
+    deixou sem atender: em cada passo, carga menos FV para a carga, GMGs e
+    descarga do BESS, quando positiva.
+    """
+    descarga = np.maximum(-np.asarray(resultado["vetor_potencia_bess"], dtype=float), 0.0)
+    falta = (np.asarray(resultado["vetor_carga"], dtype=float) - resultado["vetor_fv_para_carga"]
+             - resultado["vetor_gmg_potencia_despachada"] - descarga)
+    return float(np.maximum(falta, 0.0).sum() * passo_de_tempo_h)
+
+
+def custo_equivalente_l(diesel_l, energia_nao_atendida_kwh):
+    """Diesel mais a penalidade da carga não atendida, o custo que o ótimo minimiza."""
+    return diesel_l + PENALIDADE_CARGA_NAO_ATENDIDA * energia_nao_atendida_kwh
+
+
+def despacho_otimo(
+    vetor_carga, vetor_geracao_fv, bess_capacidade_kwh, bess_potencia_max_kw, soc_inicial_kwh,
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, passo_de_tempo_h,
+    soc_final_minimo_kwh=None, pontos_soc=PONTOS_GRADE_SOC_OTIMO
+):
+    """
+    Despacho de menor consumo de diesel para os vetores de carga e FV (bruto).
+    O SOC inicial é levado ao ponto mais próximo da grade; com
+    ``soc_final_minimo_kwh`` a trajetória termina no primeiro ponto da grade
+    que não fique acima dele (ex.: o SOC final da heurística, para comparar
+    sem gastar a energia que ela deixou no BESS). Retorna um dicionário com
+    os vetores no formato de ``despacho.executar_despacho`` (potência do BESS
+    positiva na recarga), o diesel total e a carga não atendida (acima da
+    capacidade dos GMGs e do BESS).
+    """
+    vetor_carga = np.asarray(vetor_carga, dtype=float)
+    vetor_geracao_fv = np.asarray(vetor_geracao_fv, dtype=float)
+    numero_de_passos = len(vetor_carga)
+    capacidade_gmg = numero_total_gmgs * gmg_potencia_unitaria
+    capacidade_eficiente = gmg_potencia_unitaria * gmg_fator_potencia_eficiente
+
+    soc_min_kwh = bess_capacidade_kwh * SOC_LIMITE_MIN_EMERGENCIA / 100
+    soc_max_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX_SUA / 100
+    if bess_capacidade_kwh <= 1e-6 or bess_potencia_max_kw <= 0:
+        pontos_soc = 1
+    grade_kwh = np.linspace(soc_min_kwh, soc_max_kwh, pontos_soc)
+    degrau_kwh = grade_kwh[1] - grade_kwh[0] if pontos_soc > 1 else 1.0
+
+    # Deslocamentos na grade em um passo: descarga até a potência máxima e
+    # recarga até a potência de recarga (energia no BESS = potência x eficiência)
+    maximo_descarga = min(int(bess_potencia_max_kw * passo_de_tempo_h / EFICIENCIA_DESCARREGAMENTO / degrau_kwh), pontos_soc - 1)
+    potencia_recarga_max = bess_potencia_max_kw * POT_MAX_BESS_RECARREGAR
+    maximo_recarga = min(int(potencia_recarga_max * passo_de_tempo_h * EFICIENCIA_CARREGAMENTO / degrau_kwh), pontos_soc - 1)
+    deslocamentos = np.arange(-maximo_descarga, maximo_recarga + 1)
+    energia_bess_kwh = deslocamentos * degrau_kwh
+    # Potência trocada com o barramento (positiva na recarga)
+    potencia_bess = np.where(
+        energia_bess_kwh > 0, energia_bess_kwh / EFICIENCIA_CARREGAMENTO,
+        energia_bess_kwh * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h
+
+    # Rampa de recarga acima de SOC_RAMPA_INICIO (como no despacho heurístico)
+    soc_percentual = grade_kwh / bess_capacidade_kwh * 100 if pontos_soc > 1 else np.zeros(1)
+    fator_rampa = np.clip((SOC_LIMITE_MAX_SUA - soc_percentual) / (SOC_LIMITE_MAX_SUA - SOC_RAMPA_INICIO), 0.0, 1.0)
+    inviavel = potencia_bess[None, :] > potencia_recarga_max * fator_rampa[:, None] + 1e-9
+    inviavel[:, deslocamentos == 0] = False
+    penalidade = np.where(inviavel, np.inf, 0.0)
+
+    # Custo de cada passo por deslocamento: os GMGs cobrem o que sobra da carga
+    # e o que passa da capacidade deles fica sem atendimento (penalizado)
+    residuo = (vetor_carga - vetor_geracao_fv)[:, None] + potencia_bess[None, :]
+    custo = (calcular_consumo_diesel(np.clip(residuo, 0.0, capacidade_gmg))
+             + PENALIDADE_CARGA_NAO_ATENDIDA * np.maximum(residuo - capacidade_gmg, 0.0)) * passo_de_tempo_h
+
+    inicio = int(np.abs(grade_kwh - soc_inicial_kwh).argmin())
+    valor = np.zeros(pontos_soc)
+    if soc_final_minimo_kwh is not None and pontos_soc > 1:
+        valor[grade_kwh < grade_kwh[np.searchsorted(grade_kwh, soc_final_minimo_kwh, side="right") - 1]] = np.inf
+
+    # Recursão de trás para frente: valor[j] = min_d custo[t, d] + valor[j + d]
+    numero_de_deslocamentos = len(deslocamentos)
+    decisao = np.empty((numero_de_passos, pontos_soc), dtype=np.min_scalar_type(numero_de_deslocamentos - 1))
+    linhas = np.arange(pontos_soc)
+    preenchimento = (np.full(maximo_descarga, np.inf), np.full(maximo_recarga, np.inf))
+    with fase("otimo.recursao", numero_de_passos):
+        for t in range(numero_de_passos - 1, -1, -1):
+            janela = np.lib.stride_tricks.sliding_window_view(
+                np.concatenate((preenchimento[0], valor, preenchimento[1])), numero_de_deslocamentos)
+            total = janela + penalidade + custo[t]
+            escolha = total.argmin(axis=1)
+            decisao[t] = escolha
+            valor = total[linhas, escolha]
+    if not np.isfinite(valor[inicio]):
+        raise ValueError("SOC final mínimo inalcançável a partir do SOC inicial")
+
+    # Trajetória ótima (de frente para trás)
+    with fase("otimo.trajetoria", numero_de_passos):
+        escolhas = np.empty(numero_de_passos, dtype=np.intp)
+        indices_soc = np.empty(numero_de_passos, dtype=np.intp)
+        ponto = inicio
+        for t in range(numero_de_passos):
+            escolhas[t] = decisao[t, ponto]
+            ponto += deslocamentos[escolhas[t]]
+            indices_soc[t] = ponto
+        vetor_potencia_bess = potencia_bess[escolhas]
+        residuo = residuo[np.arange(numero_de_passos), escolhas]
+        vetor_gmg_potencia = np.clip(residuo, 0.0, capacidade_gmg)
+        gmgs = np.ceil(vetor_gmg_potencia / capacidade_eficiente - 1e-9) if capacidade_eficiente > 0 else np.zeros(numero_de_passos)
+        vetor_gmgs_despachados = np.minimum(gmgs, numero_total_gmgs)
+        descarga = np.maximum(-vetor_potencia_bess, 0.0)
+        vetor_fv_para_carga = np.minimum(vetor_geracao_fv, np.maximum(vetor_carga - descarga, 0.0))
+        gasto_passos_l = calcular_consumo_diesel(vetor_gmg_potencia) * passo_de_tempo_h
+
+    return {
+        "vetor_potencia_bess": vetor_potencia_bess, "vetor_soc_kwh": grade_kwh[indices_soc],
+        "vetor_gmg_potencia_despachada": vetor_gmg_potencia, "vetor_gmgs_despachados": vetor_gmgs_despachados,
+        "vetor_fv_para_carga": vetor_fv_para_carga,
+        "total_diesel_consumido": float(np.cumsum(gasto_passos_l)[-1]) if numero_de_passos > 0 else 0.0,
+        "energia_nao_atendida_kwh": float(np.maximum(residuo - capacidade_gmg, 0.0).sum() * passo_de_tempo_h),
+        "soc_inicial_kwh": float(grade_kwh[inicio]),
+        "soc_final_kwh": float(grade_kwh[indices_soc[-1]]) if numero_de_passos > 0 else float(grade_kwh[inicio]),
+    }
+
+
+def simular_otimo(
+    dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh, bess_potencia_max_kw,
+    soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+    use_noise, soc_final_minimo_kwh=None, pontos_soc=PONTOS_GRADE_SOC_OTIMO
+):
+    """
+    Despacho ótimo (``despacho_otimo``) com a carga e o FV bruto da simulação
+    detalhada dos mesmos parâmetros, em um ``colunar.ResultadoColunar``. O
+    diesel (``total_diesel_consumido``) é o limite inferior do diesel de
+    ``simular_detalhado`` quando ela atende toda a carga; senão, o limite
+    vale para ``custo_equivalente_l``.
+    """
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    vetor_tempo = montar_vetor_tempo(dias_simulacao)
+    vetor_carga = montar_vetor_carga(dias_simulacao)
+    geracao_fv_dia, _ = perfil_fv_diario(potencia_pico_fv_base, fator_irradiacao, semente_ruido_fv(use_noise))
+    vetor_geracao_fv_original = np.tile(geracao_fv_dia, dias_simulacao)
+
+    resultado = despacho_otimo(
+        vetor_carga, vetor_geracao_fv_original, bess_capacidade_kwh, bess_potencia_max_kw,
+        bess_capacidade_kwh * soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, passo_de_tempo_h, soc_final_minimo_kwh=soc_final_minimo_kwh,
+        pontos_soc=pontos_soc
+    )
+    return compactar_resultado({
+        "vetor_tempo": vetor_tempo, "vetor_carga": vetor_carga,
+        "vetor_geracao_fv_original": vetor_geracao_fv_original,
+        "potencia_pico_fv_curto": potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao,
+        "numero_de_passos": len(vetor_carga), **resultado,
+    }, passo_de_tempo_h)
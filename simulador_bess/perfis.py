@@ -0,0 +1,142 @@
+"""Montagem dos perfis de carga e de geração FV usados pelo despacho."""
+from functools import lru_cache
+
+import numpy as np
+
+from .constantes import (
+    ATIVAR_SUAVIZACAO_FV, CARGA_HORARIA_24H, EFICIENCIA_FV, FATOR_GERACAO_HORARIA,
+    INTERVALOS_POR_HORA, JANELA_SUAVIZACAO_MINUTOS, RUIDO_FV_DESVIO,
+    RUIDO_FV_LIMITE, SEMENTE_RUIDO_FV,
+)
+from .instrumentacao import observar_cache_lru
+
+PASSOS_POR_DIA = 24 * INTERVALOS_POR_HORA
+JANELA_SUAVIZACAO_PASSOS = int(JANELA_SUAVIZACAO_MINUTOS / (60 / INTERVALOS_POR_HORA))
+
+
+def montar_vetor_tempo(dias_simulacao, dia_inicial=0, intervalos_por_hora=INTERVALOS_POR_HORA):
+    """
+    Vetor de tempo em horas, um ponto por intervalo de simulação. Com
+    ``dia_inicial`` devolve o trecho [dia_inicial, dia_inicial + dias) do
+    vetor de um horizonte maior, com os mesmos valores.
+    """
+    passos_por_dia = 24 * intervalos_por_hora
+    passo_de_tempo_h = 24 / passos_por_dia
+    return np.arange(dia_inicial * passos_por_dia, (dia_inicial + dias_simulacao) * passos_por_dia) * passo_de_tempo_h
+
+
+def montar_vetor_carga(dias_simulacao, inclui_ultimo_dia=True, intervalos_por_hora=INTERVALOS_POR_HORA):
+    """
+    Carga: um dia interpolado e replicado (idêntico bit a bit entre os dias).
+    Os dias intermediários interpolam a última hora até a 0h do dia seguinte;
+    o último dia mantém a carga da última hora, como na interpolação contínua.
+    Com ``inclui_ultimo_dia=False`` todos os dias são intermediários (trecho
+    que não termina o horizonte, na simulação em blocos).
+    """
+    passos_por_dia = 24 * intervalos_por_hora
+    tempo_dia = np.linspace(0, 24, passos_por_dia, endpoint=False)
+    carga_dia_intermediario = np.interp(tempo_dia, np.arange(25), CARGA_HORARIA_24H + CARGA_HORARIA_24H[:1])
+    if not inclui_ultimo_dia:
+        return np.tile(carga_dia_intermediario, dias_simulacao)
+    carga_ultimo_dia = np.interp(tempo_dia, np.arange(24), CARGA_HORARIA_24H)
+    vetor_carga = np.concatenate([np.tile(carga_dia_intermediario, max(dias_simulacao - 1, 0)), carga_ultimo_dia])
+    return vetor_carga[:dias_simulacao * passos_por_dia]
+
+
+def semente_ruido_fv(use_noise):
+    """Semente do ruído FV correspondente à opção ``use_noise`` (None = sem ruído)."""
+    return SEMENTE_RUIDO_FV if use_noise else None
+
+
+def janela_suavizacao_passos(intervalos_por_hora=INTERVALOS_POR_HORA):
+    """Tamanho da janela de suavização FV em passos para a resolução dada."""
+    return int(JANELA_SUAVIZACAO_MINUTOS / (60 / intervalos_por_hora))
+
+
+@lru_cache(maxsize=64)
+def perfil_fv_24h_normalizado(semente_ruido=None, intervalos_por_hora=INTERVALOS_POR_HORA):
+    """
+    Perfil FV de 24h em fração da potência pico (antes de aplicar a potência
+    e o corte em zero), somente leitura e memorizado por (semente, resolução).
+
+    Interpola FATOR_GERACAO_HORARIA entre horas consecutivas presentes na
+    tabela; uma hora sem sucessora mantém o próprio fator e as demais ficam em
+    zero. Com ``semente_ruido`` aplica um ruído gaussiano limitado, sorteado
+    de um ``np.random.Generator`` local (não altera o estado global do NumPy).
+    """
+    tempo = np.linspace(0, 24, 24 * intervalos_por_hora, endpoint=False)
+    hora_base = tempo.astype(int)
+    tem_fator = np.array([h in FATOR_GERACAO_HORARIA for h in range(26)])
+    fator = np.array([FATOR_GERACAO_HORARIA.get(h, 0.0) for h in range(26)], dtype=float)
+
+    valor_inicial = fator[hora_base]
+    valor_final = fator[hora_base + 1]
+    valor_interpolado = valor_inicial + (valor_final - valor_inicial) * (tempo - hora_base)
+    perfil_fv_24h = np.where(tem_fator[hora_base + 1], valor_interpolado, valor_inicial)
+    ativo = tem_fator[hora_base]
+    perfil_fv_24h[~ativo] = 0.0
+
+    if semente_ruido is not None:
+        gerador = np.random.default_rng(semente_ruido)
+        ruido = np.clip(gerador.normal(0, RUIDO_FV_DESVIO, np.count_nonzero(ativo)), -RUIDO_FV_LIMITE, RUIDO_FV_LIMITE)
+        perfil_fv_24h[ativo] = perfil_fv_24h[ativo] * (1 + ruido)
+
+    perfil_fv_24h.flags.writeable = False
+    return perfil_fv_24h
+
+
+def suavizar_fv_circular(perfil_fv_dia, janela_suavizacao_passos=JANELA_SUAVIZACAO_PASSOS):
+    """
+    Média móvel centralizada de um perfil diário ao longo do último eixo,
+    tratando o dia como circular (a janela da 0h inclui o fim do dia). O
+    resultado pode ser replicado por vários dias sem descontinuidade.
+    """
+    if not (ATIVAR_SUAVIZACAO_FV and janela_suavizacao_passos > 1):
+        return np.array(perfil_fv_dia, dtype=float)
+    meia_janela = janela_suavizacao_passos // 2
+    soma_janela = sum(np.roll(perfil_fv_dia, meia_janela - k, axis=-1) for k in range(janela_suavizacao_passos))
+    return soma_janela / janela_suavizacao_passos
+
+
+def montar_perfis_fv_dia(potencia_pico_fv_curto, semente_ruido=None, intervalos_por_hora=INTERVALOS_POR_HORA):
+    """
+    Geração FV bruta e suavizada (kW) de um dia. Se a potência pico for um
+    array (um valor por cenário), devolve matrizes (cenários x passos do dia).
+    """
+    perfil_normalizado = perfil_fv_24h_normalizado(semente_ruido, intervalos_por_hora)
+    geracao_fv_dia = np.maximum(0, np.multiply.outer(potencia_pico_fv_curto, perfil_normalizado))
+    return geracao_fv_dia, suavizar_fv_circular(geracao_fv_dia, janela_suavizacao_passos(intervalos_por_hora))
+
+
+@lru_cache(maxsize=256)
+def perfil_fv_diario(potencia_pico_fv_base, fator_irradiacao, semente_ruido=None, intervalos_por_hora=INTERVALOS_POR_HORA):
+    """
+    Perfis FV bruto e suavizado de um dia (somente leitura), memorizados por
+    (kWp, fator de irradiação, semente do ruído, resolução). Para vários dias,
+    basta replicá-los com ``np.tile``.
+    """
+    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
+    geracao_fv_dia, geracao_fv_suavizada_dia = montar_perfis_fv_dia(potencia_pico_fv_curto, semente_ruido, intervalos_por_hora)
+    geracao_fv_dia.flags.writeable = False
+    geracao_fv_suavizada_dia.flags.writeable = False
+    return geracao_fv_dia, geracao_fv_suavizada_dia
+
+
+observar_cache_lru("perfil_fv_24h_normalizado", perfil_fv_24h_normalizado)
+observar_cache_lru("perfil_fv_diario", perfil_fv_diario)
+
+
+def suavizar_fv(vetor_geracao_fv, janela_suavizacao_passos=JANELA_SUAVIZACAO_PASSOS):
+    """
+    Média móvel centralizada (min_periods=1) ao longo do último eixo de uma
+    série qualquer (não circular), com soma independente por janela.
+    """
+    if not (ATIVAR_SUAVIZACAO_FV and janela_suavizacao_passos > 1):
+        return np.copy(vetor_geracao_fv)
+    numero_de_passos = vetor_geracao_fv.shape[-1]
+    bordas = [(0, 0)] * (vetor_geracao_fv.ndim - 1) + [(janela_suavizacao_passos // 2, janela_suavizacao_passos - 1 - janela_suavizacao_passos // 2)]
+    fv_estendida = np.pad(vetor_geracao_fv, bordas)
+    amostras_validas = np.pad(np.ones(numero_de_passos), bordas[-1])
+    soma_janela = sum(fv_estendida[..., k:k + numero_de_passos] for k in range(janela_suavizacao_passos))
+    amostras_janela = sum(amostras_validas[k:k + numero_de_passos] for k in range(janela_suavizacao_passos))
+    return soma_janela / amostras_janela
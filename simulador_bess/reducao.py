@@ -0,0 +1,82 @@
+"""
+Redução de séries longas para desenho: mínimo e máximo por coluna de pixels
+(a forma da curva, os picos e os vales são preservados) e escolha de
+intervalos de marcação conforme o horizonte.
+"""
+import numpy as np
+
+# Intervalos "redondos" (h) para marcações do eixo de tempo e anotações
+INTERVALOS_MARCACAO_H = (1, 2, 3, 4, 6, 12, 24, 48, 72, 168, 336, 720, 1440, 2160, 4320, 8760)
+
+
+def _baldes(valores, numero_baldes):
+    """
+    Matriz (baldes x pontos por balde) com trechos consecutivos de ``valores``;
+    o último balde é completado com o último valor (não altera mínimo nem
+    máximo). None se a série já tem até 2 pontos por balde.
+    """
+    numero_de_pontos = len(valores)
+    if numero_baldes < 1 or numero_de_pontos <= 2 * numero_baldes:
+        return None
+    tamanho_balde = -(-numero_de_pontos // numero_baldes)
+    numero_baldes = -(-numero_de_pontos // tamanho_balde)
+    completo = np.empty(numero_baldes * tamanho_balde)
+    completo[:numero_de_pontos] = valores
+    completo[numero_de_pontos:] = valores[-1]
+    return completo.reshape(numero_baldes, tamanho_balde)
+
+
+def indices_min_max(valores, numero_baldes):
+    """
+    Índices (em ordem) do mínimo e do máximo de cada um de ``numero_baldes``
+    trechos consecutivos de ``valores``, mais o primeiro e o último ponto.
+    Séries com até 2 pontos por balde são devolvidas inteiras.
+    """
+    numero_de_pontos = len(valores)
+    baldes = _baldes(valores, numero_baldes)
+    if baldes is None:
+        return np.arange(numero_de_pontos)
+    inicio = np.arange(len(baldes)) * baldes.shape[1]
+    indices = np.sort(np.stack((inicio + baldes.argmin(axis=1), inicio + baldes.argmax(axis=1)), axis=1), axis=1)
+    indices = np.minimum(indices.ravel(), numero_de_pontos - 1)
+    return np.unique(np.concatenate(([0], indices, [numero_de_pontos - 1])))
+
+
+def reduzir_min_max(vetor_tempo, valores, numero_baldes):
+    """(tempo, valores) reduzidos a no máximo ~2 pontos por balde (ver ``indices_min_max``)."""
+    indices = indices_min_max(valores, numero_baldes)
+    return np.asarray(vetor_tempo)[indices], np.asarray(valores)[indices]
+
+
+def envoltoria_min_max(vetor_tempo, valores, numero_baldes):
+    """
+    Envoltória para áreas preenchidas: (tempo, mínimos, máximos) em degraus,
+    com o instante inicial e o final de cada balde. Preencher de zero até os
+    máximos (ou mínimos) cobre os mesmos pixels que a série completa, com um
+    polígono simples em vez de um zigue-zague por coluna. Séries com até 2
+    pontos por balde são devolvidas inteiras.
+    """
+    vetor_tempo = np.asarray(vetor_tempo)
+    valores = np.asarray(valores)
+    baldes = _baldes(valores, numero_baldes)
+    if baldes is None:
+        return vetor_tempo, valores, valores
+    inicio = np.arange(len(baldes)) * baldes.shape[1]
+    fim = np.minimum(inicio + baldes.shape[1], len(valores)) - 1
+    tempo = np.stack((vetor_tempo[inicio], vetor_tempo[fim]), axis=1).ravel()
+    return tempo, np.repeat(baldes.min(axis=1), 2), np.repeat(baldes.max(axis=1), 2)
+
+
+def fatia_janela(vetor_tempo, inicio_h=None, fim_h=None):
+    """Fatia dos passos com tempo em [``inicio_h``, ``fim_h``] (vetor de tempo crescente)."""
+    inicio = 0 if inicio_h is None else int(np.searchsorted(vetor_tempo, inicio_h, side="left"))
+    fim = len(vetor_tempo) if fim_h is None else int(np.searchsorted(vetor_tempo, fim_h, side="right"))
+    return slice(inicio, fim)
+
+
+def intervalo_marcacoes_h(duracao_h, maximo_marcacoes, minimo_h=1):
+    """Menor intervalo redondo (h), não inferior a ``minimo_h``, com até ``maximo_marcacoes`` na duração."""
+    for intervalo in INTERVALOS_MARCACAO_H:
+        if intervalo >= minimo_h and duracao_h / intervalo <= maximo_marcacoes:
+            return intervalo
+    return INTERVALOS_MARCACAO_H[-1] * max(1, int(np.ceil(duracao_h / (INTERVALOS_MARCACAO_H[-1] * maximo_marcacoes))))
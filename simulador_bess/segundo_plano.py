@@ -0,0 +1,127 @@
+"""
+Cálculos em segundo plano, compartilhados pelo processo inteiro.
+
+Cada tarefa é identificada por uma chave (nome e argumentos) e fica
+registrada depois de concluída, então pedir de novo a mesma chave devolve o
+mesmo resultado sem recalcular. Há duas filas:
+
+- ``obter``: o que a tela visível precisa agora (até ``TRABALHADORES_VISIVEIS``
+  tarefas em paralelo). Se a mesma chave estava só na fila de pré-cálculo,
+  ela é retirada de lá e passa para esta fila.
+- ``pre_calcular``: análises que a tela visível não usa, calculadas depois
+  dela em um único trabalhador. Um novo pré-cálculo do mesmo ``grupo``
+  descarta os do grupo que ainda não começaram (parâmetros já alterados).
+
+A função da tarefa recebe a própria ``Tarefa`` e pode publicar resultados
+parciais com ``tarefa.publicar(nome, valor)``; quem aguarda lê
+``tarefa.parciais()`` enquanto ela não termina.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .instrumentacao import registrar_cache
+
+TRABALHADORES_VISIVEIS = 2
+# Tarefas concluídas mantidas no registro (as mais antigas saem primeiro)
+MAXIMO_TAREFAS = 32
+
+_trava = threading.Lock()
+_tarefas = OrderedDict()  # chave -> Tarefa
+_executores = {}
+
+
+class Tarefa:
+    """Cálculo agendado: resultado futuro e parciais publicados até agora."""
+
+    def __init__(self, chave, calcular, grupo=None):
+        self.chave = chave
+        self.grupo = grupo
+        self.futuro = None
+        self._calcular = calcular
+        self._parciais = {}
+        self._trava = threading.Lock()
+
+    def _executar(self):
+        return self._calcular(self)
+
+    def publicar(self, nome, valor):
+        with self._trava:
+            self._parciais[nome] = valor
+
+    def parciais(self):
+        """Cópia dos resultados parciais publicados até agora (na ordem)."""
+        with self._trava:
+            return dict(self._parciais)
+
+    def concluida(self):
+        return self.futuro.done()
+
+    def resultado(self, timeout=None):
+        return self.futuro.result(timeout)
+
+
+def _executor(nome, trabalhadores):
+    if nome not in _executores:
+        _executores[nome] = ThreadPoolExecutor(max_workers=trabalhadores, thread_name_prefix=f"simulador_bess_{nome}")
+    return _executores[nome]
+
+
+def _falhou(tarefa):
+    """Cancelada ou terminada com exceção (um novo pedido calcula de novo)."""
+    futuro = tarefa.futuro
+    return futuro.cancelled() or (futuro.done() and futuro.exception() is not None)
+
+
+def _guardar(tarefa):
+    _tarefas[tarefa.chave] = tarefa
+    excedentes = [chave for chave, t in _tarefas.items() if t.futuro is not None and t.futuro.done()]
+    for chave in excedentes[:max(0, len(_tarefas) - MAXIMO_TAREFAS)]:
+        del _tarefas[chave]
+
+
+def obter(chave, calcular):
+    """
+    Tarefa de ``chave`` para a tela visível: a já registrada (em execução ou
+    concluída) ou uma nova, iniciada imediatamente.
+    """
+    with _trava:
+        tarefa = _tarefas.get(chave)
+        if tarefa is not None and not _falhou(tarefa):
+            if tarefa.futuro.done() or tarefa.futuro.running() or not tarefa.futuro.cancel():
+                _tarefas.move_to_end(chave)
+                registrar_cache("segundo_plano", tarefa.futuro.done())
+                return tarefa
+        registrar_cache("segundo_plano", False)
+        tarefa = Tarefa(chave, calcular)
+        tarefa.futuro = _executor("visivel", TRABALHADORES_VISIVEIS).submit(tarefa._executar)
+        _guardar(tarefa)
+        return tarefa
+
+
+def pre_calcular(chave, calcular, grupo=None):
+    """
+    Agenda ``calcular`` para depois da tela visível, se ``chave`` ainda não
+    foi calculada nem agendada. Pré-cálculos pendentes do mesmo ``grupo`` são
+    descartados.
+    """
+    with _trava:
+        if grupo is not None:
+            for outra in list(_tarefas.values()):
+                if outra.grupo == grupo and outra.chave != chave and outra.futuro.cancel():
+                    del _tarefas[outra.chave]
+        tarefa = _tarefas.get(chave)
+        if tarefa is not None and not _falhou(tarefa):
+            return tarefa
+        tarefa = Tarefa(chave, calcular, grupo)
+        tarefa.futuro = _executor("pre_calculo", 1).submit(tarefa._executar)
+        _guardar(tarefa)
+        return tarefa
+
+
+def descartar_tarefas():
+    """Cancela o que ainda não começou e esquece as tarefas registradas."""
+    with _trava:
+        for tarefa in _tarefas.values():
+            tarefa.futuro.cancel()
+        _tarefas.clear()
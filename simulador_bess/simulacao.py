@@ -0,0 +1,251 @@
+"""
+Simulação detalhada de curto prazo (Gráficos 1 e 3) e sua versão em blocos
+para horizontes longos (memória limitada ao tamanho do bloco).
+"""
+import os
+
+import numpy as np
+
+from .colunar import ResultadoColunar, SERIES_CONTAGEM, compactar_resultado
+from .constantes import EFICIENCIA_FV, INTERVALOS_POR_HORA
+from .degradacao import DIAS_POR_ANO, ContadorRainflow, indicadores_degradacao, perda_capacidade
+from .despacho import calcular_consumo_diesel, executar_despacho
+from .frota import simular_frota
+from .instrumentacao import fase
+from .perfis import (
+    PASSOS_POR_DIA, montar_vetor_carga, montar_vetor_tempo, perfil_fv_diario,
+    semente_ruido_fv,
+)
+
+# Tamanho padrão dos blocos da simulação em blocos
+DIAS_POR_BLOCO = 30
+
+# Séries passo a passo da simulação detalhada
+SERIES_DETALHADAS = (
+    "vetor_tempo", "vetor_carga", "vetor_geracao_fv_original", "vetor_geracao_fv_suavizada",
+    "vetor_gmg_potencia_despachada", "vetor_potencia_bess", "vetor_soc_kwh",
+    "vetor_gmgs_despachados", "vetor_fv_para_carga",
+)
+
+
+def simular_detalhado(
+    dias_simulacao,
+    potencia_pico_fv_base,
+    fator_irradiacao,
+    bess_capacidade_kwh,
+    bess_potencia_max_kw,
+    soc_inicial_fracao,
+    numero_total_gmgs,
+    gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente,
+    carga_limite_emergencia,
+    use_noise, # Flag para controlar o ruído no perfil FV
+    estrategia=None # Estratégia de despacho (simulador_bess.estrategias)
+):
+    """
+    Função central que executa a simulação detalhada para um número de dias.
+    Retorna tanto os vetores para gráficos quanto o consumo total de diesel,
+    os indicadores de degradação do BESS ('degradacao', ver
+    simulador_bess.degradacao) e a operação unidade a unidade dos GMGs
+    ('frota_gmg', ver simulador_bess.frota), em um
+    ``colunar.ResultadoColunar`` (acesso como dicionário, séries compactas).
+    """
+    
+    # --- 1. Preparação ---
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    vetor_tempo = montar_vetor_tempo(dias_simulacao)
+    
+    # Carga
+    vetor_carga = montar_vetor_carga(dias_simulacao)
+    
+    # FV
+    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
+    
+    # BESS
+    bess_soc_kwh = bess_capacidade_kwh * soc_inicial_fracao
+
+    # --- 2. Geração de Perfil FV ---
+    # Um dia (memorizado) replicado: a suavização circular já vale entre dias
+    with fase("perfil_fv"):
+        geracao_fv_dia, geracao_fv_suavizada_dia = perfil_fv_diario(
+            potencia_pico_fv_base, fator_irradiacao, semente_ruido_fv(use_noise))
+        vetor_geracao_fv_original = np.tile(geracao_fv_dia, dias_simulacao)
+        vetor_geracao_fv_suavizada = np.tile(geracao_fv_suavizada_dia, dias_simulacao)
+
+    # --- 3. Despacho (kernel em simulador_bess.despacho) ---
+    resultado_despacho = executar_despacho(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+        potencia_pico_fv_base, bess_capacidade_kwh, bess_potencia_max_kw, bess_soc_kwh,
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+        carga_limite_emergencia, passo_de_tempo_h, passos_por_periodo=PASSOS_POR_DIA,
+        estrategia=estrategia
+    )
+
+    # Retorna todos os resultados em formato colunar compacto
+    return montar_resultado_detalhado(
+        vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, resultado_despacho,
+        potencia_pico_fv_curto, bess_capacidade_kwh, numero_total_gmgs, gmg_potencia_unitaria, passo_de_tempo_h
+    )
+
+
+def montar_resultado_detalhado(
+    vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, resultado_despacho,
+    potencia_pico_fv_curto, bess_capacidade_kwh, numero_total_gmgs, gmg_potencia_unitaria,
+    passo_de_tempo_h, tempo_implicito=True
+):
+    """
+    Resultado de ``simular_detalhado`` a partir das séries de entrada e da
+    saída de ``executar_despacho``: séries, diesel total, 'degradacao' e
+    'frota_gmg'. Com ``tempo_implicito`` o eixo de tempo é o índice do passo
+    vezes ``passo_de_tempo_h``; senão ``vetor_tempo`` fica como coluna (ex.:
+    séries medidas).
+    """
+    numero_de_passos = len(vetor_carga)
+    vetor_soc_kwh = resultado_despacho["vetor_soc_kwh"]
+    vetor_gmg_potencia_despachada = resultado_despacho["vetor_gmg_potencia_despachada"]
+    vetor_gmgs_despachados = resultado_despacho["vetor_gmgs_despachados"]
+    return compactar_resultado({
+        "vetor_tempo": vetor_tempo, "vetor_carga": vetor_carga,
+        "vetor_geracao_fv_original": vetor_geracao_fv_original, "vetor_geracao_fv_suavizada": vetor_geracao_fv_suavizada,
+        "vetor_gmg_potencia_despachada": vetor_gmg_potencia_despachada,
+        "vetor_potencia_bess": resultado_despacho["vetor_potencia_bess"],
+        "vetor_soc_kwh": vetor_soc_kwh, "vetor_gmgs_despachados": vetor_gmgs_despachados,
+        "potencia_pico_fv_curto": potencia_pico_fv_curto, "numero_de_passos": numero_de_passos,
+        "vetor_fv_para_carga": resultado_despacho["vetor_fv_para_carga"],
+        "total_diesel_consumido": resultado_despacho["total_diesel_consumido"],
+        "degradacao": indicadores_degradacao(
+            vetor_soc_kwh, bess_capacidade_kwh, numero_de_passos * passo_de_tempo_h / 24),
+        "frota_gmg": simular_frota(vetor_gmg_potencia_despachada, vetor_gmgs_despachados,
+                                   numero_total_gmgs, gmg_potencia_unitaria, passo_de_tempo_h),
+    }, passo_de_tempo_h if tempo_implicito else None)
+
+
+def simular_detalhado_em_blocos(
+    dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise,
+    dias_por_bloco=DIAS_POR_BLOCO, degradar_bess=False, estrategia=None
+):
+    """
+    Executa a mesma simulação de ``simular_detalhado`` em blocos de
+    ``dias_por_bloco`` dias, levando o SOC de um bloco para o seguinte, e gera
+    um resultado colunar por bloco com as séries do trecho (mesmas chaves) mais
+    'passo_inicial', 'soc_final_kwh' e 'bess_capacidade_kwh'.
+    'total_diesel_consumido' e 'degradacao' (contagem rainflow incremental)
+    são os acumulados desde o início do horizonte até o fim do bloco.
+
+    A memória usada pelas séries depende do tamanho do bloco, não do
+    horizonte (os dias repetidos são reaproveitados entre blocos), e as séries
+    concatenadas são idênticas às de uma execução única (o SOC passa de um
+    bloco para o outro em float64).
+
+    Com ``degradar_bess``, os blocos também são cortados na virada de cada
+    ano, e a partir dela a capacidade do BESS é a nominal reduzida pela perda
+    estimada até ali (o SOC mantém o mesmo percentual).
+    """
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
+    with fase("perfil_fv"):
+        geracao_fv_dia, geracao_fv_suavizada_dia = perfil_fv_diario(
+            potencia_pico_fv_base, fator_irradiacao, semente_ruido_fv(use_noise))
+    bess_soc_kwh = bess_capacidade_kwh * soc_inicial_fracao
+    total_diesel_consumido_litros = 0.0
+    # Dias já calculados (entradas + SOC inicial), compartilhados entre os blocos
+    memoria_periodos = {}
+    contador_rainflow = ContadorRainflow()
+    capacidade_kwh = bess_capacidade_kwh
+
+    inicios = set(range(0, dias_simulacao, dias_por_bloco))
+    if degradar_bess:
+        inicios.update(range(0, dias_simulacao, DIAS_POR_ANO))
+    inicios = sorted(inicios) + [dias_simulacao]
+    for dia_inicial, dia_final in zip(inicios, inicios[1:]):
+        dias_bloco = dia_final - dia_inicial
+        if degradar_bess and dia_inicial and dia_inicial % DIAS_POR_ANO == 0:
+            capacidade_anterior_kwh = capacidade_kwh
+            capacidade_kwh = bess_capacidade_kwh * (1 - perda_capacidade(
+                contador_rainflow.dano_ciclagem, dia_inicial / DIAS_POR_ANO))
+            bess_soc_kwh *= capacidade_kwh / max(capacidade_anterior_kwh, 1e-6)
+            memoria_periodos = {}  # os dias da capacidade anterior não se repetem
+        vetor_tempo = montar_vetor_tempo(dias_bloco, dia_inicial)
+        vetor_carga = montar_vetor_carga(dias_bloco, inclui_ultimo_dia=dia_inicial + dias_bloco == dias_simulacao)
+        vetor_geracao_fv_original = np.tile(geracao_fv_dia, dias_bloco)
+        vetor_geracao_fv_suavizada = np.tile(geracao_fv_suavizada_dia, dias_bloco)
+
+        resultado_despacho = executar_despacho(
+            vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada,
+            potencia_pico_fv_base, capacidade_kwh, bess_potencia_max_kw, bess_soc_kwh,
+            numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente,
+            carga_limite_emergencia, passo_de_tempo_h, passos_por_periodo=PASSOS_POR_DIA,
+            memoria_periodos=memoria_periodos, estrategia=estrategia
+        )
+        bess_soc_kwh = resultado_despacho["soc_final_kwh"]
+        contador_rainflow.adicionar(resultado_despacho["vetor_soc_kwh"] / max(capacidade_kwh, 1e-6))
+        # Continua a soma sequencial do bloco anterior (mesma ordem de uma execução única)
+        gasto_passos_l = calcular_consumo_diesel(resultado_despacho["vetor_gmg_potencia_despachada"]) * passo_de_tempo_h
+        total_diesel_consumido_litros = float(np.cumsum(np.concatenate(([total_diesel_consumido_litros], gasto_passos_l)))[-1])
+
+        yield compactar_resultado({
+            "passo_inicial": dia_inicial * PASSOS_POR_DIA, "vetor_carga": vetor_carga,
+            "vetor_geracao_fv_original": vetor_geracao_fv_original, "vetor_geracao_fv_suavizada": vetor_geracao_fv_suavizada,
+            "vetor_gmg_potencia_despachada": resultado_despacho["vetor_gmg_potencia_despachada"],
+            "vetor_potencia_bess": resultado_despacho["vetor_potencia_bess"],
+            "vetor_soc_kwh": resultado_despacho["vetor_soc_kwh"],
+            "vetor_gmgs_despachados": resultado_despacho["vetor_gmgs_despachados"],
+            "potencia_pico_fv_curto": potencia_pico_fv_curto, "numero_de_passos": dias_bloco * PASSOS_POR_DIA,
+            "vetor_fv_para_carga": resultado_despacho["vetor_fv_para_carga"],
+            "total_diesel_consumido": total_diesel_consumido_litros, "soc_final_kwh": bess_soc_kwh,
+            "bess_capacidade_kwh": capacidade_kwh,
+            "degradacao": contador_rainflow.indicadores(dia_final / DIAS_POR_ANO, com_bess=bess_capacidade_kwh > 0)
+        }, passo_de_tempo_h, passo_inicial=dia_inicial * PASSOS_POR_DIA)
+
+
+def simular_detalhado_em_arquivos(
+    pasta, dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise,
+    dias_por_bloco=DIAS_POR_BLOCO, degradar_bess=False, estrategia=None
+):
+    """
+    Executa ``simular_detalhado_em_blocos`` gravando cada série em
+    ``pasta/<série>.npy`` (memória mapeada, preenchida bloco a bloco, nos
+    tipos compactos de ``colunar``; o tempo é implícito e não é gravado).
+
+    Retorna o mesmo resultado de ``simular_detalhado``, com as séries
+    abertas como memmap somente leitura (carregadas do disco sob demanda), e
+    'bess_capacidade_kwh' (capacidade no último bloco).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    numero_de_passos = dias_simulacao * PASSOS_POR_DIA
+    caminhos = {nome: os.path.join(pasta, f"{nome}.npy") for nome in SERIES_DETALHADAS if nome != "vetor_tempo"}
+    tipos = {nome: np.min_scalar_type(int(numero_total_gmgs)) if nome in SERIES_CONTAGEM else np.float32 for nome in caminhos}
+    saidas = {nome: np.lib.format.open_memmap(caminho, mode="w+", dtype=tipos[nome], shape=(numero_de_passos,))
+              for nome, caminho in caminhos.items()}
+
+    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
+    ultimo_bloco = None
+    for bloco in simular_detalhado_em_blocos(
+        dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh,
+        bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise, dias_por_bloco=dias_por_bloco,
+        degradar_bess=degradar_bess, estrategia=estrategia
+    ):
+        trecho = slice(bloco["passo_inicial"], bloco["passo_inicial"] + bloco["numero_de_passos"])
+        for nome, saida in saidas.items():
+            saida[trecho] = bloco[nome]
+        ultimo_bloco = bloco
+
+    for saida in saidas.values():
+        saida.flush()
+    del saidas
+
+    return ResultadoColunar(
+        {nome: np.load(caminho, mmap_mode="r") for nome, caminho in caminhos.items()},
+        {
+            "potencia_pico_fv_curto": potencia_pico_fv_curto, "numero_de_passos": numero_de_passos,
+            "total_diesel_consumido": ultimo_bloco["total_diesel_consumido"] if ultimo_bloco else 0.0,
+            "bess_capacidade_kwh": ultimo_bloco["bess_capacidade_kwh"] if ultimo_bloco else bess_capacidade_kwh,
+            "degradacao": ultimo_bloco["degradacao"] if ultimo_bloco else indicadores_degradacao([], bess_capacidade_kwh, 0)
+        },
+        passo_de_tempo_h=1.0 / INTERVALOS_POR_HORA
+    )
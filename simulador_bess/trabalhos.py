@@ -0,0 +1,327 @@
+"""
+Fila local de trabalhos longos (varreduras da grade do Gráfico 4), com o
+estado e os resultados parciais em disco.
+
+Cada trabalho tem uma pasta em ``pasta_trabalhos()`` com ``estado.json``
+(tipo, parâmetros, situação e progresso) e ``parcial.npy`` (resultados por
+ponto, NaN nos que faltam), regravados a cada bloco concluído com escrita
+atômica. O identificador vem do tipo e dos parâmetros (como a chave do cache
+em disco), então qualquer sessão do app, ou outro processo, encontra e
+acompanha o mesmo trabalho lendo o disco.
+
+- ``submeter``: agenda o trabalho (ou o retoma do último bloco salvo); um
+  trabalho concluído não é refeito.
+- ``cancelar``: pede a interrupção, atendida ao fim do bloco em execução; os
+  blocos já salvos continuam valendo para a retomada.
+- ``estado_trabalho`` / ``listar_trabalhos`` / ``resultado_trabalho``:
+  consulta.
+- ``retomar_interrompidos``: reagenda os trabalhos cujo processo morreu
+  (servidor reiniciado) antes de terminar.
+
+O dono de um trabalho ativo é gravado como PID, instante de início do
+processo e uma sessão aleatória: um processo novo que reaproveite o PID (o
+caso comum em contêineres) não se confunde com o dono antigo. Neste
+processo, um trabalho só está em execução se estiver em ``_agendados``.
+
+Os trabalhos rodam um de cada vez em uma thread do processo; a grade em si
+pode usar um pool de processos (``processos``).
+"""
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem trava entre processos
+    fcntl = None
+
+import numpy as np
+
+from .anual import consumo_anual_diesel_grade
+from .cache_disco import chave_cache, pasta_cache
+from .cronologico import consumo_anual_cronologico_grade
+
+SITUACOES_ATIVAS = ("na_fila", "executando")
+ARQUIVO_ESTADO = "estado.json"
+ARQUIVO_PARCIAL = "parcial.npy"
+ARQUIVO_CANCELAR = "cancelar"
+ARQUIVO_TRAVA = ".trava"
+
+_trava = threading.Lock()
+_agendados = set()  # identificadores na fila ou em execução neste processo
+_executor = None
+
+
+def _inicio_processo(pid):
+    """Instante de início do processo (tiques desde o boot, Linux) ou None."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as arquivo:
+            return int(arquivo.read().rsplit(")", 1)[1].split()[19])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+# Dono dos trabalhos agendados por este processo
+_DONO = {"pid": os.getpid(), "inicio": _inicio_processo(os.getpid()), "sessao": uuid.uuid4().hex}
+
+
+class TrabalhoCancelado(Exception):
+    """Levantada dentro do trabalho quando o cancelamento foi pedido."""
+
+
+def pasta_trabalhos():
+    """Pasta dos trabalhos (``SIMULADOR_BESS_TRABALHOS`` ou ``trabalhos`` na pasta do cache)."""
+    return os.environ.get("SIMULADOR_BESS_TRABALHOS", os.path.join(pasta_cache(), "trabalhos"))
+
+
+def _grade_anual(parametros, parcial, processos, ao_concluir_bloco):
+    """Grade FV x BESS do Gráfico 4 (``modelo``: "cronologico" ou "tipos_de_dia")."""
+    grade = consumo_anual_cronologico_grade if parametros["modelo"] == "cronologico" else consumo_anual_diesel_grade
+    return grade(
+        np.array(parametros["fv_range_kwp"], dtype=float), np.array(parametros["bess_range_kwh"], dtype=float),
+        parametros["numero_total_gmgs"], parametros["gmg_potencia_unitaria"],
+        parametros["gmg_fator_potencia_eficiente"], parametros["carga_limite_emergencia"],
+        processos=processos, diesel_parcial=parcial, ao_concluir_bloco=ao_concluir_bloco
+    )
+
+
+def _pontos_grade_anual(parametros):
+    return (len(parametros["fv_range_kwp"]), len(parametros["bess_range_kwh"]))
+
+
+# Tipo -> (função do trabalho, formato do resultado). A função recebe os
+# parâmetros, o resultado parcial (NaN nos pontos que faltam), o número de
+# processos e ``ao_concluir_bloco(indices, valores)``
+TIPOS = {
+    "grade_anual": (_grade_anual, _pontos_grade_anual),
+}
+
+
+def _normalizar(valor):
+    """Parâmetros em tipos JSON (arrays viram listas)."""
+    if isinstance(valor, np.ndarray):
+        return [_normalizar(v) for v in valor.tolist()]
+    if isinstance(valor, np.generic):
+        return valor.item()
+    if isinstance(valor, (list, tuple)):
+        return [_normalizar(v) for v in valor]
+    if isinstance(valor, dict):
+        return {str(k): _normalizar(v) for k, v in valor.items()}
+    return valor
+
+
+def identificador_trabalho(tipo, parametros):
+    """Identificador do trabalho: o mesmo tipo e parâmetros dão o mesmo trabalho."""
+    return f"{tipo}-{chave_cache(f'trabalho:{tipo}', _normalizar(parametros))[:16]}"
+
+
+def _pasta(identificador):
+    return os.path.join(pasta_trabalhos(), identificador)
+
+
+def _gravar_atomico(caminho, gravar):
+    """Grava em um temporário e renomeia: leitores nunca veem o arquivo pela metade."""
+    pasta = os.path.dirname(caminho)
+    descritor, temporario = tempfile.mkstemp(dir=pasta, prefix=".tmp-")
+    try:
+        with os.fdopen(descritor, "wb") as arquivo:
+            gravar(arquivo)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
+
+
+def _gravar_estado(identificador, estado):
+    estado["atualizado_em"] = time.time()
+    _gravar_atomico(
+        os.path.join(_pasta(identificador), ARQUIVO_ESTADO),
+        lambda arquivo: arquivo.write(json.dumps(estado, ensure_ascii=False, indent=1).encode("utf-8")))
+
+
+def estado_trabalho(identificador):
+    """Estado gravado do trabalho (dict) ou None se ele não existe ou está ilegível."""
+    try:
+        with open(os.path.join(_pasta(identificador), ARQUIVO_ESTADO), encoding="utf-8") as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+
+def listar_trabalhos():
+    """Estados de todos os trabalhos, do mais recente para o mais antigo."""
+    try:
+        nomes = os.listdir(pasta_trabalhos())
+    except FileNotFoundError:
+        return []
+    estados = [estado for estado in map(estado_trabalho, nomes) if estado is not None]
+    return sorted(estados, key=lambda estado: estado["criado_em"], reverse=True)
+
+
+def resultado_parcial(identificador):
+    """Resultados salvos até agora (formato do resultado, NaN nos pontos que faltam)."""
+    estado = estado_trabalho(identificador)
+    if estado is None:
+        return None
+    try:
+        parcial = np.load(os.path.join(_pasta(identificador), ARQUIVO_PARCIAL))
+    except FileNotFoundError:
+        parcial = np.full(estado["total_pontos"], np.nan)
+    return parcial.reshape(estado["formato"])
+
+
+def resultado_trabalho(identificador):
+    """Resultado de um trabalho concluído (None se ainda não terminou)."""
+    estado = estado_trabalho(identificador)
+    if estado is None or estado["situacao"] != "concluido":
+        return None
+    return resultado_parcial(identificador)
+
+
+def _executar(identificador, processos):
+    pasta = _pasta(identificador)
+    estado = estado_trabalho(identificador)
+    funcao, _ = TIPOS[estado["tipo"]]
+    caminho_parcial = os.path.join(pasta, ARQUIVO_PARCIAL)
+    caminho_cancelar = os.path.join(pasta, ARQUIVO_CANCELAR)
+    parcial = resultado_parcial(identificador).ravel()
+
+    def ao_concluir_bloco(indices, valores):
+        parcial[indices] = valores
+        _gravar_atomico(caminho_parcial, lambda arquivo: np.save(arquivo, parcial))
+        estado["pontos_concluidos"] = int(np.count_nonzero(~np.isnan(parcial)))
+        _gravar_estado(identificador, estado)
+        if os.path.exists(caminho_cancelar):
+            raise TrabalhoCancelado()
+
+    try:
+        if os.path.exists(caminho_cancelar):
+            raise TrabalhoCancelado()
+        estado.update(situacao="executando", dono=_DONO, erro=None)
+        _gravar_estado(identificador, estado)
+        resultado = np.asarray(funcao(estado["parametros"], parcial.reshape(estado["formato"]), processos, ao_concluir_bloco), dtype=float)
+        _gravar_atomico(caminho_parcial, lambda arquivo: np.save(arquivo, resultado.ravel()))
+        estado.update(situacao="concluido", pontos_concluidos=estado["total_pontos"])
+    except TrabalhoCancelado:
+        estado["situacao"] = "cancelado"
+    except Exception as erro:
+        estado.update(situacao="falhou", erro=f"{type(erro).__name__}: {erro}")
+    finally:
+        with _trava:
+            _agendados.discard(identificador)
+        _gravar_estado(identificador, estado)
+
+
+@contextlib.contextmanager
+def _trava_entre_processos(identificador):
+    """Trava exclusiva da pasta do trabalho entre processos (sem efeito sem ``fcntl``)."""
+    os.makedirs(_pasta(identificador), exist_ok=True)
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(_pasta(identificador), ARQUIVO_TRAVA), "a") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _dono_em_outro_processo(estado):
+    """True se o trabalho ativo pertence a outro processo ainda vivo."""
+    dono = estado.get("dono")
+    if dono is None or dono.get("sessao") == _DONO["sessao"] or dono.get("pid") in (None, os.getpid()):
+        # Sem dono, deste processo ou de um anterior com o mesmo PID (já morto)
+        return False
+    if not _processo_vivo(dono["pid"]):
+        return False
+    inicio = _inicio_processo(dono["pid"])
+    return inicio is None or dono.get("inicio") is None or inicio == dono["inicio"]
+
+
+def _agendado_aqui(identificador):
+    with _trava:
+        return identificador in _agendados
+
+
+def submeter(tipo, parametros, processos=1):
+    """
+    Agenda o trabalho ``tipo`` com ``parametros`` e devolve o identificador.
+    Se ele já existe, é retomado do último bloco salvo; concluído, já na fila
+    neste processo ou ativo em outro processo vivo, nada é feito.
+    ``processos`` não faz parte da identidade (o resultado é o mesmo).
+    """
+    global _executor
+    parametros = _normalizar(parametros)
+    identificador = identificador_trabalho(tipo, parametros)
+    with _trava, _trava_entre_processos(identificador):
+        estado = estado_trabalho(identificador)
+        if identificador in _agendados or (estado is not None and (
+                estado["situacao"] == "concluido"
+                or (estado["situacao"] in SITUACOES_ATIVAS and _dono_em_outro_processo(estado)))):
+            return identificador
+        try:
+            os.unlink(os.path.join(_pasta(identificador), ARQUIVO_CANCELAR))
+        except FileNotFoundError:
+            pass
+        if estado is None:
+            formato = list(TIPOS[tipo][1](parametros))
+            estado = {
+                "identificador": identificador, "tipo": tipo, "parametros": parametros,
+                "formato": formato, "total_pontos": int(np.prod(formato)), "pontos_concluidos": 0,
+                "criado_em": time.time(), "erro": None,
+            }
+        estado.update(situacao="na_fila", dono=_DONO)
+        _gravar_estado(identificador, estado)
+        _agendados.add(identificador)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulador_bess_trabalhos")
+        _executor.submit(_executar, identificador, processos)
+    return identificador
+
+
+def cancelar(identificador):
+    """
+    Pede o cancelamento (vale para qualquer processo que execute o trabalho).
+    Um trabalho ainda na fila é cancelado antes de começar.
+    """
+    estado = estado_trabalho(identificador)
+    if estado is None or estado["situacao"] not in SITUACOES_ATIVAS:
+        return
+    if not _agendado_aqui(identificador) and not _dono_em_outro_processo(estado):
+        # Ninguém o executa: basta registrar o cancelamento
+        estado["situacao"] = "cancelado"
+        _gravar_estado(identificador, estado)
+        return
+    with open(os.path.join(_pasta(identificador), ARQUIVO_CANCELAR), "w", encoding="utf-8"):
+        pass
+
+
+def retomar_interrompidos(processos=1):
+    """
+    Reagenda neste processo os trabalhos que estavam na fila ou em execução
+    em um processo que não existe mais. Devolve os identificadores retomados.
+    """
+    retomados = []
+    for estado in listar_trabalhos():
+        if estado["situacao"] not in SITUACOES_ATIVAS:
+            continue
+        if _agendado_aqui(estado["identificador"]) or _dono_em_outro_processo(estado):
+            continue
+        retomados.append(submeter(estado["tipo"], estado["parametros"], processos=processos))
+    return retomados
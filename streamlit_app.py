@@ -1,7 +1,11 @@
+import importlib.util
+import json
+import os
+import time
+
 import streamlit as st
 import numpy as np
 import matplotlib.pyplot as plt
-import pandas as pd
 
 # ==============================================================================
 # 1. CONFIGURAÇÃO DA PÁGINA E CONSTANTES GLOBAIS
@@ -16,53 +20,95 @@ st.set_page_config(
 )
 
 # --- Constantes do Modelo (Não alteráveis pela UI) ---
-INTERVALOS_POR_HORA = 12 # Intervalos de 5 min (60/12 = 5 min)
-DIAS_SIMULACAO_LONGA = 120 # Limite de dias para o gráfico de autonomia
-EFICIENCIA_FV = 0.75
-
-# Carga (Dados mantidos)
-DADOS_CARGA_HORARIA_STR = "17.000-17.000-17.000-17.000-17.000-20.000-34.000-39.000-45.000-50.000-65.000-85.000-80.000-75.000-60.000-42.000-50.000-84.000-150.000-79.000-61.000-45.000-30.000-25.000"
-CARGA_HORARIA_24H = [float(val.replace('.', ''))/1000 for val in DADOS_CARGA_HORARIA_STR.split('-')]
-
-# BESS (Constantes) DADOS DO CASE DO BESS
-BESS_EFICIENCIA_CICLO_COMPLETO = 0.82
-EFICIENCIA_CARREGAMENTO = 0.86
-EFICIENCIA_DESCARREGAMENTO = 0.96
-
-SOC_LIMITE_MAX_SUA = 92
-SOC_LIMITE_MAX = 90
-SOC_LIMITE_MIN_NORMAL = 40
-SOC_LIMITE_MIN_EMERGENCIA = 20
-SOC_RAMPA_INICIO = 85 # SOC (%) em que a potência de carga começa a ser reduzida
-
-POT_MAX_BESS_RECARREGAR = 0.9 # (%) da Potência Nominal
-
-# Aplicações (Constantes)
-ATIVAR_SUAVIZACAO_FV = True
-JANELA_SUAVIZACAO_MINUTOS = 15 # Define a "suavidade" da rampa.
-
-# Diesel (Constantes)
-CAPACIDADE_TOTAL_DIESEL_L = 12000
-SFC = 0.31 # Fator de Consumo Específico: L/kWh
-
-# Perfil de Geração FV (Constante)
-LIMIAR_SUAVIZACAO = 0.02  # em fração da potência nominal FV (2%)
+from simulador_bess.constantes import (
+    INTERVALOS_POR_HORA, DIAS_SIMULACAO_LONGA, EFICIENCIA_FV,
+    SOC_LIMITE_MAX, SOC_LIMITE_MIN_NORMAL, SOC_LIMITE_MIN_EMERGENCIA, SOC_RAMPA_INICIO,
+    CAPACIDADE_TOTAL_DIESEL_L,
+)
+from simulador_bess.autonomia import simular_cenarios_autonomia
+from simulador_bess.cache_disco import cache_em_disco
+from simulador_bess.colunar import autonomia_colunar, congelar
+from simulador_bess.estrategias import ESTRATEGIAS
+from simulador_bess.etapas import simular_detalhado_em_etapas
+from simulador_bess.instrumentacao import (
+    ativar_instrumentacao, fase, faltas_cache, instrumentacao_ativa, registrar_cache,
+    relatorio, trace_chrome, zerar_instrumentacao,
+)
+from simulador_bess.lote import simular_lote
+from simulador_bess.montecarlo import PERSISTENCIA_CLIMA, simular_monte_carlo_autonomia
+from simulador_bess.otimo import PENALIDADE_CARGA_NAO_ATENDIDA, carga_nao_atendida_kwh, custo_equivalente_l, simular_otimo
+from simulador_bess.otimizacao import CUSTOS_PADRAO, LIMITES_PADRAO, otimizar_dimensionamento
+from simulador_bess.reducao import envoltoria_min_max, fatia_janela, intervalo_marcacoes_h
+from simulador_bess.segundo_plano import obter, pre_calcular
+from simulador_bess.trabalhos import (
+    SITUACOES_ATIVAS, cancelar, estado_trabalho, identificador_trabalho, listar_trabalhos, resultado_trabalho,
+    retomar_interrompidos, submeter,
+)
 
-FATOR_GERACAO_HORARIA = {
-    6: 0.1, 7: 0.3, 8: 0.5, 9: 0.65, 10: 0.72, 11: 0.75, 12: 0.73,
-    13: 0.68, 14: 0.58, 15: 0.45, 16: 0.28, 17: 0.1, 18: 0.0
+# Densidade máxima de marcações do eixo de tempo e de anotações de GMGs no Gráfico 1
+MAXIMO_MARCACOES_X = 40
+MAXIMO_ANOTACOES_GMG = 40
+# Tamanho e resolução (dpi) do PNG do Gráfico 1: a resolução padrão do
+# st.pyplot nos horizontes curtos e menor quando as séries são reduzidas por
+# coluna de pixels (horizontes longos), em que o custo é desenhar e codificar
+TAMANHO_GRAFICO_1_POL = (18, 12)
+DPI_GRAFICO_1 = 200
+DPI_GRAFICO_1_REDUZIDO = 80
+MARGENS_GRAFICO_1 = dict(left=0.055, right=0.985, bottom=0.061, top=0.955, hspace=0.063)
+# Intervalo (s) entre atualizações dos resultados parciais na tela
+INTERVALO_ATUALIZACAO_S = 0.25
+# Simulações detalhadas guardadas (uma cópia por processo, compartilhada pelas sessões)
+RESULTADOS_COMPARTILHADOS = 16
+# Nomes exibidos das estratégias de despacho (simulador_bess.estrategias)
+ROTULOS_ESTRATEGIAS = {
+    "padrao": "Padrão",
+    "economia_diesel": "Economia de diesel (mais BESS)",
+    "preservar_bess": "Preservar BESS (mais GMG)",
 }
 
 # ==============================================================================
-# 2. FUNÇÕES DE SIMULAÇÃO (UNIFICADAS E CACHEADAS)
+# 2. FUNÇÕES DE SIMULAÇÃO (CACHEADAS)
 # ==============================================================================
+# O modelo fica no pacote simulador_bess (sem dependência do Streamlit);
+# aqui apenas aplicamos o cache do Streamlit sobre ele. Abaixo do cache em
+# memória fica o cache em disco, compartilhado entre réplicas e reinícios
+# (pasta e limite configuráveis por SIMULADOR_BESS_CACHE / SIMULADOR_BESS_CACHE_MB).
+# Simulações detalhada e de autonomia: acertos do disco abrem as séries como
+# memmap somente leitura (sem cópia, páginas compartilhadas entre réplicas)
+simular_detalhado_em_etapas = cache_em_disco(simular_detalhado_em_etapas, ignorar=("memoria_etapas",), mapear=True)
+simular_cenarios_autonomia = cache_em_disco(simular_cenarios_autonomia, ignorar=("ao_concluir_cenario",), mapear=True)
+simular_monte_carlo_autonomia = cache_em_disco(simular_monte_carlo_autonomia)
+otimizar_dimensionamento = cache_em_disco(otimizar_dimensionamento, ignorar=("ao_progredir",))
+
+
+def chamar_com_cache(funcao, *args, **kwargs):
+    """
+    Chama uma função com st.cache_data medindo o tempo total (hash dos
+    argumentos, cópia do resultado e, na falta, o cálculo). Cada função
+    cacheada registra a própria falta ao executar; se nada foi registrado, foi
+    um acerto.
+    """
+    if not instrumentacao_ativa():
+        return funcao(*args, **kwargs)
+    nome = f"st:{funcao.__name__}"
+    faltas = faltas_cache(nome)
+    with fase(f"st.cache_data.{funcao.__name__}"):
+        resultado = funcao(*args, **kwargs)
+    if faltas_cache(nome) == faltas:
+        registrar_cache(nome, True)
+    return resultado
+
+
+@st.cache_resource
+def memoria_etapas():
+    """
+    Resultados das etapas da simulação detalhada (perfis, despacho,
+    indicadores), compartilhados entre as sessões: uma mudança na barra
+    lateral refaz só as etapas que dependem do parâmetro alterado.
+    """
+    return {}
 
-def calcular_consumo_diesel(potencia_saida_kw):
-    """Calcula o consumo de diesel em L/h com base na potência gerada."""
-    return potencia_saida_kw * SFC
-
-# --- NOVA FUNÇÃO CENTRAL DE SIMULAÇÃO ---
-@st.cache_data(show_spinner=False)
+@st.cache_resource(show_spinner=False, max_entries=RESULTADOS_COMPARTILHADOS)
 def _run_simulation_detailed(
     dias_simulacao,
     potencia_pico_fv_base,
@@ -74,402 +120,171 @@ def _run_simulation_detailed(
     gmg_potencia_unitaria,
     gmg_fator_potencia_eficiente,
     carga_limite_emergencia,
-    use_noise # Flag para controlar o ruído no perfil FV
+    use_noise, # Flag para controlar o ruído no perfil FV
+    estrategia="padrao"
 ):
     """
-    Função central que executa a simulação detalhada para um número de dias.
-    Retorna tanto os vetores para gráficos quanto o consumo total de diesel.
+    Simulação detalhada em etapas (ver simulador_bess.etapas). O resultado é
+    guardado uma vez por processo, somente leitura, e todas as sessões
+    recebem o mesmo objeto: um acerto não copia nem desserializa as séries.
+
+    Sem numba, o ganho grande do despacho vem de reaproveitar dias idênticos
+    (mesmas entradas e SOC inicial, ver ``executar_despacho``), o que só
+    acontece depois que o SOC entra no ciclo diário. Em horizontes curtos
+    (1 a 3 dias, o padrão da barra lateral) todo dia é novo e cada passo custa
+    o laço em Python puro (alguns µs); com numba (opcional, ver
+    requirements.txt) o laço é compilado.
     """
-    
-    # --- 1. Preparação ---
-    numero_de_passos = dias_simulacao * 24 * INTERVALOS_POR_HORA
-    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
-    vetor_tempo = np.linspace(0, dias_simulacao * 24, numero_de_passos, endpoint=False)
-    
-    # Carga
-    carga_horaria_dias = CARGA_HORARIA_24H * dias_simulacao
-    pontos_de_tempo_horarios = np.arange(dias_simulacao * 24)
-    vetor_carga = np.interp(vetor_tempo, pontos_de_tempo_horarios, carga_horaria_dias)
-    
-    # FV
-    potencia_pico_fv_curto = potencia_pico_fv_base * EFICIENCIA_FV * fator_irradiacao
-    
-    # BESS
-    bess_soc_kwh = bess_capacidade_kwh * soc_inicial_fracao
-    
-    # GMG
-    gmg_potencia_max_por_unidade = gmg_potencia_unitaria * gmg_fator_potencia_eficiente
-    
-    # Suavização
-    janela_suavizacao_passos = int(JANELA_SUAVIZACAO_MINUTOS / (60 / INTERVALOS_POR_HORA))
-
-    # --- 2. Geração de Perfil FV ---
-    np.random.seed(42)
-    perfil_fv_24h = np.zeros(24 * INTERVALOS_POR_HORA)
-    
-    for i, t in enumerate(np.linspace(0, 24, 24 * INTERVALOS_POR_HORA, endpoint=False)):
-        hora_base = int(t)
-        if hora_base in FATOR_GERACAO_HORARIA and (hora_base + 1) in FATOR_GERACAO_HORARIA:
-            valor_inicial = FATOR_GERACAO_HORARIA[hora_base]
-            valor_final = FATOR_GERACAO_HORARIA[hora_base + 1]
-            fracao = t - hora_base
-            valor_interpolado = valor_inicial + (valor_final - valor_inicial) * fracao
-            valor_final_fv = valor_interpolado
-            if use_noise:
-                ruido = np.random.normal(0, 0.08)
-                ruido = np.clip(ruido, -0.15, 0.15)
-                valor_final_fv = valor_interpolado * (1 + ruido)
-            perfil_fv_24h[i] = max(0, valor_final_fv * potencia_pico_fv_curto)
-        elif hora_base in FATOR_GERACAO_HORARIA:
-            valor = FATOR_GERACAO_HORARIA[hora_base]
-            valor_final_fv = valor
-            if use_noise:
-                ruido = np.random.normal(0, 0.08)
-                ruido = np.clip(ruido, -0.15, 0.15)
-                valor_final_fv = valor * (1 + ruido)
-            perfil_fv_24h[i] = max(0, valor_final_fv * potencia_pico_fv_curto)
-
-    vetor_geracao_fv_original = np.tile(perfil_fv_24h, dias_simulacao)
-    vetor_geracao_fv_original[vetor_geracao_fv_original < 0] = 0
-
-    if ATIVAR_SUAVIZACAO_FV and janela_suavizacao_passos > 1:
-        series_fv = pd.Series(vetor_geracao_fv_original)
-        vetor_geracao_fv_suavizada = series_fv.rolling(window=janela_suavizacao_passos, center=True, min_periods=1).mean().to_numpy()
-    else:
-        vetor_geracao_fv_suavizada = np.copy(vetor_geracao_fv_original)
-
-    # --- 3. Loop Principal da Simulação ---
-    vetor_potencia_bess = np.zeros(numero_de_passos)
-    vetor_soc_kwh = np.zeros(numero_de_passos)
-    vetor_gmg_potencia_despachada = np.zeros(numero_de_passos)
-    vetor_gmgs_despachados = np.zeros(numero_de_passos)
-    vetor_fv_para_carga = np.zeros(numero_de_passos)
-    total_diesel_consumido_litros = 0.0
-    
-    if numero_de_passos > 0:
-        vetor_soc_kwh[0] = bess_soc_kwh
+    registrar_cache("st:_run_simulation_detailed", False)
+    return congelar(simular_detalhado_em_etapas(
+        dias_simulacao, potencia_pico_fv_base, fator_irradiacao, bess_capacidade_kwh,
+        bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise,
+        memoria_etapas=memoria_etapas(), estrategia=estrategia
+    ))
 
-    for i in range(numero_de_passos):
-        if i > 0:
-            bess_soc_kwh = vetor_soc_kwh[i-1] 
-        
-        # Lógica de Despacho... (copiada de run_short_term_simulation)
-        soc_percentual_atual = (bess_soc_kwh / bess_capacidade_kwh) * 100 if bess_capacidade_kwh > 1e-6 else 0
-        potencia_carga_atual = vetor_carga[i]
-        geracao_fv_bruta = vetor_geracao_fv_original[i]
-        geracao_fv_meta = vetor_geracao_fv_suavizada[i]
-        hora_do_dia = vetor_tempo[i] % 24
-
-        bess_potencia_disponivel_carga = bess_potencia_max_kw * POT_MAX_BESS_RECARREGAR # (%) de Potência Máxima que o BESS pode descarregar
-        bess_potencia_disponivel_descarga = bess_potencia_max_kw
-        potencia_bess_suavizacao = 0
-
-        fator_rampa_carga = 1.0 # Controlador Proporcional para Voltage Control
-        if soc_percentual_atual > SOC_RAMPA_INICIO:
-            fator_rampa_carga = (SOC_LIMITE_MAX_SUA - soc_percentual_atual) / (SOC_LIMITE_MAX_SUA - SOC_RAMPA_INICIO)
-            fator_rampa_carga = max(0, min(1, fator_rampa_carga))
-
-        if ATIVAR_SUAVIZACAO_FV and hora_do_dia >= 6 and hora_do_dia < 18:
-            diferenca_fv = geracao_fv_bruta - geracao_fv_meta
-            # Ignorar variações pequenas
-            if abs(diferenca_fv) < LIMIAR_SUAVIZACAO * potencia_pico_fv_base:
-                diferenca_fv = 0  # Sem suavização para pequenas oscilações
-            # Verifica se há discrepância na suavização
-            if diferenca_fv > 0:
-                potencia_carregamento_alvo = min(diferenca_fv, bess_potencia_disponivel_carga) #Vê potência que será injetada
-                potencia_carregamento = potencia_carregamento_alvo * fator_rampa_carga
-                espaco_disponivel_kwh = max(0, (bess_capacidade_kwh * SOC_LIMITE_MAX_SUA / 100) - bess_soc_kwh)
-                energia_a_adicionar = (potencia_carregamento * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO
-                energia_final_adicionada = min(energia_a_adicionar, espaco_disponivel_kwh)
-                if energia_final_adicionada > 0:
-                    bess_soc_kwh += energia_final_adicionada
-                    potencia_bess_suavizacao = (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h
-                    bess_potencia_disponivel_carga -= potencia_bess_suavizacao
-            elif diferenca_fv < 0:
-                potencia_descarga = min(-diferenca_fv, bess_potencia_disponivel_descarga)
-                soc_min_kwh_atual = bess_capacidade_kwh * (SOC_LIMITE_MIN_EMERGENCIA if potencia_carga_atual > carga_limite_emergencia else SOC_LIMITE_MIN_NORMAL) / 100
-                energia_disponivel_kwh = max(0, bess_soc_kwh - soc_min_kwh_atual)
-                energia_a_remover_bruta = (potencia_descarga * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO
-                energia_final_removida = min(energia_a_remover_bruta, energia_disponivel_kwh)
-                if energia_final_removida > 0:
-                    bess_soc_kwh -= energia_final_removida
-                    potencia_bess_suavizacao = -((energia_final_removida * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h)
-                    bess_potencia_disponivel_descarga -= abs(potencia_bess_suavizacao)
-
-        geracao_fv_para_despacho = geracao_fv_meta
-        gmg_despacho_para_carga = 0
-        bess_despacho_para_carga = 0
-        bess_carga_pelo_fv = 0
-        fv_despacho_para_carga = 0
-        # Calculando novamente o SOC Atual para outras aplicações
-        soc_percentual_atual = (bess_soc_kwh / bess_capacidade_kwh) * 100 if bess_capacidade_kwh > 1e-6 else 0
-        # Verificando se o BESS pode contribuir para as aplicações de peak shaving ou arbitragem
-        bess_pode_ajudar = (soc_percentual_atual > SOC_LIMITE_MIN_NORMAL) or \
-                           (potencia_carga_atual > carga_limite_emergencia and soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA)
-        
-        # Se não houver planta FV, o BESS não deve operar, pois o BESS não faz sentido carregar com o GMG
-        if potencia_pico_fv_base <= 0:
-            bess_pode_ajudar = False
-
-        # Ajuda do BESS ponderada!
-        if hora_do_dia < 6 or hora_do_dia >= 17 or geracao_fv_bruta <= 0:
-            if bess_pode_ajudar:
-                if soc_percentual_atual > 75: gmg_meta_para_carga = 0.4 * potencia_carga_atual
-                elif soc_percentual_atual > 60: gmg_meta_para_carga = 0.5 * potencia_carga_atual
-                elif soc_percentual_atual > 50: gmg_meta_para_carga = 0.6 * potencia_carga_atual
-                else: gmg_meta_para_carga = 0.65 * potencia_carga_atual
-            else:
-                gmg_meta_para_carga = potencia_carga_atual #Caso o BESS não possa atuar, o GMG deve assumir toda a carga
+# --- Wrapper para Gráficos 1 e 3 ---
+def run_short_term_simulation(
+    dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, estrategia
+):
+    """Chama a simulação detalhada com RUÍDO para os gráficos principais."""
+    return chamar_com_cache(
+        _run_simulation_detailed, dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+        bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise=True, estrategia=estrategia
+    )
 
-            potencia_unitaria_a_usar = gmg_potencia_max_por_unidade
-            capacidade_eficiente_total = numero_total_gmgs * gmg_potencia_max_por_unidade
+def prefetch_short_term_simulation(
+    dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, estrategia
+):
+    """
+    Agenda a simulação detalhada em segundo plano. O resultado fica na
+    memória de etapas e no cache em disco, de onde os Gráficos 1 e 3 o leem.
+    """
+    argumentos = (
+        dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+        bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia
+    )
+    memoria = memoria_etapas()
 
-            if not bess_pode_ajudar and gmg_meta_para_carga > capacidade_eficiente_total:
-                potencia_unitaria_a_usar = gmg_potencia_unitaria
+    def calcular(tarefa):
+        simular_detalhado_em_etapas(*argumentos, use_noise=True, memoria_etapas=memoria, estrategia=estrategia)
 
-            gmgs_necessarios = np.ceil(gmg_meta_para_carga / potencia_unitaria_a_usar) if potencia_unitaria_a_usar > 0 else float('inf')
-            vetor_gmgs_despachados[i] = min(numero_total_gmgs, gmgs_necessarios)
-            gmg_despacho_para_carga = min(gmg_meta_para_carga, vetor_gmgs_despachados[i] * potencia_unitaria_a_usar)
-            carga_restante = potencia_carga_atual - gmg_despacho_para_carga
-            if bess_pode_ajudar:
-                bess_despacho_para_carga = min(carga_restante, bess_potencia_disponivel_descarga)
-        else:
-            if geracao_fv_para_despacho >= (potencia_carga_atual * 0.85):
-                gmg_meta_para_carga = 0.15 * potencia_carga_atual
-                fv_despacho_para_carga = 0.85 * potencia_carga_atual
-                excesso_fv_real = geracao_fv_bruta - fv_despacho_para_carga
-                bess_carga_pelo_fv = max(0, excesso_fv_real)
-            elif geracao_fv_para_despacho > 0 and soc_percentual_atual > 75:
-                fv_despacho_para_carga = geracao_fv_para_despacho
-                deficit = potencia_carga_atual - fv_despacho_para_carga
-                bess_despacho_para_carga = 0.75 * deficit
-                gmg_meta_para_carga = 0.25 * deficit
-            else:
-                fv_despacho_para_carga = geracao_fv_para_despacho
-                gmg_meta_para_carga = potencia_carga_atual - fv_despacho_para_carga
-
-                if soc_percentual_atual > SOC_LIMITE_MIN_EMERGENCIA:
-                    variacao_fv = geracao_fv_bruta - geracao_fv_para_despacho
-                    bess_potencia_suavizacao = np.clip(
-                        variacao_fv * 0.3,
-                        -bess_potencia_disponivel_carga,
-                        bess_potencia_disponivel_descarga
-                    )
-                else:
-                    bess_potencia_suavizacao = 0
-
-                # >>> BLOCO NOVO AQUI <<<
-                # (Nota: Este bloco parecia ter uma variável 'potencia_total_bess' indefinida no original, 
-                # foi corrigido para 'potencia_bess_suavizacao' que parecia ser a intenção)
-                if abs(bess_potencia_suavizacao) > 1e-3:
-                    energia_suavizacao = abs(bess_potencia_suavizacao) * passo_de_tempo_h
-                    if bess_potencia_suavizacao > 0:
-                        energia_adicionada = energia_suavizacao * EFICIENCIA_CARREGAMENTO
-                        bess_soc_kwh = min(bess_soc_kwh + energia_adicionada,
-                                           bess_capacidade_kwh * SOC_LIMITE_MAX / 100)
-                    else:
-                        energia_removida = energia_suavizacao / EFICIENCIA_DESCARREGAMENTO
-                        bess_soc_kwh = max(bess_soc_kwh - energia_removida,
-                                           bess_capacidade_kwh * SOC_LIMITE_MIN_EMERGENCIA / 100)
-                    
-                    # A linha 'potencia_total_bess += bess_potencia_suavizacao' foi removida
-                    # pois 'potencia_total_bess' não estava definida neste escopo.
-                    # A lógica principal usa 'potencia_bess_suavizacao' mais tarde.
-
-
-            #Calcula o número de GMG
-            gmgs_necessarios = np.ceil(gmg_meta_para_carga / gmg_potencia_max_por_unidade) if gmg_potencia_max_por_unidade > 0 else float('inf')
-            vetor_gmgs_despachados[i] = min(numero_total_gmgs, gmgs_necessarios)
-            gmg_despacho_para_carga = min(gmg_meta_para_carga, vetor_gmgs_despachados[i] * gmg_potencia_max_por_unidade)
-            deficit_final = potencia_carga_atual - fv_despacho_para_carga - gmg_despacho_para_carga
-            bess_despacho_para_carga = max(bess_despacho_para_carga, deficit_final)
-
-        potencia_total_bess = potencia_bess_suavizacao
-        if bess_carga_pelo_fv > 0 and hora_do_dia < 17:
-            potencia_carregamento_alvo_fv = min(bess_carga_pelo_fv, bess_potencia_disponivel_carga)
-            potencia_carregamento_max_fv = potencia_carregamento_alvo_fv * fator_rampa_carga
-            bess_soc_max_kwh = bess_capacidade_kwh * SOC_LIMITE_MAX / 100
-            espaco_disponivel_kwh = max(0, bess_soc_max_kwh - bess_soc_kwh)
-            energia_por_potencia = (potencia_carregamento_max_fv * passo_de_tempo_h) * EFICIENCIA_CARREGAMENTO
-            energia_final_adicionada = min(energia_por_potencia, espaco_disponivel_kwh)
-            if energia_final_adicionada > 0:
-                bess_soc_kwh += energia_final_adicionada
-                potencia_carregamento_bess_excesso = (energia_final_adicionada / EFICIENCIA_CARREGAMENTO) / passo_de_tempo_h
-                potencia_total_bess += potencia_carregamento_bess_excesso
-
-        if bess_despacho_para_carga > 0 and (bess_soc_kwh / bess_capacidade_kwh * 100 if bess_capacidade_kwh > 1e-6 else 0) > SOC_LIMITE_MIN_EMERGENCIA:
-            potencia_descarga_necessaria = min(bess_despacho_para_carga, bess_potencia_disponivel_descarga)
-            energia_bruta_drenar = (potencia_descarga_necessaria * passo_de_tempo_h) / EFICIENCIA_DESCARREGAMENTO
-            energia_final_drenada = min(energia_bruta_drenar, max(0, bess_soc_kwh - (bess_capacidade_kwh * SOC_LIMITE_MIN_EMERGENCIA / 100)))
-            if energia_final_drenada > 0:
-                bess_soc_kwh -= energia_final_drenada
-                
-                # --- CORREÇÃO APLICADA AQUI ---
-                potencia_entregue_rede = (energia_final_drenada * EFICIENCIA_DESCARREGAMENTO) / passo_de_tempo_h
-                
-                potencia_descarga_bess_carga = -potencia_entregue_rede
-                potencia_total_bess += potencia_descarga_bess_carga
-                
-        # --- Acumula consumo de diesel ---
-        consumo_diesel_lh = calcular_consumo_diesel(gmg_despacho_para_carga)
-        gasto_passo_l = consumo_diesel_lh * passo_de_tempo_h
-        total_diesel_consumido_litros += gasto_passo_l
-
-        # Salva resultados do passo
-        vetor_fv_para_carga[i] = min(fv_despacho_para_carga, geracao_fv_bruta)
-        vetor_gmg_potencia_despachada[i] = gmg_despacho_para_carga
-        vetor_potencia_bess[i] = potencia_total_bess
-        vetor_soc_kwh[i] = bess_soc_kwh
-
-    # Retorna um dicionário com todos os resultados
-    return {
-        "vetor_tempo": vetor_tempo, "vetor_carga": vetor_carga, 
-        "vetor_geracao_fv_original": vetor_geracao_fv_original, "vetor_geracao_fv_suavizada": vetor_geracao_fv_suavizada,
-        "vetor_gmg_potencia_despachada": vetor_gmg_potencia_despachada, "vetor_potencia_bess": vetor_potencia_bess,
-        "vetor_soc_kwh": vetor_soc_kwh, "vetor_gmgs_despachados": vetor_gmgs_despachados,
-        "potencia_pico_fv_curto": potencia_pico_fv_curto, "numero_de_passos": numero_de_passos, 
-        "vetor_fv_para_carga": vetor_fv_para_carga, "total_diesel_consumido": total_diesel_consumido_litros
-    }
+    pre_calcular(("curto_prazo",) + argumentos + (estrategia,), calcular, grupo="curto_prazo")
 
-# --- Wrapper para Gráficos 1 e 3 ---
-def run_short_term_simulation(
+# --- Comparação de estratégias de despacho (Gráfico 1) ---
+@st.cache_data(show_spinner=False)
+def run_strategy_comparison(
     dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
     bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
     gmg_fator_potencia_eficiente, carga_limite_emergencia
 ):
-    """Chama a simulação detalhada com RUÍDO para os gráficos principais."""
-    return _run_simulation_detailed(
+    """Todas as estratégias de ESTRATEGIAS lado a lado, em um único lote."""
+    registrar_cache("st:run_strategy_comparison", False)
+    nomes = list(ESTRATEGIAS)
+    resultado = simular_lote(
         dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
         bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
-        gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise=True
+        gmg_fator_potencia_eficiente, carga_limite_emergencia, use_noise=True, estrategia=nomes
     )
+    passo_de_tempo_h = 1.0 / INTERVALOS_POR_HORA
+    soc_percentual = resultado["vetor_soc_kwh"] / bess_capacidade_kwh * 100
+    return [
+        {
+            "Estratégia": ROTULOS_ESTRATEGIAS.get(nome, nome),
+            "Diesel (L)": round(float(resultado["total_diesel_consumido"][k]), 1),
+            "Energia GMG (kWh)": round(float(np.sum(resultado["vetor_gmg_potencia_despachada"][k])) * passo_de_tempo_h, 1),
+            "Descarga BESS (kWh)": round(float(np.sum(np.maximum(0, -resultado["vetor_potencia_bess"][k]))) * passo_de_tempo_h, 1),
+            "SOC Mínimo (%)": round(float(soc_percentual[k].min()), 1),
+            "SOC Final (%)": round(float(soc_percentual[k, -1]), 1),
+        }
+        for k, nome in enumerate(nomes)
+    ]
 
-# --- Função para Análise de Autonomia (Gráfico 2) ---
+# --- Despacho ótimo: limite inferior do diesel (Gráfico 1) ---
 @st.cache_data(show_spinner=False)
-def run_long_term_simulation(
+def run_optimal_dispatch(
+    dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+    bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, soc_final_minimo_kwh
+):
+    """Despacho ótimo (programação dinâmica) com a mesma carga e FV do Gráfico 1."""
+    registrar_cache("st:run_optimal_dispatch", False)
+    return simular_otimo(
+        dias_simulacao, potencia_pico_fv_base, ceu_aberto, bess_capacidade_kwh,
+        bess_potencia_max_kw, soc_inicial_fracao, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, use_noise=True, soc_final_minimo_kwh=soc_final_minimo_kwh
+    )
+
+# --- Função para Análise de Autonomia (Gráfico 2) ---
+def long_term_simulation_task(
     potencia_pico_base_fv, p_ceu_aberto_slider, bess_capacidade_kwh,
     bess_potencia_max_kw, numero_total_gmgs, gmg_potencia_unitaria,
-    gmg_fator_potencia_eficiente, carga_limite_emergencia
+    gmg_fator_potencia_eficiente, carga_limite_emergencia, pre_calculo=False
 ):
     """
-    Executa a simulação de longo prazo para autonomia, chamando a simulação detalhada dia a dia,
-    COM ESTADO DE CARGA (SOC) CONTÍNUO.
+    Autonomia do diesel nos 4 cenários de irradiação (ver
+    simulador_bess.autonomia), calculada em segundo plano; cada cenário é
+    publicado como resultado parcial ao terminar. Com ``pre_calculo`` a
+    tarefa só é agendada para depois da tela visível.
     """
-    
-    # Garante que não haja divisão por zero
-    bess_capacidade_kwh_safe = max(bess_capacidade_kwh, 1e-6)
-    
-    cenarios_autonomia = {
-        f'Dias Normais (Fator {p_ceu_aberto_slider:.2f})': p_ceu_aberto_slider,
-        f'Dias Nublados (Fator {p_ceu_aberto_slider * 0.5:.2f})': p_ceu_aberto_slider * 0.5,
-        f'Dia com Tempestade (Fator {p_ceu_aberto_slider * 0.2:.2f})': p_ceu_aberto_slider * 0.2,
-        'Apenas GMG (Fator 0.0)': 0.0
-    }
-    resultados_autonomia = {}
-    
-    for nome, fator in cenarios_autonomia.items():
-        tanque_diesel_litros = CAPACIDADE_TOTAL_DIESEL_L
-        vetor_nivel_diesel = [tanque_diesel_litros]
-        dia_fim_autonomia = None
-        
-        # =================================================================
-        # --- LÓGICA CORRIGIDA: SOC CONTÍNUO ---
-        # =================================================================
-        # Começa a simulação de 120 dias com 50% de SOC
-        soc_atual_kwh = bess_capacidade_kwh_safe * 0.5 
-        # =================================================================
-
-        for dia in range(1, DIAS_SIMULACAO_LONGA + 1):
-            if tanque_diesel_litros <= 0.1:
-                if dia_fim_autonomia is None:
-                    # Cálculo de interpolação para o dia exato em que acaba
-                    dia_fim_autonomia = dia - 1 + (vetor_nivel_diesel[-2] / (vetor_nivel_diesel[-2] - vetor_nivel_diesel[-1]) if (len(vetor_nivel_diesel) > 1 and (vetor_nivel_diesel[-2] - vetor_nivel_diesel[-1]) > 1e-6) else 0)
-                vetor_nivel_diesel.append(0)
-                continue
-
-            # =================================================================
-            # --- LÓGICA CORRIGIDA: SOC CONTÍNUO ---
-            # =================================================================
-            # Calcula o SOC inicial para este dia como uma fração
-            soc_inicial_fracao_dia = soc_atual_kwh / bess_capacidade_kwh_safe
-            # =================================================================
-
-            # Simula um dia com a lógica detalhada
-            resultado_dia = _run_simulation_detailed(
-                dias_simulacao=1, 
-                potencia_pico_fv_base=potencia_pico_base_fv, 
-                fator_irradiacao=fator,
-                bess_capacidade_kwh=bess_capacidade_kwh_safe, 
-                bess_potencia_max_kw=bess_potencia_max_kw,
-                # Passa o SOC inicial correto para o dia
-                soc_inicial_fracao=soc_inicial_fracao_dia, 
-                numero_total_gmgs=numero_total_gmgs, 
-                gmg_potencia_unitaria=gmg_potencia_unitaria,
-                gmg_fator_potencia_eficiente=gmg_fator_potencia_eficiente,
-                carga_limite_emergencia=carga_limite_emergencia, 
-                use_noise=True
-            )
-            
-            tanque_diesel_litros -= resultado_dia["total_diesel_consumido"]
-            vetor_nivel_diesel.append(max(0, tanque_diesel_litros))
-
-            # =================================================================
-            # --- LÓGICA CORRIGIDA: SOC CONTÍNUO ---
-            # =================================================================
-            # Atualiza o SOC para o início do próximo dia
-            # Pega o último valor de SOC (em kWh) do dia que acabou de ser simulado
-            if len(resultado_dia["vetor_soc_kwh"]) > 0:
-                soc_atual_kwh = resultado_dia["vetor_soc_kwh"][-1]
-            else:
-                # Fallback, embora não deva acontecer
-                soc_atual_kwh = soc_inicial_fracao_dia * bess_capacidade_kwh_safe
-            # =================================================================
+    argumentos = (
+        potencia_pico_base_fv, p_ceu_aberto_slider, bess_capacidade_kwh,
+        bess_potencia_max_kw, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia
+    )
 
+    def calcular(tarefa):
+        # A tarefa fica no registro do processo: todas as sessões leem o mesmo resultado
+        return congelar(simular_cenarios_autonomia(*argumentos, ao_concluir_cenario=tarefa.publicar))
 
-        resultados_autonomia[nome] = {
-            'tempo': np.arange(0, DIAS_SIMULACAO_LONGA + 1),
-            'nivel_diesel': np.array(vetor_nivel_diesel[:DIAS_SIMULACAO_LONGA+1]),
-            'autonomia': dia_fim_autonomia
-        }
-    return resultados_autonomia
+    if pre_calculo:
+        return pre_calcular(("autonomia",) + argumentos, calcular, grupo="autonomia")
+    return obter(("autonomia",) + argumentos, calcular)
 
-# --- Função para Análise Anual (Gráfico 4) ---
+# --- Monte Carlo da autonomia (Gráfico 2) ---
 @st.cache_data(show_spinner=False)
-def calculate_annual_diesel_consumption(
-    potencia_pico_base_fv, bess_capacidade_kwh, bess_potencia_max_kw,
-    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia
+def run_monte_carlo_autonomy(
+    potencia_pico_base_fv, p_ceu_aberto_slider, bess_capacidade_kwh,
+    bess_potencia_max_kw, numero_total_gmgs, gmg_potencia_unitaria,
+    gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    numero_trajetorias, persistencia
 ):
-    """Calcula o consumo anual ponderado de diesel usando a simulação DETALHADA."""
-    gmg_potencia_max_por_unidade = gmg_potencia_unitaria * gmg_fator_potencia_eficiente
-    soc_inicial_kwh = bess_capacidade_kwh * 0.4 
-
-    factors_and_weights = {
-        1.0: 0.40, # 40% Céu Aberto
-        0.5: 0.35, # 35% Nublado
-        0.2: 0.20, # 20% Tempestade
-        0.0: 0.05  # 5% Sem Sol
-    }
-    
-    total_diesel_ponderado_diario = 0.0
-    
-    common_args = {
-        "dias_simulacao": 1,
-        "potencia_pico_fv_base": potencia_pico_base_fv,
-        "bess_capacidade_kwh": bess_capacidade_kwh,
-        "bess_potencia_max_kw": bess_potencia_max_kw,
-        "soc_inicial_fracao": 0.5,
-        "numero_total_gmgs": numero_total_gmgs,
-        "gmg_potencia_unitaria": gmg_potencia_unitaria,
-        "gmg_fator_potencia_eficiente": gmg_fator_potencia_eficiente,
-        "carga_limite_emergencia": carga_limite_emergencia,
-        "use_noise": False # Sem ruído para análise de sensibilidade
-    }
+    """Bandas P10/P50/P90 de autonomia e diesel anual (ver simulador_bess.montecarlo)."""
+    registrar_cache("st:run_monte_carlo_autonomy", False)
+    return simular_monte_carlo_autonomia(
+        potencia_pico_base_fv, p_ceu_aberto_slider, bess_capacidade_kwh,
+        bess_potencia_max_kw, numero_total_gmgs, gmg_potencia_unitaria,
+        gmg_fator_potencia_eficiente, carga_limite_emergencia,
+        numero_trajetorias=numero_trajetorias, persistencia=persistencia, semente=0
+    )
 
-    for factor, weight in factors_and_weights.items():
-        resultado_dia = _run_simulation_detailed(fator_irradiacao=factor, **common_args)
-        total_diesel_ponderado_diario += resultado_dia["total_diesel_consumido"] * weight
-        
-    return total_diesel_ponderado_diario * 365
+# --- Trabalhos da Análise Anual (Gráfico 4) ---
+@st.cache_resource
+def retomar_trabalhos_interrompidos():
+    """Uma vez por servidor: retoma as grades que um processo anterior deixou pela metade."""
+    return retomar_interrompidos(processos=os.cpu_count() or 1)
+
+# --- Otimizador de dimensionamento (abaixo do Gráfico 4) ---
+@st.cache_data(show_spinner=False)
+def run_sizing_optimization(
+    numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+    diesel_maximo_l_ano, autonomia_minima_dias, limites, custos, preco_diesel_l, anos_operacao,
+    _ao_progredir=None
+):
+    """Fronteira diesel x investimento e configuração mais barata (ver simulador_bess.otimizacao)."""
+    registrar_cache("st:run_sizing_optimization", False)
+    return otimizar_dimensionamento(
+        numero_total_gmgs, gmg_potencia_unitaria, gmg_fator_potencia_eficiente, carga_limite_emergencia,
+        diesel_maximo_l_ano=diesel_maximo_l_ano, autonomia_minima_dias=autonomia_minima_dias,
+        limites=limites, custos=custos, preco_diesel_l=preco_diesel_l, anos_operacao=anos_operacao,
+        ao_progredir=_ao_progredir
+    )
 
 # ==============================================================================
 # 4. FUNÇÕES DE PLOTAGEM
@@ -477,16 +292,24 @@ def calculate_annual_diesel_consumption(
 # (As funções de plotagem permanecem as mesmas, com pequenas correções)
 
 def plot_graph_1(
-    dias_simulacao, resultados_sim, p_ceu_aberto_local, p_bess_cap_safe, p_bess_pot_safe):
-    """Gera o Gráfico 1: Curvas de Simulação de Curto Prazo"""
+    dias_simulacao, resultados_sim, p_ceu_aberto_local, p_bess_cap_safe, p_bess_pot_safe, janela_h=None):
+    """
+    Gera o Gráfico 1: Curvas de Simulação de Curto Prazo
+
+    ``janela_h`` = (início, fim) em horas limita o gráfico a um trecho. As
+    séries são reduzidas ao mínimo e máximo por coluna de pixels da figura
+    (horizontes curtos ou janelas estreitas saem em resolução completa), com
+    a figura em ``DPI_GRAFICO_1_REDUZIDO``, e a densidade de marcações e
+    anotações se ajusta à duração exibida. Desenhe com
+    ``st.pyplot(figura, dpi=figura.dpi, bbox_inches=None)``: as margens já
+    estão ajustadas e o recorte "tight" desenharia a figura duas vezes.
+    """
     
     # Adicionado para garantir que as variáveis da UI estejam disponíveis
     global p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe
     p_bess_capacidade_kwh_safe = p_bess_cap_safe
     p_bess_potencia_max_kw_safe = p_bess_pot_safe
     
-    figura1, eixos1 = plt.subplots(2, 1, figsize=(18, 12), sharex=True, gridspec_kw={'height_ratios': [2, 1]})
-    
     # Extrai variáveis do dicionário de resultados
     vetor_tempo, vetor_carga, vetor_geracao_fv_original, vetor_geracao_fv_suavizada, vetor_gmg_potencia_despachada, vetor_potencia_bess, vetor_soc_kwh, vetor_gmgs_despachados, potencia_pico_fv_curto = [
         resultados_sim[k] for k in ['vetor_tempo', 'vetor_carga', 'vetor_geracao_fv_original', 'vetor_geracao_fv_suavizada', 'vetor_gmg_potencia_despachada', 'vetor_potencia_bess', 'vetor_soc_kwh', 'vetor_gmgs_despachados', 'potencia_pico_fv_curto']
@@ -494,12 +317,44 @@ def plot_graph_1(
     bess_capacidade_kwh = p_bess_capacidade_kwh_safe
     bess_potencia_max_kw = p_bess_potencia_max_kw_safe
 
-    eixos1[0].plot(vetor_tempo, vetor_carga, label='Consumo da Carga (kW)', color='royalblue', linewidth=2.5, zorder=10)
-    eixos1[0].plot(vetor_tempo, vetor_geracao_fv_original, label='Geração FV Original (kW)', color='gold', alpha=0.9, linestyle=':', zorder=4)
-    eixos1[0].fill_between(vetor_tempo, vetor_geracao_fv_suavizada, label='Geração FV Suavizada (Meta)', color='darkorange', linewidth=2.5, alpha= 0.3, zorder=5)
-    eixos1[0].fill_between(vetor_tempo, vetor_gmg_potencia_despachada, color='gray', alpha=0.6, zorder=2, label='Potência GMG Despachada (kW)')
-    eixos1[0].fill_between(vetor_tempo, 0, -vetor_potencia_bess, where=(vetor_potencia_bess >= 0), hatch='//', edgecolor='green', facecolor='lightgreen', alpha=0.7, label='BESS Carregando (kW)', zorder=3)
-    eixos1[0].fill_between(vetor_tempo, 0, -vetor_potencia_bess, where=(vetor_potencia_bess < 0), hatch='\\', edgecolor='red', facecolor='lightcoral', alpha=0.7, label='BESS Descarregando (kW)', zorder=3)
+    # Trecho exibido e redução a ~2 pontos por coluna de pixels
+    inicio_h, fim_h = janela_h if janela_h is not None else (0, dias_simulacao * 24)
+    fim_h = max(fim_h, inicio_h + 1)
+    fatia = fatia_janela(vetor_tempo, inicio_h, fim_h)
+    tempo_janela = vetor_tempo[fatia]
+    numero_baldes = int(TAMANHO_GRAFICO_1_POL[0] * DPI_GRAFICO_1_REDUZIDO)
+    reduzido = len(tempo_janela) > 2 * numero_baldes
+    figura1, eixos1 = plt.subplots(
+        2, 1, figsize=TAMANHO_GRAFICO_1_POL, dpi=DPI_GRAFICO_1_REDUZIDO if reduzido else DPI_GRAFICO_1,
+        sharex=True, gridspec_kw={'height_ratios': [2, 1]})
+
+    def envoltoria(valores):
+        return envoltoria_min_max(tempo_janela, valores[fatia], numero_baldes)
+
+    def linha(eixo, valores, escala=1.0, **estilo):
+        # Série reduzida: faixa entre o mínimo e o máximo de cada coluna de
+        # pixels, os mesmos pixels do zigue-zague com bem menos custo de
+        # desenho (borda contínua: o tracejado sobre a faixa é só custo)
+        if not reduzido:
+            eixo.plot(tempo_janela, valores[fatia] * escala, **estilo)
+            return
+        tempo, minimos, maximos = envoltoria(valores)
+        eixo.fill_between(tempo, minimos * escala, maximos * escala, facecolor=estilo['color'], edgecolor=estilo['color'],
+                          alpha=estilo.get('alpha'), linewidth=estilo.get('linewidth', 1.5), zorder=estilo.get('zorder'))
+        eixo.plot([], [], **estilo)  # entrada da legenda
+
+    linha(eixos1[0], vetor_carga, label='Consumo da Carga (kW)', color='royalblue', linewidth=2.5, zorder=10)
+    linha(eixos1[0], vetor_geracao_fv_original, label='Geração FV Original (kW)', color='gold', alpha=0.9, linestyle=':', zorder=4)
+    tempo_fv, _, fv_suavizada_max = envoltoria(vetor_geracao_fv_suavizada)
+    eixos1[0].fill_between(tempo_fv, fv_suavizada_max, label='Geração FV Suavizada (Meta)', color='darkorange', linewidth=2.5, alpha= 0.3, zorder=5)
+    tempo_gmg, _, gmg_max = envoltoria(vetor_gmg_potencia_despachada)
+    eixos1[0].fill_between(tempo_gmg, gmg_max, color='gray', alpha=0.6, zorder=2, label='Potência GMG Despachada (kW)')
+    # Carga (abaixo de zero) e descarga (acima) do BESS, um polígono cada. Na
+    # série reduzida os dois se alternam a cada pixel, então ficam sem hachura
+    tempo_bess, bess_invertido_min, bess_invertido_max = envoltoria(-vetor_potencia_bess)
+    resolucao_completa = len(tempo_bess) == len(tempo_janela)
+    eixos1[0].fill_between(tempo_bess, 0, np.minimum(bess_invertido_min, 0), hatch='//' if resolucao_completa else None, edgecolor='green', facecolor='lightgreen', alpha=0.7, label='BESS Carregando (kW)', zorder=3)
+    eixos1[0].fill_between(tempo_bess, 0, np.maximum(bess_invertido_max, 0), hatch='\\' if resolucao_completa else None, edgecolor='red', facecolor='lightcoral', alpha=0.7, label='BESS Descarregando (kW)', zorder=3)
     eixos1[0].set_ylabel('Potência (kW)', fontsize=12)
     potencia_fv_kwp_base_display = potencia_pico_fv_curto / (EFICIENCIA_FV * p_ceu_aberto_local) if p_ceu_aberto_local > 1e-6 else 0
     eixos1[0].set_title(f'Simulação com Suavização FV | BESS: {bess_capacidade_kwh:.0f} kWh | PV: {potencia_fv_kwp_base_display:.0f} kWp', fontsize=16)
@@ -507,30 +362,80 @@ def plot_graph_1(
     eixos1[0].axhline(0, color='black', linewidth=1)
     eixos1[0].set_ylim(-bess_potencia_max_kw * 1.1, None)
 
-    eixos1[1].plot(vetor_tempo, (vetor_soc_kwh / (bess_capacidade_kwh + 1e-6)) * 100, label='SOC do BESS (%)', color='purple', linewidth=2) 
+    linha(eixos1[1], vetor_soc_kwh, escala=100 / (bess_capacidade_kwh + 1e-6), label='SOC do BESS (%)', color='purple', linewidth=2)
     eixos1[1].axhline(y=SOC_LIMITE_MAX, color='green', linestyle='--', linewidth=1.5, label=f'SOC Máximo ({SOC_LIMITE_MAX}%)')
     eixos1[1].axhline(y=SOC_RAMPA_INICIO, color='orange', linestyle=':', linewidth=2, label=f'Início da Rampa de Carga ({SOC_RAMPA_INICIO}%)')
     eixos1[1].axhline(y=SOC_LIMITE_MIN_NORMAL, color='red', linestyle='--', linewidth=1.5, label=f'SOC Mínimo Normal ({SOC_LIMITE_MIN_NORMAL}%)')
     eixos1[1].axhline(y=SOC_LIMITE_MIN_EMERGENCIA, color='darkred', linestyle=':', linewidth=2, label=f'SOC Mínimo Emergencial ({SOC_LIMITE_MIN_EMERGENCIA}%)')
     
-    for i_hora in range(0, dias_simulacao * 24, 2):
+    # Anotação de GMGs a cada 2 h em horizontes curtos; em horizontes longos o
+    # intervalo cresce e a anotação mostra o máximo de GMGs no intervalo
+    intervalo_anotacao_h = intervalo_marcacoes_h(fim_h - inicio_h, MAXIMO_ANOTACOES_GMG, minimo_h=2)
+    passos_anotacao = intervalo_anotacao_h * INTERVALOS_POR_HORA
+    primeira_anotacao_h = -(-inicio_h // intervalo_anotacao_h) * intervalo_anotacao_h
+    for i_hora in range(int(primeira_anotacao_h), int(np.ceil(fim_h)), intervalo_anotacao_h):
         indice_passo = i_hora * INTERVALOS_POR_HORA
         if indice_passo < len(vetor_gmgs_despachados):
-            num_gmgs = int(np.nan_to_num(vetor_gmgs_despachados[indice_passo]))
-            eixos1[1].text(i_hora, 5, f'{num_gmgs} GMGs', ha='center', va='bottom', fontsize=9, color='black', bbox=dict(boxstyle='round,pad=0.2', fc='yellow', alpha=0.6))
+            if intervalo_anotacao_h == 2:
+                num_gmgs = int(np.nan_to_num(vetor_gmgs_despachados[indice_passo]))
+                texto = f'{num_gmgs} GMGs'
+            else:
+                num_gmgs = int(np.nan_to_num(np.max(vetor_gmgs_despachados[indice_passo:indice_passo + passos_anotacao])))
+                texto = f'máx {num_gmgs}'
+            eixos1[1].text(i_hora, 5, texto, ha='center', va='bottom', fontsize=9, color='black', bbox=dict(boxstyle='round,pad=0.2', fc='yellow', alpha=0.6))
     
     eixos1[1].set_xlabel('Hora', fontsize=12)
     eixos1[1].set_ylabel('Estado de Carga (%)', fontsize=12)
     eixos1[1].set_ylim(-5, 105)
     eixos1[1].legend(loc='lower right')
 
-    plt.xticks(np.arange(0, dias_simulacao * 24 + 1, 2))
-    plt.tight_layout(pad=2.0)
+    intervalo_x_h = intervalo_marcacoes_h(fim_h - inicio_h, MAXIMO_MARCACOES_X, minimo_h=2)
+    primeira_marcacao_h = -(-inicio_h // intervalo_x_h) * intervalo_x_h
+    plt.xticks(np.arange(primeira_marcacao_h, fim_h + 1, intervalo_x_h))
+    if janela_h is not None:
+        eixos1[1].set_xlim(inicio_h, fim_h)
+    if reduzido:
+        # Margens fixas (as do tight_layout para este tamanho): o tight_layout
+        # mede todos os textos da figura, um desenho a mais
+        figura1.subplots_adjust(**MARGENS_GRAFICO_1)
+    else:
+        plt.tight_layout(pad=2.0)
     
     return figura1
 
-def plot_graph_2(resultados_autonomia):
-    """Gera o Gráfico 2: Curvas de Autonomia de Diesel"""
+# Parquet e Arrow dependem do pyarrow (opcional); CSV funciona sempre
+FORMATOS_DOWNLOAD = {"csv": ("CSV", "text/csv")}
+if importlib.util.find_spec("pyarrow") is not None:
+    FORMATOS_DOWNLOAD.update({
+        "parquet": ("Parquet", "application/vnd.apache.parquet"),
+        "arrow": ("Arrow (Feather)", "application/vnd.apache.arrow.file"),
+    })
+
+
+def painel_exportacao(resultado, nome_arquivo, chave):
+    """Exporta um resultado colunar (simulador_bess.colunar) para download."""
+    with st.expander("💾 Exportar resultados"):
+        st.caption(f"{resultado.numero_de_linhas:,} linhas, {resultado.nbytes / 1024 / 1024:,.1f} MB em memória.")
+        col_formato, col_botao = st.columns(2)
+        with col_formato:
+            formato = st.selectbox("Formato", list(FORMATOS_DOWNLOAD), format_func=lambda f: FORMATOS_DOWNLOAD[f][0], key=f"{chave}_formato")
+        with col_botao:
+            # Só gera o arquivo quando pedido: o rerun normal não paga a exportação
+            if st.button("Preparar arquivo", key=f"{chave}_preparar"):
+                with st.spinner("Gerando arquivo..."):
+                    conteudo = resultado.exportar(formato=formato)
+                st.download_button(
+                    f"Baixar {FORMATOS_DOWNLOAD[formato][0]}", conteudo, file_name=f"{nome_arquivo}.{formato}",
+                    mime=FORMATOS_DOWNLOAD[formato][1], key=f"{chave}_baixar"
+                )
+
+
+def formatar_autonomia(dias):
+    """Texto da autonomia em dias (infinita = não esgota no horizonte)."""
+    return f"> {DIAS_SIMULACAO_LONGA} Dias" if np.isinf(dias) else f"{dias:.1f} Dias"
+
+def plot_graph_2(resultados_autonomia, resultados_monte_carlo=None):
+    """Gera o Gráfico 2: Curvas de Autonomia de Diesel (com a faixa P10-P90 do Monte Carlo, se houver)"""
     
     cores = ['green', 'orange', 'red', 'gray']
     figura2 = plt.figure(figsize=(18, 8))
@@ -550,6 +455,19 @@ def plot_graph_2(resultados_autonomia):
         if autonomia_valor is not None:
             plt.plot(autonomia_valor, 0, marker='o', color=cor, markersize=8)
 
+    if resultados_monte_carlo is not None:
+        percentis_nivel = resultados_monte_carlo['nivel_diesel_percentis']
+        percentis_autonomia = resultados_monte_carlo['autonomia_percentis']
+        plt.fill_between(
+            resultados_monte_carlo['tempo'], percentis_nivel[10], percentis_nivel[90], color='royalblue', alpha=0.2,
+            label=f"Monte Carlo P10-P90 ({resultados_monte_carlo['numero_trajetorias']} sequências de clima)"
+        )
+        plt.plot(
+            resultados_monte_carlo['tempo'], percentis_nivel[50], color='royalblue', linestyle='--', linewidth=2,
+            label=f"Monte Carlo P50 (Autonomia P10/P50/P90: {formatar_autonomia(percentis_autonomia[10])} / "
+                  f"{formatar_autonomia(percentis_autonomia[50])} / {formatar_autonomia(percentis_autonomia[90])})"
+        )
+
     plt.axhline(CAPACIDADE_TOTAL_DIESEL_L, color='black', linestyle='--', alpha=0.4, label='Capacidade Máxima do Tanque')
     plt.axhline(0, color='black', linewidth=0.5)
     plt.title(f'Análise de Autonomia do Diesel em {DIAS_SIMULACAO_LONGA} Dias (Cenários de Irradiação FV)', fontsize=16)
@@ -619,66 +537,220 @@ def plot_graph_4(
     
     st.markdown("""
     **Como este gráfico é calculado:**
-    1.  **Variação de BESS e FV:** Simulamos vários cenários alterando a **Capacidade do BESS (kWh)** no eixo X e a **Potência Pico do FV (kWp)** (cada linha representa um valor de FV). A potência do BESS (kW) é assumida como 50% da sua capacidade (0.5C).
+    1.  **Variação de BESS e FV:** Simulamos vários cenários alterando a **Capacidade do BESS (kWh)** no eixo X e a **Potência Pico do FV (kWp)** (cada linha representa um valor de FV; em grades com muitos valores de FV o resultado é mostrado como mapa de cores). A potência do BESS (kW) é assumida como 50% da sua capacidade (0.5C). Faixas, resolução da grade e número de processos podem ser ajustados em "Configuração da grade".
     2.  **Lógica de Despacho Detalhada:** Para cada combinação, usamos a **mesma lógica de despacho detalhada dos Gráficos 1 e 3** (incluindo suavização FV, rampas, etc.) para simular o consumo de diesel.
-    3.  **Tipos de Dia:** Para cada combinação de BESS e FV, calculamos o consumo de diesel para um dia típico em 4 condições diferentes de irradiação solar (Fator Céu Aberto), usando um perfil FV **sem ruído** para estabilidade:
-        * Céu Aberto (Fator 1.0)
-        * Nublado (Fator 0.5)
-        * Tempestade (Fator 0.2)
-        * Sem Sol (Fator 0.0)
-    4.  **Média Anual Ponderada:** Assumimos uma distribuição anual desses dias:
-        * 40% Céu Aberto
-        * 35% Nublado
-        * 20% Tempestade
-        * 5% Sem Sol
-        Calculamos a média diária de consumo de diesel usando esses pesos.
-    5.  **Consumo Anual:** Multiplicamos a média diária ponderada por 365 para estimar o consumo anual total de diesel em Litros.
+    3.  **4 Tipos de Dia (padrão, rápido):** Calculamos o consumo de um dia isolado (SOC inicial de 50%) de cada tipo de clima (Céu Aberto 1.0, Nublado 0.5, Tempestade 0.2 ou Sem Sol 0.0), fazemos a média ponderada pelas frequências 40% / 35% / 20% / 5% e multiplicamos por 365. Não considera a sazonalidade nem o SOC que passa de um dia para o outro.
+    4.  **Ano Cronológico (opcional, mais lento):** Alternativamente, simulamos os 365 dias do ano (8760 h em passos de 5 min) em sequência, com o **SOC do BESS levado de um dia para o outro** a partir de 50%, usando um perfil FV **sem ruído**:
+        * Cada dia tem um dos tipos de clima acima, sorteado uma vez com as mesmas frequências e com dias parecidos agrupados (sequência fixa, igual para todos os cenários).
+        * O FV e a carga de cada dia são multiplicados por fatores sazonais do mês (mais sol e mais carga no verão).
+        * Cada cenário roda o despacho passo a passo do ano inteiro (~0,15 s por cenário; dias repetidos com o mesmo SOC inicial são reaproveitados).
+        * A grade completa leva bem mais tempo que o modelo de 4 tipos de dia.
     """)
-    
-    if st.button("Executar Análise de Sensibilidade (Gráfico 4)", key="run_sens_analysis"):
-        with st.spinner("Executando análise de sensibilidade... Isso pode levar alguns minutos."):
-            fig, ax = plt.subplots(figsize=(14, 8))
-
-            bess_range_kwh = np.linspace(250, 1250, 11) 
-            fv_range_kwp = np.linspace(250, 1250, 11)   
-
-            total_sims = len(bess_range_kwh) * len(fv_range_kwp)
-            progress_bar = st.progress(0.0)
-            sim_count = 0
-
-            for fv_kwp in fv_range_kwp:
-                diesel_results = []
-                for bess_kwh in bess_range_kwh:
-                    bess_kw = bess_kwh * 0.5 
-                    bess_kwh_safe = max(bess_kwh, 1e-6) 
-                    bess_kw_safe = max(bess_kw, 1e-6)
-
-                    diesel = calculate_annual_diesel_consumption(
-                        fv_kwp, bess_kwh_safe, bess_kw_safe,
-                        p_numero_total_gmgs, p_gmg_potencia_unitaria, 
-                        p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
-                    )
-                    diesel_results.append(diesel)
-                    
-                    sim_count += 1
-                    progress_bar.progress(sim_count / total_sims, text=f"Calculando... {sim_count}/{total_sims} cenários")
 
-                ax.plot(bess_range_kwh, diesel_results, label=f'FV {fv_kwp:.0f} kWp', marker='o', markersize=5)
+    modelo = st.radio(
+        "Modelo anual", ("tipos_de_dia", "cronologico"), horizontal=True, key="g4_modelo",
+        format_func=lambda m: "Ano cronológico (8760 h, mais lento)" if m == "cronologico" else "4 tipos de dia (rápido)"
+    )
 
-            progress_bar.empty()
+    with st.expander("Configuração da grade", expanded=False):
+        col_fv, col_bess, col_exec = st.columns(3)
+        with col_fv:
+            fv_min_kwp = st.number_input("FV mínimo (kWp)", min_value=0.0, value=250.0, step=50.0, key="g4_fv_min")
+            fv_max_kwp = st.number_input("FV máximo (kWp)", min_value=0.0, value=1250.0, step=50.0, key="g4_fv_max")
+            fv_pontos = st.number_input("Pontos de FV", min_value=2, max_value=200, value=11, step=1, key="g4_fv_pontos")
+        with col_bess:
+            bess_min_kwh = st.number_input("BESS mínimo (kWh)", min_value=0.0, value=250.0, step=50.0, key="g4_bess_min")
+            bess_max_kwh = st.number_input("BESS máximo (kWh)", min_value=0.0, value=1250.0, step=50.0, key="g4_bess_max")
+            bess_pontos = st.number_input("Pontos de BESS", min_value=2, max_value=200, value=11, step=1, key="g4_bess_pontos")
+        with col_exec:
+            processos = st.number_input(
+                "Processos em paralelo", min_value=1, max_value=max(os.cpu_count() or 1, 1),
+                value=os.cpu_count() or 1, step=1, key="g4_processos",
+                help="Número de núcleos usados na grade. Não altera o resultado."
+            )
 
-            ax.set_xlabel('Capacidade BESS (kWh)')
+    bess_range_kwh = np.linspace(bess_min_kwh, bess_max_kwh, int(bess_pontos))
+    fv_range_kwp = np.linspace(fv_min_kwp, fv_max_kwp, int(fv_pontos))
+    parametros_grade = {
+        "modelo": modelo, "fv_range_kwp": fv_range_kwp, "bess_range_kwh": bess_range_kwh,
+        "numero_total_gmgs": p_numero_total_gmgs, "gmg_potencia_unitaria": p_gmg_potencia_unitaria,
+        "gmg_fator_potencia_eficiente": p_gmg_fator_potencia_eficiente, "carga_limite_emergencia": p_carga_limite_emergencia,
+    }
+    # A grade roda como trabalho em segundo plano (simulador_bess.trabalhos):
+    # sobrevive a reruns e reinícios, e qualquer sessão com os mesmos
+    # parâmetros acompanha o mesmo trabalho
+    retomar_trabalhos_interrompidos()
+    identificador = identificador_trabalho("grade_anual", parametros_grade)
+    estado = estado_trabalho(identificador)
+    situacao = estado["situacao"] if estado else None
+
+    col_executar, col_cancelar = st.columns(2)
+    with col_executar:
+        retomar = situacao in ("cancelado", "falhou")
+        if st.button(
+            "Retomar Análise de Sensibilidade (Gráfico 4)" if retomar else "Executar Análise de Sensibilidade (Gráfico 4)",
+            key="run_sens_analysis", disabled=situacao == "concluido" or situacao in SITUACOES_ATIVAS
+        ):
+            submeter("grade_anual", parametros_grade, processos=int(processos))
+            estado = estado_trabalho(identificador)
+            situacao = estado["situacao"] if estado else None
+    with col_cancelar:
+        if st.button("Cancelar", key="cancel_sens_analysis", disabled=situacao not in SITUACOES_ATIVAS):
+            cancelar(identificador)
+
+    if situacao in SITUACOES_ATIVAS:
+        total_sims = estado["total_pontos"]
+        progress_bar = st.progress(0.0)
+        while situacao in SITUACOES_ATIVAS:
+            pontos_concluidos = estado["pontos_concluidos"]
+            progress_bar.progress(pontos_concluidos / total_sims, text=f"Calculando {total_sims} cenários... {pontos_concluidos}/{total_sims}")
+            time.sleep(INTERVALO_ATUALIZACAO_S)
+            estado = estado_trabalho(identificador)
+            situacao = estado["situacao"] if estado else None
+        progress_bar.empty()
+
+    if situacao == "concluido":
+        diesel_grid = resultado_trabalho(identificador)
+        fig, ax = plt.subplots(figsize=(14, 8))
+        if len(fv_range_kwp) <= 12:
+            for fv_kwp, diesel_results in zip(fv_range_kwp, diesel_grid):
+                ax.plot(bess_range_kwh, diesel_results, label=f'FV {fv_kwp:.0f} kWp', marker='o', markersize=5)
             ax.set_ylabel('Consumo Anual Estimado de Diesel (L)')
-            ax.set_title('Consumo de Diesel vs. Dimensionamento Microrredes')
             ax.legend()
-            ax.grid(True, linestyle='--', alpha=0.7)
             ax.get_yaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
-            ax.get_xaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
+        else:
+            # Grade densa: uma linha por FV ficaria ilegível, usa mapa de cores
+            mapa = ax.pcolormesh(bess_range_kwh, fv_range_kwp, diesel_grid, shading='nearest', cmap='viridis')
+            contornos = ax.contour(bess_range_kwh, fv_range_kwp, diesel_grid, colors='white', linewidths=0.8)
+            ax.clabel(contornos, fmt=lambda x: "{:,.0f}".format(x), fontsize=8)
+            barra = fig.colorbar(mapa, ax=ax)
+            barra.set_label('Consumo Anual Estimado de Diesel (L)')
+            ax.set_ylabel('Potência Pico FV (kWp)')
+            ax.get_yaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
+
+        ax.set_xlabel('Capacidade BESS (kWh)')
+        ax.set_title('Consumo de Diesel vs. Dimensionamento Microrredes')
+        ax.grid(True, linestyle='--', alpha=0.7)
+        ax.get_xaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
+        with fase("grafico_4.renderizacao"):
             plt.tight_layout()
             st.pyplot(fig)
+        plt.close(fig)
+    elif situacao == "cancelado":
+        st.warning(f"Análise cancelada: {estado['pontos_concluidos']}/{estado['total_pontos']} cenários salvos. Clique em Retomar para continuar de onde parou.")
+    elif situacao == "falhou":
+        st.error(f"A análise falhou ({estado['erro']}). Os cenários concluídos foram salvos; clique em Retomar para tentar de novo.")
     else:
         st.info("Clique no botão acima para gerar o Gráfico 4 (Análise de Sensibilidade).")
 
+    with st.expander("Trabalhos em disco", expanded=False):
+        trabalhos = listar_trabalhos()
+        if trabalhos:
+            st.dataframe([
+                {
+                    "Trabalho": t["identificador"], "Modelo": t["parametros"].get("modelo"), "Situação": t["situacao"],
+                    "Cenários": f"{t['pontos_concluidos']}/{t['total_pontos']}",
+                    "Atualizado": time.strftime("%d/%m %H:%M:%S", time.localtime(t["atualizado_em"])),
+                }
+                for t in trabalhos
+            ], hide_index=True)
+        else:
+            st.caption("Nenhum trabalho registrado.")
+
+
+def plot_sizing_optimizer(
+    p_numero_total_gmgs, p_gmg_potencia_unitaria, p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
+):
+    """Otimizador de dimensionamento: metas, custos, fronteira de Pareto e melhor configuração."""
+    st.subheader("🎯 Otimizador de Dimensionamento (FV x BESS)")
+    st.markdown(
+        "Procura a combinação de **FV (kWp)**, **capacidade do BESS (kWh)** e **potência do BESS (kW)** de menor custo "
+        "que atende às metas, refinando a busca em volta das melhores configurações (em vez de simular a grade inteira). "
+        "O consumo anual usa o mesmo cálculo do Gráfico 4; a autonomia, o do Gráfico 2 em dias nublados (fator 0.5)."
+    )
+    with st.expander("Metas, faixas e custos", expanded=False):
+        col_metas, col_faixas, col_custos = st.columns(3)
+        with col_metas:
+            usar_meta_diesel = st.checkbox("Limitar o diesel anual", value=True, key="ot_usar_diesel")
+            diesel_maximo = st.number_input("Diesel máximo (L/ano)", min_value=0.0, value=60000.0, step=1000.0, key="ot_diesel")
+            usar_meta_autonomia = st.checkbox("Exigir autonomia mínima", value=False, key="ot_usar_autonomia")
+            autonomia_minima = st.number_input("Autonomia mínima (dias)", min_value=0.0, value=20.0, step=1.0, key="ot_autonomia")
+        with col_faixas:
+            fv_maximo = st.number_input("FV máximo (kWp)", min_value=10.0, value=LIMITES_PADRAO["potencia_pico_fv_base"][1], step=50.0, key="ot_fv_max")
+            bess_kwh_maximo = st.number_input("BESS máximo (kWh)", min_value=10.0, value=LIMITES_PADRAO["bess_capacidade_kwh"][1], step=50.0, key="ot_kwh_max")
+            bess_kw_maximo = st.number_input("BESS máximo (kW)", min_value=5.0, value=LIMITES_PADRAO["bess_potencia_max_kw"][1], step=50.0, key="ot_kw_max")
+        with col_custos:
+            custo_fv = st.number_input("Custo FV (por kWp)", min_value=0.0, value=CUSTOS_PADRAO["potencia_pico_fv_base"], step=50.0, key="ot_custo_fv")
+            custo_kwh = st.number_input("Custo BESS (por kWh)", min_value=0.0, value=CUSTOS_PADRAO["bess_capacidade_kwh"], step=10.0, key="ot_custo_kwh")
+            custo_kw = st.number_input("Custo BESS (por kW)", min_value=0.0, value=CUSTOS_PADRAO["bess_potencia_max_kw"], step=10.0, key="ot_custo_kw")
+            preco_diesel = st.number_input(
+                "Preço do diesel (por L)", min_value=0.0, value=0.0, step=0.1, key="ot_preco_diesel",
+                help="0 = escolhe pelo menor investimento. Com preço, soma o diesel do período de operação."
+            )
+            anos_operacao = st.number_input("Período de operação (anos)", min_value=1, value=10, step=1, key="ot_anos")
+
+    if not st.button("Executar Otimizador", key="run_optimizer"):
+        return
+    progress_bar = st.progress(0.0)
+
+    def atualizar_progresso(avaliacoes, maximo):
+        progress_bar.progress(min(avaliacoes / maximo, 1.0), text=f"Configurações avaliadas: {avaliacoes}")
+
+    resultado = chamar_com_cache(
+        run_sizing_optimization, p_numero_total_gmgs, p_gmg_potencia_unitaria,
+        p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia,
+        diesel_maximo if usar_meta_diesel else None, autonomia_minima if usar_meta_autonomia else None,
+        {"potencia_pico_fv_base": (0.0, fv_maximo), "bess_capacidade_kwh": (0.0, bess_kwh_maximo),
+         "bess_potencia_max_kw": (0.0, bess_kw_maximo)},
+        {"potencia_pico_fv_base": custo_fv, "bess_capacidade_kwh": custo_kwh, "bess_potencia_max_kw": custo_kw},
+        preco_diesel or None, int(anos_operacao), _ao_progredir=atualizar_progresso
+    )
+    progress_bar.empty()
+    st.caption(
+        f"{resultado['numero_avaliacoes']:,} configurações simuladas "
+        f"({resultado['numero_avaliacoes'] / resultado['tamanho_grade_exaustiva']:.2%} da grade completa de "
+        f"{resultado['tamanho_grade_exaustiva']:,} na mesma resolução)."
+    )
+
+    melhor = resultado["melhor"]
+    if melhor is None:
+        st.warning("Nenhuma configuração avaliada atende às metas. Amplie as faixas ou relaxe as metas.")
+    else:
+        col_fv, col_kwh, col_kw, col_diesel, col_custo = st.columns(5)
+        col_fv.metric("FV", f"{resultado['potencia_pico_fv_base'][melhor]:,.0f} kWp")
+        col_kwh.metric("BESS", f"{resultado['bess_capacidade_kwh'][melhor]:,.0f} kWh")
+        col_kw.metric("BESS", f"{resultado['bess_potencia_max_kw'][melhor]:,.0f} kW")
+        col_diesel.metric("Diesel Anual", f"{resultado['diesel_anual_l'][melhor]:,.0f} L")
+        col_custo.metric("Investimento", f"{resultado['investimento'][melhor]:,.0f}")
+
+    fronteira = resultado["fronteira_pareto"]
+    fig, ax = plt.subplots(figsize=(14, 7))
+    ax.scatter(resultado["investimento"], resultado["diesel_anual_l"], s=6, color='lightgray', label='Configurações avaliadas')
+    ax.plot(resultado["investimento"][fronteira], resultado["diesel_anual_l"][fronteira], color='royalblue',
+            marker='o', markersize=4, linewidth=1.5, label='Fronteira de Pareto')
+    if melhor is not None:
+        ax.plot(resultado["investimento"][melhor], resultado["diesel_anual_l"][melhor], marker='*', color='red',
+                markersize=16, linestyle='none', label='Configuração escolhida')
+    if usar_meta_diesel:
+        ax.axhline(diesel_maximo, color='red', linestyle='--', linewidth=1, label='Meta de diesel')
+    ax.set_xlabel('Investimento (FV + BESS)')
+    ax.set_ylabel('Consumo Anual Estimado de Diesel (L)')
+    ax.set_title('Diesel vs. Investimento')
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.get_xaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
+    ax.get_yaxis().set_major_formatter(plt.FuncFormatter(lambda x, loc: "{:,.0f}".format(x)))
+    ax.legend()
+    plt.tight_layout()
+    st.pyplot(fig)
+    plt.close(fig)
+
+    st.dataframe([
+        {"FV (kWp)": resultado["potencia_pico_fv_base"][i], "BESS (kWh)": resultado["bess_capacidade_kwh"][i],
+         "BESS (kW)": resultado["bess_potencia_max_kw"][i], "Diesel (L/ano)": round(resultado["diesel_anual_l"][i]),
+         "Investimento": round(resultado["investimento"][i]), "Custo Total": round(resultado["custo_total"][i])}
+        for i in fronteira
+    ], hide_index=True)
+
 
 # ==============================================================================
 # 5. INTERFACE DO USUÁRIO (STREAMLIT SIDEBAR) - MODIFICADO
@@ -698,6 +770,10 @@ with st.sidebar.expander("⚙️ Geral", expanded=True):
         min_value=50.0, value=100.0, step=10.0,
         help="Nível de carga que aciona o SOC de emergência do BESS."
     )
+    p_estrategia = st.selectbox(
+        "Estratégia de Despacho", list(ESTRATEGIAS), format_func=lambda nome: ROTULOS_ESTRATEGIAS.get(nome, nome),
+        help="Regras de participação do GMG, BESS e FV nos Gráficos 1 e 3 (ver simulador_bess.estrategias)."
+    )
 
 with st.sidebar.expander("☀️ Sistema Fotovoltaico (FV)"):
     p_potencia_pico_base_fv = st.number_input(
@@ -741,6 +817,17 @@ with st.sidebar.expander("🏭 Geradores (GMG)"):
         help="Fator de carga para operação eficiente do GMG."
     )
 
+with st.sidebar.expander("🩺 Diagnóstico de Desempenho"):
+    p_diagnostico = st.checkbox(
+        "Medir desempenho", value=instrumentacao_ativa(), key="diag_ativo",
+        help="Registra o tempo de cada fase (perfis, despacho, cache, gráficos) e os acertos de cache. "
+             "As medições valem para o processo do app inteiro."
+    )
+    if st.button("Zerar medições", key="diag_zerar"):
+        zerar_instrumentacao()
+    painel_diagnostico = st.container()
+ativar_instrumentacao(p_diagnostico)
+
 # ==============================================================================
 # 6. EXECUÇÃO PRINCIPAL E PLOTAGEM (DESIGN MODIFICADO COM ABAS)
 # ==============================================================================
@@ -753,65 +840,236 @@ p_bess_capacidade_kwh_safe = max(p_bess_capacidade_kwh, 1e-6)
 p_bess_potencia_max_kw_safe = max(p_bess_potencia_max_kw, 1e-6)
 
 
-# --- Executa Simulações ANTES de desenhar as abas ---
-# Isso garante que os dados estejam prontos para qualquer aba que o usuário clicar.
-
-with st.spinner("Executando simulação de curto prazo..."):
-    resultados_curto_prazo = run_short_term_simulation(
-        p_dias_simulacao, p_potencia_pico_base_fv, p_ceu_aberto,
-        p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe,
-        p_soc_inicial_fracao, p_numero_total_gmgs, p_gmg_potencia_unitaria,
-        p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
-    )
-
-with st.spinner("Executando simulação de autonomia..."):
-    resultados_autonomia = run_long_term_simulation(
-        p_potencia_pico_base_fv, p_ceu_aberto, 
-        p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe,
-        p_numero_total_gmgs, p_gmg_potencia_unitaria,
-        p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
-    )
+# Parâmetros das simulações de curto prazo (Gráficos 1 e 3) e de autonomia (Gráfico 2)
+parametros_curto_prazo = (
+    p_dias_simulacao, p_potencia_pico_base_fv, p_ceu_aberto,
+    p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe,
+    p_soc_inicial_fracao, p_numero_total_gmgs, p_gmg_potencia_unitaria,
+    p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia, p_estrategia
+)
+parametros_autonomia = (
+    p_potencia_pico_base_fv, p_ceu_aberto,
+    p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe,
+    p_numero_total_gmgs, p_gmg_potencia_unitaria,
+    p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
+)
 
-# --- Cria o "menu" de navegação usando abas ---
-tab1, tab2, tab3, tab4, tab5 = st.tabs([
+# --- Cria o "menu" de navegação ---
+# Só a tela escolhida é calculada e desenhada (com st.tabs todas as abas
+# rodariam a cada alteração); as demais são pré-calculadas ao final.
+VISTAS = [
     "📈 Gráfico 1: Operação", 
     "⛽ Gráfico 2: Autonomia Diesel", 
     "📊 Gráfico 3: Composição da Carga", 
     "🔍 Gráfico 4: Análise de Sensibilidade", 
     "🗺️ Topologia do Sistema"
-])
+]
+vista = st.radio("Visualização", VISTAS, horizontal=True, key="vista", label_visibility="collapsed")
+
+if vista in (VISTAS[0], VISTAS[2]):
+    with st.spinner("Executando simulação de curto prazo..."):
+        resultados_curto_prazo = run_short_term_simulation(*parametros_curto_prazo)
 
 # --- Aba 1: Gráfico de Operação ---
-with tab1:
+if vista == VISTAS[0]:
     st.header(f"Gráfico 1: Simulação de Operação ({p_dias_simulacao} Dias)")
-    fig1 = plot_graph_1(
-        p_dias_simulacao, 
-        resultados_curto_prazo, 
-        p_ceu_aberto, 
-        p_bess_capacidade_kwh_safe, 
-        p_bess_potencia_max_kw_safe
-    )
-    st.pyplot(fig1)
+    indicadores = resultados_curto_prazo["indicadores"]
+    col_diesel, col_fv, col_gmg, col_soc = st.columns(4)
+    col_diesel.metric("Diesel Consumido", f"{indicadores['diesel_total_l']:,.0f} L")
+    col_fv.metric("Carga Atendida pelo FV", f"{indicadores['fracao_fv']:.1%}")
+    col_gmg.metric("Energia dos GMGs", f"{indicadores['energia_gmg_kwh']:,.0f} kWh")
+    if indicadores["soc_minimo_pct"] is not None:
+        col_soc.metric("Faixa de SOC", f"{indicadores['soc_minimo_pct']:.0f}–{indicadores['soc_maximo_pct']:.0f}%")
+    degradacao = resultados_curto_prazo["degradacao"]
+    with st.expander(f"🔋 Degradação do BESS: {degradacao['ciclos_equivalentes']:,.1f} ciclos equivalentes"):
+        col_ciclos, col_perda, col_vida = st.columns(3)
+        col_ciclos.metric("Ciclos Contados (rainflow)", f"{degradacao['ciclos_contados']:,.1f}")
+        if np.isnan(degradacao["vida_util_anos"]):
+            col_perda.metric("Perda de Capacidade/Ano", "—", help="Sem BESS na configuração.")
+            col_vida.metric("Vida Útil Estimada", "—")
+        else:
+            col_perda.metric("Perda de Capacidade/Ano", f"{degradacao['perda_capacidade_anual']:.2%}",
+                             help="Ciclagem (regra de Miner) mais calendário, extrapolados do período simulado.")
+            col_vida.metric("Vida Útil Estimada", f"{degradacao['vida_util_anos']:,.1f} anos")
+        limites_dod = degradacao["limites_dod"]
+        fig_dod, ax_dod = plt.subplots(figsize=(12, 3))
+        ax_dod.bar(limites_dod[:-1] * 100, degradacao["histograma_dod"], width=np.diff(limites_dod) * 100,
+                   align='edge', color='darkorange', edgecolor='white')
+        ax_dod.set_xlabel('Profundidade de Descarga (DoD, %)')
+        ax_dod.set_ylabel('Ciclos')
+        ax_dod.set_xlim(0, 100)
+        ax_dod.grid(True, axis='y', linestyle='--', alpha=0.7)
+        plt.tight_layout()
+        st.pyplot(fig_dod)
+        plt.close(fig_dod)
+    frota_gmg = resultados_curto_prazo["frota_gmg"]
+    with st.expander(f"⛽ Frota de GMGs: {frota_gmg['diesel_total_l']:,.0f} L pela curva de carga parcial"):
+        st.caption(
+            "Unidades ligadas em ordem fixa, com tempos mínimos ligada e desligada; o consumo segue a "
+            "curva de carga parcial e soma o combustível das partidas."
+        )
+        col_curva, col_partidas, col_fator = st.columns(3)
+        col_curva.metric("Diesel (curva de carga parcial)", f"{frota_gmg['diesel_total_l']:,.0f} L",
+                         delta=f"{frota_gmg['diesel_total_l'] - indicadores['diesel_total_l']:+,.0f} L vs. SFC constante",
+                         delta_color="inverse")
+        col_partidas.metric("Partidas", f"{int(frota_gmg['partidas_por_unidade'].sum()):,}",
+                            help=f"Combustível das partidas: {frota_gmg['diesel_partidas_l']:,.1f} L")
+        col_fator.metric("Carga Média das Unidades Ligadas", f"{frota_gmg['fator_carga_medio']:.0%}")
+        st.dataframe([
+            {"GMG": unidade + 1, "Horas de Operação": round(float(horas), 1), "Partidas": int(partidas)}
+            for unidade, (horas, partidas) in enumerate(zip(frota_gmg["horas_por_unidade"], frota_gmg["partidas_por_unidade"]))
+        ], hide_index=True)
+    with st.expander("⚖️ Comparar estratégias de despacho"):
+        st.caption("Mesmos parâmetros, cada estratégia como um cenário do mesmo lote.")
+        if st.checkbox("Calcular comparação", key="comparar_estrategias"):
+            with st.spinner("Simulando as estratégias..."):
+                comparacao = chamar_com_cache(run_strategy_comparison, *parametros_curto_prazo[:-1])
+            st.dataframe(comparacao, hide_index=True)
+    with st.expander("📉 Limite inferior do diesel (despacho ótimo)"):
+        st.caption(
+            "Despacho de menor diesel por programação dinâmica sobre o SOC, com as mesmas eficiências, "
+            "limites e SFC, terminando com ao menos o SOC final da estratégia. A diferença é o que uma "
+            "estratégia melhor ainda poderia economizar."
+        )
+        if st.checkbox("Calcular despacho ótimo", key="despacho_otimo"):
+            soc_final_heuristica = float(resultados_curto_prazo["vetor_soc_kwh"][-1]) if p_bess_capacidade_kwh > 0 else None
+            with st.spinner("Resolvendo o despacho ótimo..."):
+                otimo = chamar_com_cache(run_optimal_dispatch, *parametros_curto_prazo[:-2], soc_final_heuristica)
+            diesel_heuristica = indicadores["diesel_total_l"]
+            diesel_otimo = otimo["total_diesel_consumido"]
+            # O diesel ótimo só é limite inferior se a estratégia atendeu toda a carga
+            nao_atendida_heuristica = carga_nao_atendida_kwh(resultados_curto_prazo, 1.0 / INTERVALOS_POR_HORA)
+            limite_inferior = nao_atendida_heuristica <= 1e-6
+            col_heuristica, col_otimo, col_folga = st.columns(3)
+            col_heuristica.metric("Diesel da Estratégia", f"{diesel_heuristica:,.0f} L")
+            col_otimo.metric("Diesel Ótimo (limite inferior)" if limite_inferior else "Diesel Ótimo", f"{diesel_otimo:,.0f} L")
+            col_folga.metric("Economia Possível",
+                             f"{(diesel_heuristica - diesel_otimo) / diesel_heuristica:.1%}"
+                             if diesel_heuristica > 0 and limite_inferior else "–")
+            if not limite_inferior:
+                custo_heuristica = custo_equivalente_l(diesel_heuristica, nao_atendida_heuristica)
+                custo_otimo = custo_equivalente_l(diesel_otimo, otimo["energia_nao_atendida_kwh"])
+                st.warning(
+                    f"A estratégia deixou {nao_atendida_heuristica:,.1f} kWh de carga sem atendimento, que o ótimo "
+                    "atende com diesel: o diesel ótimo não é limite inferior do diesel da estratégia. Com a mesma "
+                    f"penalidade nos dois lados ({PENALIDADE_CARGA_NAO_ATENDIDA:,.0f} L por kWh não atendido), o custo "
+                    f"equivalente é {custo_heuristica:,.0f} L na estratégia e {custo_otimo:,.0f} L no ótimo."
+                )
+            if otimo["energia_nao_atendida_kwh"] > 0:
+                st.warning(f"Carga não atendida no ótimo: {otimo['energia_nao_atendida_kwh']:,.1f} kWh "
+                           "(acima da capacidade dos GMGs e do BESS).")
+            if p_bess_capacidade_kwh > 0:
+                fig_otimo, ax_otimo = plt.subplots(figsize=(12, 3))
+                tempo = resultados_curto_prazo["vetor_tempo"]
+                ax_otimo.plot(tempo, resultados_curto_prazo["vetor_soc_kwh"] / p_bess_capacidade_kwh_safe * 100,
+                              label="Estratégia", color="tab:blue")
+                ax_otimo.plot(otimo["vetor_tempo"], otimo["vetor_soc_kwh"] / p_bess_capacidade_kwh_safe * 100,
+                              label="Ótimo", color="tab:green", linestyle="--")
+                ax_otimo.set_xlabel("Tempo (h)")
+                ax_otimo.set_ylabel("SOC (%)")
+                ax_otimo.grid(True, linestyle="--", alpha=0.7)
+                ax_otimo.legend(loc="upper right")
+                plt.tight_layout()
+                st.pyplot(fig_otimo)
+                plt.close(fig_otimo)
+    janela_grafico_1 = None
+    if p_dias_simulacao > 1:
+        with st.expander("🔍 Zoom (janela de tempo)"):
+            st.caption(
+                "Horizontes longos são desenhados com o mínimo e o máximo de cada coluna de pixels. "
+                "Escolha uma janela para ver o trecho em resolução completa."
+            )
+            if st.checkbox("Mostrar apenas a janela", key="g1_zoom"):
+                horas_simuladas = int(p_dias_simulacao * 24)
+                janela_grafico_1 = st.slider(
+                    "Janela (h)", min_value=0, max_value=horas_simuladas,
+                    value=(0, min(horas_simuladas, 72)), step=1, key="g1_janela"
+                )
+    with fase("grafico_1.renderizacao"):
+        fig1 = plot_graph_1(
+            p_dias_simulacao, 
+            resultados_curto_prazo, 
+            p_ceu_aberto, 
+            p_bess_capacidade_kwh_safe, 
+            p_bess_potencia_max_kw_safe,
+            janela_h=janela_grafico_1
+        )
+        st.pyplot(fig1, dpi=fig1.dpi, bbox_inches=None)
+        plt.close(fig1)
+    painel_exportacao(resultados_curto_prazo, f"operacao_{p_dias_simulacao}d", "exportar_operacao")
 
 # --- Aba 2: Gráfico de Autonomia ---
-with tab2:
+if vista == VISTAS[1]:
     st.header("Gráfico 2: Análise de Autonomia de Diesel (Longo Prazo)")
-    fig2 = plot_graph_2(resultados_autonomia)
-    st.pyplot(fig2)
+    tarefa_autonomia = long_term_simulation_task(*parametros_autonomia)
+    if not tarefa_autonomia.concluida():
+        # Mostra os cenários já concluídos enquanto os demais são calculados
+        espaco_parcial = st.empty()
+        cenarios_mostrados = -1
+        while not tarefa_autonomia.concluida():
+            parciais = tarefa_autonomia.parciais()
+            if len(parciais) != cenarios_mostrados:
+                cenarios_mostrados = len(parciais)
+                with espaco_parcial.container():
+                    st.info(f"Executando simulação de autonomia... ({cenarios_mostrados} cenário(s) concluído(s))")
+                    if parciais:
+                        fig_parcial = plot_graph_2(parciais)
+                        st.pyplot(fig_parcial)
+                        plt.close(fig_parcial)
+            time.sleep(INTERVALO_ATUALIZACAO_S)
+        espaco_parcial.empty()
+    resultados_autonomia = tarefa_autonomia.resultado()
+    resultados_monte_carlo = None
+    with st.expander("🎲 Monte Carlo (sequências de clima)"):
+        st.markdown(
+            "Sorteia sequências de tipos de dia (Normal, Nublado, Tempestade, Sem Sol) por uma cadeia de Markov "
+            "cuja frequência de longo prazo é 40/35/20/5%. O SOC e o tanque são contínuos entre os dias."
+        )
+        ativar_monte_carlo = st.checkbox("Calcular faixas P10/P50/P90", key="mc_ativo")
+        col_mc1, col_mc2 = st.columns(2)
+        with col_mc1:
+            numero_trajetorias = st.number_input("Número de sequências", min_value=100, max_value=50000, value=5000, step=500, key="mc_trajetorias")
+        with col_mc2:
+            persistencia = st.slider(
+                "Persistência do clima", min_value=0.0, max_value=0.95, value=PERSISTENCIA_CLIMA, step=0.05, key="mc_persistencia",
+                help="Probabilidade de um dia repetir o tipo do dia anterior (0 = dias independentes)."
+            )
+        if ativar_monte_carlo:
+            with st.spinner("Executando Monte Carlo..."):
+                resultados_monte_carlo = chamar_com_cache(
+                    run_monte_carlo_autonomy, p_potencia_pico_base_fv, p_ceu_aberto,
+                    p_bess_capacidade_kwh_safe, p_bess_potencia_max_kw_safe,
+                    p_numero_total_gmgs, p_gmg_potencia_unitaria,
+                    p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia,
+                    int(numero_trajetorias), persistencia
+                )
+            percentis_autonomia = resultados_monte_carlo['autonomia_percentis']
+            percentis_diesel = resultados_monte_carlo['diesel_anual_percentis']
+            col_p10, col_p50, col_p90 = st.columns(3)
+            for coluna, p in zip((col_p10, col_p50, col_p90), (10, 50, 90)):
+                coluna.metric(f"Autonomia P{p}", formatar_autonomia(percentis_autonomia[p]))
+                coluna.metric(f"Diesel Anual P{p}", f"{percentis_diesel[p]:,.0f} L")
+
+    with fase("grafico_2.renderizacao"):
+        fig2 = plot_graph_2(resultados_autonomia, resultados_monte_carlo)
+        st.pyplot(fig2)
+        plt.close(fig2)
+    painel_exportacao(autonomia_colunar(resultados_autonomia), "autonomia", "exportar_autonomia")
 
 # --- Aba 3: Gráfico de Composição ---
-with tab3:
+if vista == VISTAS[2]:
     st.header("Gráfico 3: Composição Média do Atendimento (2º Dia)")
-    fig3 = plot_graph_3(p_dias_simulacao, resultados_curto_prazo)
-    if fig3:
-        st.pyplot(fig3)
-    elif p_dias_simulacao >= 2:
+    with fase("grafico_3.renderizacao"):
+        fig3 = plot_graph_3(p_dias_simulacao, resultados_curto_prazo)
+        if fig3:
+            st.pyplot(fig3)
+    if not fig3 and p_dias_simulacao >= 2:
         st.warning("Não foi possível gerar o Gráfico 3 (2º dia). Verifique os dados da simulação.")
-    else:
+    elif not fig3:
         st.warning("Simulação muito curta para gerar o gráfico do 2º dia. (Requer pelo menos 2 dias de simulação)")
 
 # --- Aba 4: Gráfico de Sensibilidade ---
-with tab4:
+if vista == VISTAS[3]:
     # A função plot_graph_4() já contém seu próprio st.header, 
     # st.markdown e o botão de execução.
     plot_graph_4(
@@ -820,9 +1078,14 @@ with tab4:
         p_gmg_fator_potencia_eficiente, 
         p_carga_limite_emergencia
     )
+    st.divider()
+    plot_sizing_optimizer(
+        p_numero_total_gmgs, p_gmg_potencia_unitaria,
+        p_gmg_fator_potencia_eficiente, p_carga_limite_emergencia
+    )
 
 # --- Aba 5: Upload da Topologia ---
-with tab5:
+if vista == VISTAS[4]:
     st.header("Topologia do Sistema")
     st.write("Faça o upload de uma imagem (ex: diagrama unifilar) da topologia do sistema.")
     
@@ -831,9 +1094,41 @@ with tab5:
         type=["png", "jpg", "jpeg", "bmp"]
     )
     
+    # Guarda a imagem na sessão: o seletor some da tela ao trocar de visualização
     if uploaded_file is not None:
+        st.session_state["imagem_topologia"] = uploaded_file.getvalue()
+    if "imagem_topologia" in st.session_state:
         st.image(
-            uploaded_file, 
+            st.session_state["imagem_topologia"], 
             caption="Diagrama da Topologia Carregada", 
             use_column_width=True
-        )
\ No newline at end of file
+        )
+
+# --- Pré-cálculo das telas não visíveis (depois de desenhar a visível) ---
+if vista not in (VISTAS[0], VISTAS[2]):
+    prefetch_short_term_simulation(*parametros_curto_prazo)
+if vista != VISTAS[1]:
+    long_term_simulation_task(*parametros_autonomia, pre_calculo=True)
+
+# --- Painel de diagnóstico (preenchido ao fim da execução) ---
+if p_diagnostico:
+    dados_diagnostico = relatorio()
+    with painel_diagnostico:
+        st.caption("Fases (tempo de parede acumulado)")
+        st.dataframe([
+            {"Fase": nome, "Chamadas": f["chamadas"], "Total (ms)": round(f["tempo_total_s"] * 1000, 1),
+             "Média (ms)": round(f["tempo_medio_s"] * 1000, 2),
+             "Passos/s": f"{f['passos_por_s']:,.0f}" if f["passos_por_s"] else "-"}
+            for nome, f in dados_diagnostico["fases"].items()
+        ], hide_index=True)
+        st.caption("Caches")
+        st.dataframe([
+            {"Cache": nome, "Acertos": c["acertos"], "Faltas": c["faltas"],
+             "Taxa": f"{c['taxa_acerto']:.0%}" if c["taxa_acerto"] is not None else "-"}
+            for nome, c in dados_diagnostico["caches"].items()
+        ], hide_index=True)
+        st.download_button("Exportar JSON", json.dumps(dados_diagnostico, indent=2),
+                           file_name="diagnostico.json", mime="application/json", key="diag_json")
+        st.download_button("Exportar trace (Chrome)", json.dumps(trace_chrome()),
+                           file_name="trace.json", mime="application/json", key="diag_trace",
+                           help="Abra em chrome://tracing ou ui.perfetto.dev")